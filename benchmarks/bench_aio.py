@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Fan-out lookups from asyncio: AsyncVault.get() (coalesced into IN (...)
+batches) versus one database.get_password_details() call per id pushed to
+the default executor, for `--lookups` concurrent gets.
+
+Usage:
+  python benchmarks/bench_aio.py --entries 100000 --lookups 10000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import encryption
+from pm_core.aio import AsyncVault
+from pm_core.db import close_all
+from pm_core.settings_store import bootstrap_first_run, ensure_schema
+
+KDF = {"primary": "argon2id", "argon2_memory_kib": 8192, "argon2_time_cost": 1, "argon2_parallelism": 1, "salt_bytes": 16}
+
+async def _per_call(ids):
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(loop.run_in_executor(None, database.get_password_details, i) for i in ids))
+
+async def _coalesced(db, ids):
+    async with await AsyncVault.open(db, "bench") as vault:
+        t0 = time.perf_counter()
+        await vault.get_many(ids)
+        return time.perf_counter() - t0
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--entries", type=int, default=100000)
+    ap.add_argument("--lookups", type=int, default=10000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "bench.db")
+        ensure_schema(db)
+        encryption.set_crypto(bootstrap_first_run(db, "bench", KDF))
+        database.DB_FILE = db
+        database.create_tables()
+        database.store_passwords_many({"title": f"t{i}", "username": "u", "password": f"p{i}"}
+                                      for i in range(args.entries))
+        ids = random.Random(1).sample(range(1, args.entries + 1), min(args.lookups, args.entries))
+
+        database.clear_entry_cache()
+        t0 = time.perf_counter()
+        asyncio.run(_per_call(ids))
+        per_call = time.perf_counter() - t0
+        coalesced = asyncio.run(_coalesced(db, ids))
+        close_all()
+
+    print(f"{len(ids)} concurrent lookups over {args.entries} entries")
+    print(f"  executor, one call per id: {per_call * 1000:9.1f} ms  ({len(ids) / per_call:,.0f}/s)")
+    print(f"  AsyncVault (coalesced):    {coalesced * 1000:9.1f} ms  ({len(ids) / coalesced:,.0f}/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Per-operation latency of database.py: connect/close per call (the old code path)
+versus the shared thread-local connection from pm_core.db.
+
+Usage:
+  python benchmarks/bench_db_connections.py --entries 50000 --ops 2000
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography.fernet import Fernet
+
+import database
+import encryption
+from pm_core.db import close_all
+from pm_core.vault_crypto import VaultCrypto
+
+# --- the pre-pooling implementation, kept here only for comparison ---
+def _legacy_list(db):
+    conn = sqlite3.connect(db)
+    rows = conn.execute("SELECT id, title, username FROM passwords").fetchall()
+    conn.close()
+    return rows
+
+def _legacy_details(db, entry_id):
+    conn = sqlite3.connect(db)
+    row = conn.execute("SELECT * FROM passwords WHERE id = ?", (entry_id,)).fetchone()
+    conn.close()
+    return encryption.decrypt(row[3])
+
+def _legacy_update(db, entry_id):
+    conn = sqlite3.connect(db)
+    conn.execute(
+        "UPDATE passwords SET title = ?, username = ?, password = ?, recovery_codes = ? WHERE id = ?",
+        ("t", "u", encryption.encrypt("pw"), None, entry_id),
+    )
+    conn.commit()
+    conn.close()
+
+def _populate(db, n):
+    token = encryption.encrypt("correct horse battery staple")
+    now = datetime.now()
+    database.DB_FILE = db
+    database.create_tables()
+    conn = sqlite3.connect(db)
+    conn.executemany(
+        database._INSERT_SQL,
+        ((f"site-{i}", f"user{i}@example.com", token, None, now.isoformat(), int(now.timestamp())) for i in range(n)),
+    )
+    conn.commit()
+    conn.close()
+
+def _time(fn, ops):
+    samples = []
+    for i in range(ops):
+        t0 = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return statistics.median(samples), sorted(samples)[int(len(samples) * 0.95) - 1]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--entries", type=int, default=50000)
+    ap.add_argument("--ops", type=int, default=2000)
+    ap.add_argument("--list-ops", type=int, default=20, help="list_passwords() is O(n); run it fewer times")
+    args = ap.parse_args()
+
+    encryption.set_crypto(VaultCrypto(Fernet.generate_key()))
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "bench.db")
+        _populate(db, args.entries)
+        ids = [1 + (i * 7919) % args.entries for i in range(args.ops)]
+
+        cases = [
+            ("get_password_details", args.ops,
+             lambda i: _legacy_details(db, ids[i]), lambda i: database.get_password_details(ids[i])),
+            ("update_password", args.ops,
+             lambda i: _legacy_update(db, ids[i]), lambda i: database.update_password(ids[i], "t", "u", "pw")),
+            ("list_passwords", args.list_ops,
+             lambda i: _legacy_list(db), lambda i: database.list_passwords()),
+        ]
+        print(f"{args.entries} entries; median / p95 latency in ms")
+        print(f"{'operation':<22} {'connect-per-call':>20} {'pooled':>20} {'speedup':>8}")
+        for name, ops, before, after in cases:
+            b_med, b_p95 = _time(before, ops)
+            a_med, a_p95 = _time(after, ops)
+            print(f"{name:<22} {b_med:>9.3f} / {b_p95:>8.3f} {a_med:>9.3f} / {a_p95:>8.3f} {b_med / a_med:>7.1f}x")
+        close_all()
+
+if __name__ == "__main__":
+    main()
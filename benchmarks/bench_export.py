@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Encrypted export v2 per compression codec: file size, ratio against the
+uncompressed export, and export/import throughput in MB/s of row data.
+
+Rows look like the passwords table (titles, usernames, Fernet tokens).
+The KDF is cheap here so the numbers are about compression + AES-GCM;
+import is decrypt + decode (no SQLite writes).
+
+Usage:
+  python benchmarks/bench_export.py --rows 100000
+"""
+import argparse
+import io
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography.fernet import Fernet
+
+from pm_core import export_v2
+from pm_core.codecs import available_codecs
+from pm_core.vault_crypto import VaultCrypto
+
+_KDF = {"primary": "scrypt", "scrypt_N": 1024, "scrypt_r": 8, "scrypt_p": 1}
+
+def _make_db(n):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE passwords (id INTEGER PRIMARY KEY, title TEXT, username TEXT, password TEXT, created_at TEXT)")
+    vc = VaultCrypto(Fernet.generate_key())
+    tokens = vc.encrypt_many([f"pw-{i}-{os.urandom(6).hex()}" for i in range(n)])
+    conn.executemany("INSERT INTO passwords VALUES (?,?,?,?,?)", [
+        (i + 1, f"Account {i % 997} example.com", f"user{i % 50}@example.com",
+         tokens[i].decode("ascii"), "2025-10-12 10:00:00")
+        for i in range(n)
+    ])
+    raw = sum(len(export_v2.encode_rows([r])) for r in conn.execute("SELECT * FROM passwords"))
+    return conn, raw
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=100000)
+    args = ap.parse_args()
+
+    conn, raw = _make_db(args.rows)
+    mb = raw / 1e6
+    print(f"{args.rows} rows, {mb:.1f} MB of row data")
+    print(f"{'codec':<14} {'size MB':>9} {'ratio':>7} {'export MB/s':>12} {'import MB/s':>12}")
+    base = None
+    for name in available_codecs():
+        for stream in (False, True):
+            if name == "none" and stream:
+                continue
+            buf = io.BytesIO()
+            t0 = time.perf_counter()
+            export_v2.write_export(conn, "passwords", buf, "pw", _KDF, compression=name, stream=stream)
+            t_exp = time.perf_counter() - t0
+
+            buf.seek(len(export_v2.MAGIC))
+            header_raw, header = export_v2.read_header(buf)
+            t0 = time.perf_counter()
+            n = sum(len(rows) for rows in export_v2.iter_chunks(buf, header_raw, header, "pw"))
+            t_imp = time.perf_counter() - t0
+            assert n == args.rows
+
+            size = buf.getbuffer().nbytes
+            base = base or size
+            label = name + (" stream" if stream else "")
+            print(f"{label:<14} {size / 1e6:>9.2f} {base / size:>6.2f}x {mb / t_exp:>12.1f} {mb / t_imp:>12.1f}")
+
+if __name__ == "__main__":
+    main()
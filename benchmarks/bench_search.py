@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Search latency: FTS5 search_passwords() versus the old list_passwords() +
+Python substring filter.
+
+Usage:
+  python benchmarks/bench_search.py --entries 100000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography.fernet import Fernet
+
+import database
+import encryption
+from pm_core.db import close_all
+from pm_core.vault_crypto import VaultCrypto
+
+WORDS = ("github", "gitlab", "bank", "mail", "cloud", "shop", "admin", "vpn", "router",
+         "work", "home", "stream", "music", "travel", "health", "school", "forum", "wiki")
+
+def _populate(db, n):
+    rnd = random.Random(42)
+    token = encryption.encrypt("x")
+    database.DB_FILE = db
+    database.create_tables()
+    conn = sqlite3.connect(db)
+    with conn:
+        conn.executemany(database._INSERT_SQL, (
+            (f"{rnd.choice(WORDS)} {rnd.choice(WORDS)} {i}", f"user{i}@{rnd.choice(WORDS)}.example",
+             token, None, "2025-10-12T10:00:00", 1760263200)
+            for i in range(n)
+        ))
+    conn.close()
+
+def _legacy_search(q):
+    q = q.lower()
+    return [r for r in database.list_passwords() if q in str(r[1]).lower() or q in str(r[2]).lower()]
+
+def _median_ms(fn, runs):
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return statistics.median(samples)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--entries", type=int, default=100000)
+    ap.add_argument("--runs", type=int, default=20)
+    ap.add_argument("--limit", type=int, default=200, help="page size passed to search_passwords()")
+    args = ap.parse_args()
+
+    encryption.set_crypto(VaultCrypto(Fernet.generate_key()))
+    with tempfile.TemporaryDirectory() as tmp:
+        _populate(os.path.join(tmp, "bench.db"), args.entries)
+        print(f"{args.entries} entries; median ms over {args.runs} runs (FTS page = {args.limit} rows)")
+        print(f"{'query':<16} {'python filter':>14} {'fts page':>10} {'fts all':>10} {'hits':>8}")
+        for q in ("vpn", "gi", "music trav", "user4242", "zzz"):
+            legacy = _median_ms(lambda: _legacy_search(q), max(3, args.runs // 5))
+            page = _median_ms(lambda: database.search_passwords(q, limit=args.limit), args.runs)
+            full = _median_ms(lambda: database.search_passwords(q), max(3, args.runs // 5))
+            hits = len(database.search_passwords(q))
+            print(f"{q:<16} {legacy:>14.2f} {page:>10.2f} {full:>10.2f} {hits:>8}")
+        close_all()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite: storage, crypto, KDF and UI data paths on synthetic vaults.
+
+For each vault size it builds a real vault (settings, data key, entries as
+binary records) in a temp directory and times store_password,
+list_passwords, keyset paging and offset jumps (the virtual list),
+get_password_details (cache cleared, so it decrypts), search,
+rotate_master_password and export_encrypted / import_encrypted; and
+derive_fernet_key once. Each result is the median of several runs in ms.
+
+Results are JSON keyed "<bench>@<entries>". With --compare, a saved baseline
+is read and every bench slower by more than --tolerance is flagged; the exit
+status is 1 if any regressed.
+
+Usage:
+  python benchmarks/suite.py --sizes 1000 100000 1000000 --out bench.json
+  python benchmarks/suite.py --sizes 1000 100000 --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import encryption
+from pm_core.db import close_all
+from pm_core.export_import import export_encrypted, import_encrypted
+from pm_core.kdf import derive_fernet_key
+from pm_core.kdf_calibration import default_params
+from pm_core.rotation import rotate_master_password
+from pm_core.settings_store import bootstrap_first_run, ensure_schema
+
+SIZES = (1000, 100000, 1000000)
+WORDS = ("github", "gitlab", "bank", "mail", "cloud", "shop", "admin", "vpn", "router",
+         "work", "home", "stream", "music", "travel", "health", "school", "forum", "wiki")
+QUERIES = ("vpn", "gi", "music trav", "user4242", "zzz")
+_PASSWORDS = ("pw-a", "pw-b")
+
+def _measure(fn: Callable[[], object], runs: int, warmup: bool = True, rows: int = 0) -> Dict:
+    if warmup:
+        fn()
+    samples = []
+    for _ in range(max(1, runs)):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    out = {"median_ms": round(statistics.median(samples), 4), "min_ms": round(min(samples), 4), "runs": len(samples)}
+    if rows:
+        out["rows_per_s"] = round(rows / (out["median_ms"] / 1000.0), 1)
+    return out
+
+def _entries(n: int, seed: int = 42):
+    rnd = random.Random(seed)
+    for i in range(n):
+        yield {
+            "title": f"{rnd.choice(WORDS)} {rnd.choice(WORDS)} {i}",
+            "username": f"user{i}@{rnd.choice(WORDS)}.example",
+            "password": f"pw-{i}-{rnd.getrandbits(48):x}",
+        }
+
+def _build_vault(path: str, n: int, kdf_params: Dict) -> None:
+    database.DB_FILE = path
+    ensure_schema(path)
+    encryption.set_crypto(bootstrap_first_run(path, _PASSWORDS[0], kdf_params))
+    database.create_tables()
+    database.store_passwords_many(_entries(n))
+
+def _bench_vault(tmp: str, n: int, runs: int, kdf_params: Dict) -> Dict[str, Dict]:
+    db = os.path.join(tmp, f"vault-{n}.db")
+    t0 = time.perf_counter()
+    _build_vault(db, n, kdf_params)
+    res: Dict[str, Dict] = {"build_vault": {"median_ms": round((time.perf_counter() - t0) * 1000.0, 1), "runs": 1}}
+    heavy = max(1, runs // 5)
+    rnd = random.Random(7)
+
+    counter = iter(range(10 ** 9))
+    res["store_password"] = _measure(lambda: database.store_password(f"new {next(counter)}", "u", "secret"), runs)
+    res["list_passwords"] = _measure(database.list_passwords, heavy, rows=n)
+
+    pages = iter([])
+    def scroll():
+        nonlocal pages
+        row = next(pages, None)
+        page = database.list_passwords_page(100, after=row)
+        pages = iter(page[-1:]) if page else iter([])
+    res["list_page_scroll"] = _measure(scroll, runs)
+    res["list_at_offset"] = _measure(lambda: database.list_passwords_at(rnd.randrange(max(1, n)), 100), runs)
+
+    def details():
+        database.clear_entry_cache()
+        database.get_password_details(rnd.randrange(1, n + 1))
+    res["get_password_details"] = _measure(details, runs)
+    for q in QUERIES:
+        res[f"search[{q}]"] = _measure(lambda: database.search_passwords(q, limit=200), runs)
+
+    current = [0]
+    def rotate():  # back and forth between the two passwords
+        rotate_master_password(db, _PASSWORDS[current[0]], _PASSWORDS[1 - current[0]])
+        current[0] = 1 - current[0]
+    res["rotate_master_password"] = _measure(rotate, min(heavy, 2), warmup=False)
+
+    out = os.path.join(tmp, f"export-{n}.pmx")
+    res["export_encrypted"] = _measure(
+        lambda: export_encrypted(db, "passwords", out, "", passphrase="bench"), heavy, warmup=False, rows=n)
+
+    targets = iter(range(10 ** 6))
+    def do_import():
+        dst = os.path.join(tmp, f"import-{n}-{next(targets)}.db")
+        ensure_schema(dst)
+        import_encrypted(dst, out, "", passphrase="bench")
+    res["import_encrypted"] = _measure(do_import, heavy, warmup=False, rows=n)
+
+    close_all()
+    encryption.set_crypto(None)
+    return res
+
+def run_suite(sizes=SIZES, runs: int = 20, kdf_params: Optional[Dict] = None,
+              log: Callable[[str], None] = lambda s: None) -> Dict:
+    """Run every bench; returns {"meta": {...}, "results": {"<bench>@<entries>": {...}}}."""
+    kdf_params = kdf_params or default_params()
+    results: Dict[str, Dict] = {}
+    results["derive_fernet_key"] = _measure(
+        lambda: derive_fernet_key("correct horse battery staple", b"\x00" * 16, kdf_params), max(1, runs // 5))
+    log(f"derive_fernet_key: {results['derive_fernet_key']['median_ms']:.1f} ms")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            for name, r in _bench_vault(tmp, n, runs, kdf_params).items():
+                results[f"{name}@{n}"] = r
+                log(f"{name}@{n}: {r['median_ms']:.3f} ms")
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "sizes": list(sizes),
+            "runs": runs,
+            "kdf": {k: v for k, v in kdf_params.items() if k.startswith(("primary", "argon2", "scrypt"))},
+        },
+        "results": results,
+    }
+
+def compare(current: Dict, baseline: Dict, tolerance: float = 0.25, floor_ms: float = 0.05) -> List[Dict]:
+    """
+    One row per bench present in both runs. A bench regresses when its median
+    is more than `tolerance` slower and the difference exceeds floor_ms
+    (sub-0.05 ms changes are timer noise).
+    """
+    rows = []
+    base = baseline["results"]
+    for key, cur in current["results"].items():
+        if key not in base:
+            continue
+        b, c = base[key]["median_ms"], cur["median_ms"]
+        ratio = c / b if b > 0 else float("inf")
+        if ratio > 1 + tolerance and c - b > floor_ms:
+            status = "REGRESSION"
+        elif ratio < 1 - tolerance and b - c > floor_ms:
+            status = "faster"
+        else:
+            status = "ok"
+        rows.append({"bench": key, "baseline_ms": b, "current_ms": c, "ratio": round(ratio, 3), "status": status})
+    return rows
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    ap.add_argument("--runs", type=int, default=20, help="runs per bench (whole-vault benches use runs/5)")
+    ap.add_argument("--out", help="write results as JSON here")
+    ap.add_argument("--compare", metavar="BASELINE", help="flag regressions against this saved JSON")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    ap.add_argument("--kdf-memory-kib", type=int, help="override DEFAULTS.kdf memory (e.g. for quick runs)")
+    args = ap.parse_args(argv)
+
+    params = default_params()
+    if args.kdf_memory_kib:
+        params["argon2_memory_kib"] = args.kdf_memory_kib
+    report = run_suite(args.sizes, args.runs, params, log=lambda s: print(s, file=sys.stderr))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if not args.compare:
+        return 0
+    with open(args.compare, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    rows = compare(report, baseline, args.tolerance)
+    if baseline.get("meta", {}).get("kdf") != report["meta"]["kdf"]:
+        print("note: KDF parameters differ from the baseline; KDF-bound benches are not comparable")
+    print(f"\n{'bench':<36} {'baseline':>10} {'current':>10} {'ratio':>7}  status")
+    for r in rows:
+        print(f"{r['bench']:<36} {r['baseline_ms']:>10.3f} {r['current_ms']:>10.3f} {r['ratio']:>7.2f}  {r['status']}")
+    regressed = [r for r in rows if r["status"] == "REGRESSION"]
+    print(f"\n{len(regressed)} regression(s) over {args.tolerance:.0%}" if regressed else "\nno regressions")
+    return 1 if regressed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,63 +1,242 @@
+import re
 import sqlite3
 from datetime import datetime
+from itertools import islice
+from typing import Any, Iterable, List, Mapping, Optional, Sequence, Tuple
 # Phase-1: only import encrypt/decrypt (no global Fernet instance)
-from encryption import encrypt, decrypt
+from encryption import decrypt_record, decrypt_records, encrypt_record, encrypt_records, get_crypto
+from pm_core.config import DEFAULTS
+from pm_core.db import get_manager, transaction
+from pm_core.entry_cache import EntryCache
+from pm_core.records import sweep_legacy
+from pm_core.schema import (INSERT_WITH_ID_SQL, MAX_ID_SQL, PASSWORDS_TABLE_SQL, has_fts, to_epoch,
+                            upgrade as upgrade_schema)
+from pm_core.search import fts_match_expr
+from pm_core.settings_store import ensure_schema
+from pm_core.metrics import histogram
+from pm_core.tracing import traced
 
 DB_FILE = "passwords.db"
 
-def get_db_connection():
-    conn = sqlite3.connect(DB_FILE)
-    return conn
+# Statements are module constants so every call reuses the same SQL text and
+# hits sqlite3's per-connection prepared-statement cache.
+_INSERT_SQL = """
+    INSERT INTO passwords (title, username, password, recovery_codes, created_at, created_epoch)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+_LIST_SQL = "SELECT id, title, username FROM passwords"
+_COUNT_SQL = "SELECT COUNT(*) FROM passwords"
+# Paged rows also carry created_epoch: it is the keyset cursor for the "created" sort
+_PAGE_SQL = "SELECT id, title, username, created_epoch FROM passwords"
+_PAGE_AFTER_SQL = _PAGE_SQL + " WHERE id > ? ORDER BY id LIMIT ?"
+_PAGE_BEFORE_SQL = _PAGE_SQL + " WHERE id < ? ORDER BY id DESC LIMIT ?"
+_PAGE_AT_SQL = _PAGE_SQL + " ORDER BY id LIMIT ? OFFSET ?"
+_DETAILS_SQL = "SELECT * FROM passwords WHERE id = ?"
+_UPDATE_SQL = """
+    UPDATE passwords
+    SET title = ?, username = ?, password = ?, recovery_codes = ?
+    WHERE id = ?
+"""
+_DELETE_SQL = "DELETE FROM passwords WHERE id = ?"
 
+# Ranked in two tiers: entries whose title matches every term, then entries that
+# only match through username. Each tier comes out of FTS5 in rowid order, so the
+# UNION ALL is a streaming merge and LIMIT stops early instead of scoring (bm25)
+# and sorting every hit, which keeps broad queries fast on 100k-entry vaults.
+_SEARCH_FTS_SQL = """
+    SELECT p.id, p.title, p.username FROM (
+        SELECT 0 AS tier, rowid AS rid FROM passwords_fts WHERE passwords_fts MATCH ?
+        UNION ALL
+        SELECT 1, rowid FROM passwords_fts WHERE passwords_fts MATCH ?
+        ORDER BY 1, 2 LIMIT ? OFFSET ?
+    ) m JOIN passwords p ON p.id = m.rid
+    ORDER BY m.tier, m.rid
+"""
+_SEARCH_FTS_IDS_SQL = "SELECT rowid FROM passwords_fts WHERE passwords_fts MATCH ?"
+_LIKE_WHERE_SQL = "(title LIKE ? ESCAPE '\\' OR username LIKE ? ESCAPE '\\')"
+_SEARCH_LIKE_SQL = f"{_LIST_SQL} WHERE {_LIKE_WHERE_SQL} ORDER BY id LIMIT ? OFFSET ?"
+
+# Sortable columns -> ORDER BY expression matching an index from schema v2.
+SORT_KEYS = {
+    "id": "id",
+    "title": "title COLLATE NOCASE",
+    "username": "username COLLATE NOCASE",
+    "created": "created_epoch",
+}
+
+# Multi-column sort spec: [(column, descending), ...]; id is appended as the
+# final tie-breaker so every order is total and stable.
+SortSpec = Sequence[Tuple[str, bool]]
+# Position of each sort key in an (id, title, username, created_epoch) page row,
+# and its column where that differs from the key.
+_ROW_INDEX = {"id": 0, "title": 1, "username": 2, "created": 3}
+_COLUMNS = {"created": "created_epoch"}
+_NULLABLE = {"username", "created"}
+
+# Rows encrypted and handed to executemany() at a time by the *_many APIs.
+BATCH_SIZE = 1000
+
+_DB_SECONDS = histogram("pm_db_operation_seconds", "database.py call latency", ("op",))
+
+def _op(fn):
+    """Public database call: latency histogram by function name, plus a trace span."""
+    return traced()(_DB_SECONDS.labels(fn.__name__).timed(fn))
+
+# Decrypted details keyed by (DB_FILE, id); flushed on session lock.
+_ENTRY_CACHE = EntryCache(DEFAULTS.entry_cache.max_entries, DEFAULTS.entry_cache.ttl_seconds)
+
+def get_db_connection() -> sqlite3.Connection:
+    """Long-lived connection for the calling thread (pm_core.db). Do not close it."""
+    return get_manager(DB_FILE).connection()
+
+@_op
 def create_tables():
     conn = get_db_connection()
-    cursor = conn.cursor()
-    # Note: column type left as TEXT for compatibility with existing DBs.
-    # SQLite will happily store the Fernet token bytes in a TEXT-typed column,
-    # but if you're creating a fresh DB you can switch 'password TEXT' -> 'password BLOB'.
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS passwords (
-            id INTEGER PRIMARY KEY,
-            title TEXT NOT NULL,
-            username TEXT,
-            password TEXT NOT NULL,
-            recovery_codes TEXT,
-            created_at TEXT NOT NULL
-        )
-    """)
-    conn.commit()
-    conn.close()
+    # Fresh DBs declare password as BLOB (binary records). Existing DBs keep
+    # 'password TEXT': SQLite stores bytes in it as BLOBs all the same.
+    conn.execute(PASSWORDS_TABLE_SQL)
+    # settings/schema_migrations tables, then indexes + created_epoch (schema v2)
+    ensure_schema(DB_FILE)
+    upgrade_schema(conn)
 
+@_op
 def store_password(title, username, password, recovery_codes=None):
     conn = get_db_connection()
-    cursor = conn.cursor()
-    token = encrypt(password)  # bytes (Fernet token)
-    cursor.execute("""
-        INSERT INTO passwords (title, username, password, recovery_codes, created_at)
-        VALUES (?, ?, ?, ?, ?)
-    """, (title, username, token, recovery_codes, datetime.now().isoformat()))
-    conn.commit()
-    conn.close()
+    now = datetime.now()
+    with transaction(conn):
+        # The id is bound into the record, so it is allocated before encrypting
+        entry_id = conn.execute(MAX_ID_SQL).fetchone()[0] + 1
+        conn.execute(INSERT_WITH_ID_SQL, (
+            entry_id, title, username, encrypt_record(password, entry_id), recovery_codes,
+            now.isoformat(), int(now.timestamp()),
+        ))
     return True
 
-def list_passwords():
+def _full_order(order: Optional[SortSpec]) -> List[Tuple[str, bool]]:
+    spec = [(col, bool(desc)) for col, desc in (order or ())]
+    if not any(col == "id" for col, _ in spec):
+        # same direction as the last key so a single-index sort stays one scan
+        spec.append(("id", spec[-1][1] if spec else False))
+    return spec
+
+def _order_sql(spec: SortSpec, flip: bool = False) -> str:
+    return ", ".join(f"{SORT_KEYS[col]} {'ASC' if desc == flip else 'DESC'}" for col, desc in spec)
+
+def _keyset_sql(spec: SortSpec, row) -> Tuple[str, list]:
+    """
+    WHERE clause for rows strictly after `row` in `spec`. The first column also
+    gets a plain range bound so SQLite can seek its index instead of scanning.
+    NULLs sort first ascending and last descending, as in SQLite.
+    """
+    ors, params, eqs, eq_params = [], [], [], []
+    for col, desc in spec:
+        expr, name, v = SORT_KEYS[col], _COLUMNS.get(col, col), row[_ROW_INDEX[col]]
+        if v is None:
+            after, a_params = ("0" if desc else f"{name} IS NOT NULL"), []
+            eq, e_params = f"{name} IS NULL", []
+        else:
+            after = f"{expr} < ?" if desc else f"{expr} > ?"
+            if desc and col in _NULLABLE:
+                after = f"({after} OR {name} IS NULL)"
+            a_params = [v]
+            eq, e_params = f"{expr} = ?", [v]
+        ors.append("(" + " AND ".join(eqs + [after]) + ")")
+        params += eq_params + a_params
+        eqs.append(eq)
+        eq_params += e_params
+
+    col, desc = spec[0]
+    v = row[_ROW_INDEX[col]]
+    bound, b_params = "1", []
+    if v is not None:
+        expr = SORT_KEYS[col]
+        if not desc:
+            bound, b_params = f"{expr} >= ?", [v]
+        elif col in _NULLABLE:
+            bound, b_params = f"({expr} <= ? OR {_COLUMNS.get(col, col)} IS NULL)", [v]
+        else:
+            bound, b_params = f"{expr} <= ?", [v]
+    return f"{bound} AND ({' OR '.join(ors)})", b_params + params
+
+@_op
+def list_passwords(order_by: Optional[str] = None, descending: bool = False):
+    """(id, title, username) rows, optionally sorted by one of SORT_KEYS (tie-broken by id)."""
+    if order_by is None:
+        return get_db_connection().execute(_LIST_SQL).fetchall()
+    direction = "DESC" if descending else "ASC"
+    sql = f"{_LIST_SQL} ORDER BY {SORT_KEYS[order_by]} {direction}, id {direction}"
+    return get_db_connection().execute(sql).fetchall()
+
+@_op
+def count_passwords() -> int:
+    return get_db_connection().execute(_COUNT_SQL).fetchone()[0]
+
+@_op
+def list_passwords_page(limit: int, after=None, before=None, order: Optional[SortSpec] = None):
+    """
+    Keyset page of (id, title, username, created_epoch) rows in `order`
+    (default: id): the `limit` rows after row `after` (or from the start), or
+    the `limit` rows just before row `before`. Sorting runs in SQLite on the
+    schema v2 indexes.
+    """
     conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, title, username FROM passwords")
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+    if not order:
+        if before is not None:
+            rows = conn.execute(_PAGE_BEFORE_SQL, (before[0], limit)).fetchall()
+            rows.reverse()
+            return rows
+        return conn.execute(_PAGE_AFTER_SQL, (after[0] if after is not None else -1, limit)).fetchall()
+
+    spec = _full_order(order)
+    for col, _ in spec:
+        if col not in _ROW_INDEX:
+            raise ValueError(f"cannot page by {col!r}; keyset columns are {sorted(_ROW_INDEX)}")
+    if before is not None:
+        flipped = [(col, not desc) for col, desc in spec]
+        where, params = _keyset_sql(flipped, before)
+        sql = f"{_PAGE_SQL} WHERE {where} ORDER BY {_order_sql(spec, flip=True)} LIMIT ?"
+        rows = conn.execute(sql, (*params, limit)).fetchall()
+        rows.reverse()
+        return rows
+    if after is None:
+        sql = f"{_PAGE_SQL} ORDER BY {_order_sql(spec)} LIMIT ?"
+        return conn.execute(sql, (limit,)).fetchall()
+    where, params = _keyset_sql(spec, after)
+    sql = f"{_PAGE_SQL} WHERE {where} ORDER BY {_order_sql(spec)} LIMIT ?"
+    return conn.execute(sql, (*params, limit)).fetchall()
 
+@_op
+def list_passwords_at(offset: int, limit: int, order: Optional[SortSpec] = None):
+    """Page rows (as list_passwords_page) at an absolute position in `order` (scrollbar jumps)."""
+    if not order:
+        return get_db_connection().execute(_PAGE_AT_SQL, (limit, offset)).fetchall()
+    sql = f"{_PAGE_SQL} ORDER BY {_order_sql(_full_order(order))} LIMIT ? OFFSET ?"
+    return get_db_connection().execute(sql, (limit, offset)).fetchall()
+
+@_op
+def find_entries(title: Optional[str] = None, username: Optional[str] = None):
+    """Case-insensitive exact lookup by title and/or username (index seek)."""
+    clauses, params = [], []
+    if title is not None:
+        clauses.append("title = ? COLLATE NOCASE")
+        params.append(title)
+    if username is not None:
+        clauses.append("username = ? COLLATE NOCASE")
+        params.append(username)
+    where = " AND ".join(clauses) or "1"
+    return get_db_connection().execute(f"{_LIST_SQL} WHERE {where} ORDER BY id", params).fetchall()
+
+@_op
 def get_password_details(entry_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM passwords WHERE id = ?", (entry_id,))
-    row = cursor.fetchone()
-    conn.close()
+    key = (DB_FILE, int(entry_id))
+    cached = _ENTRY_CACHE.get(key)
+    if cached is not None:
+        return cached
+    row = get_db_connection().execute(_DETAILS_SQL, (entry_id,)).fetchone()
     if row:
-        # row[3] may be bytes, memoryview, or str depending on SQLite/python build.
-        password_plain = decrypt(row[3])
-        return {
+        # row[3] is a binary record, or a legacy Fernet token (bytes or str)
+        password_plain = decrypt_record(row[3], row[0])
+        details = {
             "id": row[0],
             "title": row[1],
             "username": row[2],
@@ -65,45 +244,170 @@ def get_password_details(entry_id):
             "recovery_codes": row[4],
             "created_at": row[5]
         }
+        _ENTRY_CACHE.put(key, details)
+        return details
     return None
 
+def clear_entry_cache() -> None:
+    """Drop every cached decrypted entry (session lock, key rotation)."""
+    _ENTRY_CACHE.clear()
+
+def _forget(entry_ids: Iterable[int]) -> None:
+    for entry_id in entry_ids:
+        _ENTRY_CACHE.invalidate((DB_FILE, int(entry_id)))
+
+@_op
 def update_password(entry_id, title, username, password, recovery_codes=None):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    token = encrypt(password)  # bytes
-    cursor.execute("""
-        UPDATE passwords
-        SET title = ?, username = ?, password = ?, recovery_codes = ?
-        WHERE id = ?
-    """, (title, username, token, recovery_codes, entry_id))
-    conn.commit()
-    conn.close()
+    token = encrypt_record(password, entry_id)  # a legacy token is upgraded here
+    get_db_connection().execute(_UPDATE_SQL, (title, username, token, recovery_codes, entry_id))
+    _forget((entry_id,))
     return True
 
+@_op
 def delete_password_entry(entry_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM passwords WHERE id = ?", (entry_id,))
-    conn.commit()
-    conn.close()
+    get_db_connection().execute(_DELETE_SQL, (entry_id,))
+    _forget((entry_id,))
     return True
 
+def _like_pattern(query: str) -> str:
+    return "%" + re.sub(r"([\\%_])", r"\\\1", query.strip()) + "%"
+
+def _fts_tiers(match: str):
+    in_title = f"{{title}} : ({match})"
+    return in_title, f"({match}) NOT {in_title}"
+
+def search_is_substring() -> bool:
+    """True when search_passwords() runs on the LIKE fallback (no FTS5 index)."""
+    return not has_fts(get_db_connection())
+
+@_op
+def search_passwords(query: str, limit: Optional[int] = None, offset: int = 0,
+                     order: Optional[SortSpec] = None):
+    """
+    Prefix search over title/username (semantics in pm_core.search): title matches
+    first, then username-only matches, each in id order. Falls back to a
+    substring LIKE scan when the query has no word characters or the SQLite
+    build has no FTS5. With `order`, hits come back in that sort order
+    instead of by rank.
+    """
+    conn = get_db_connection()
+    lim = -1 if limit is None else int(limit)
+    match = fts_match_expr(query)
+    use_fts = bool(match) and has_fts(conn)
+    if order:
+        order_sql = _order_sql(_full_order(order))
+        if use_fts:
+            sql = f"{_LIST_SQL} WHERE id IN ({_SEARCH_FTS_IDS_SQL}) ORDER BY {order_sql} LIMIT ? OFFSET ?"
+            return conn.execute(sql, (match, lim, offset)).fetchall()
+        pattern = _like_pattern(query)
+        sql = f"{_LIST_SQL} WHERE {_LIKE_WHERE_SQL} ORDER BY {order_sql} LIMIT ? OFFSET ?"
+        return conn.execute(sql, (pattern, pattern, lim, offset)).fetchall()
+    if use_fts:
+        return conn.execute(_SEARCH_FTS_SQL, (*_fts_tiers(match), lim, offset)).fetchall()
+    pattern = _like_pattern(query)
+    return conn.execute(_SEARCH_LIKE_SQL, (pattern, pattern, lim, offset)).fetchall()
+
+def _batches(items: Iterable[Any], size: int = BATCH_SIZE):
+    it = iter(items)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+@_op
+def store_passwords_many(entries: Iterable[Mapping[str, Any]]) -> List[int]:
+    """
+    Insert many entries in ONE transaction and return their new ids (input order).
+    Each entry is a mapping with title, username, password and optionally
+    recovery_codes / created_at (defaults to now).
+    """
+    conn = get_db_connection()
+    new_ids: List[int] = []
+    now = datetime.now().isoformat()
+    with transaction(conn):
+        # Ids are allocated up front under the write lock so executemany()
+        # can still report them back.
+        next_id = conn.execute(MAX_ID_SQL).fetchone()[0] + 1
+        for chunk in _batches(entries):
+            ids = range(next_id, next_id + len(chunk))
+            tokens = encrypt_records([e["password"] for e in chunk], ids)
+            rows = []
+            for i, e, tok in zip(ids, chunk, tokens):
+                created = e.get("created_at") or now
+                rows.append((i, e["title"], e.get("username"), tok, e.get("recovery_codes"), created, to_epoch(created)))
+            conn.executemany(INSERT_WITH_ID_SQL, rows)
+            new_ids.extend(ids)
+            next_id += len(chunk)
+    return new_ids
+
+@_op
+def get_passwords_many(entry_ids: Iterable[int]) -> List[dict]:
+    """Details (as get_password_details) for many ids, in input order; missing ids are skipped."""
+    conn = get_db_connection()
+    out: List[dict] = []
+    for chunk in _batches(entry_ids):
+        marks = ",".join("?" * len(chunk))
+        rows = {r[0]: r for r in conn.execute(f"SELECT * FROM passwords WHERE id IN ({marks})", chunk)}
+        found = [rows[i] for i in chunk if i in rows]
+        plain = decrypt_records([r[3] for r in found], [r[0] for r in found])
+        out.extend({
+            "id": r[0], "title": r[1], "username": r[2], "password": p,
+            "recovery_codes": r[4], "created_at": r[5],
+        } for r, p in zip(found, plain))
+    return out
+
+@_op
+def update_passwords_many(entries: Iterable[Mapping[str, Any]]) -> int:
+    """Update many entries (mappings with id, title, username, password, recovery_codes) in one transaction."""
+    conn = get_db_connection()
+    touched: List[int] = []
+    with transaction(conn):
+        for chunk in _batches(entries):
+            tokens = encrypt_records([e["password"] for e in chunk], [e["id"] for e in chunk])
+            conn.executemany(_UPDATE_SQL, [
+                (e["title"], e.get("username"), tok, e.get("recovery_codes"), e["id"])
+                for e, tok in zip(chunk, tokens)
+            ])
+            touched.extend(e["id"] for e in chunk)
+    _forget(touched)  # after commit, so no reader can re-cache the old values
+    return len(touched)
+
+@_op
+def delete_entries_many(entry_ids: Iterable[int]) -> int:
+    """Delete many entries in one transaction; returns the number of rows removed."""
+    conn = get_db_connection()
+    deleted, touched = 0, []
+    with transaction(conn):
+        for chunk in _batches(entry_ids):
+            cur = conn.executemany(_DELETE_SQL, [(i,) for i in chunk])
+            touched.extend(chunk)
+            deleted += cur.rowcount
+    _forget(touched)
+    return deleted
+
+@_op
+def upgrade_legacy_tokens(cancel=None, progress=None) -> int:
+    """Rewrite remaining Fernet tokens as binary records (background sweeper); returns rows upgraded."""
+    upgraded = sweep_legacy(get_db_connection(), get_crypto, "passwords", "password", "id",
+                            DEFAULTS.records.sweep_batch_rows, progress=progress, cancel=cancel)
+    clear_entry_cache()
+    return upgraded
+
+@_op
 def export_passwords():
     import json
     import os
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM passwords")
-    records = cursor.fetchall()
-    conn.close()
+    records = get_db_connection().execute("SELECT * FROM passwords").fetchall()
+    passwords = decrypt_records([r[3] for r in records], [r[0] for r in records])
 
     exported_data = []
-    for record in records:
+    for record, password in zip(records, passwords):
         exported_data.append({
             "id": record[0],
             "title": record[1],
             "username": record[2],
-            "password": decrypt(record[3]),
+            "password": password,
             "recovery_codes": record[4],
             "created_at": record[5]
         })
@@ -2,17 +2,22 @@
 - First run: prompts user to set a master password and derives a Fernet key
   via Argon2id (scrypt fallback). Stores only KDF params + salt + a canary in DB.
 - Subsequent runs: prompts to unlock and reconstructs the key in memory.
-- Provides encrypt()/decrypt() helpers used by database.py.
+- Provides encrypt()/decrypt() helpers, and the id-bound *_record(s) variants
+  used by database.py for stored entries.
 - Keeps your existing generate_secure_password(length, include_numbers, include_symbols).
 """
 from __future__ import annotations
 
-from typing import Optional
+from typing import Iterable, List, Optional
 import tkinter as tk
+from tkinter import messagebox
 import secrets
 import string
 
-from pm_core.settings_store import ensure_schema, unlock_vault, bootstrap_first_run
+from pm_core.background import BackgroundRunner
+from pm_core.kdf_calibration import calibrate, default_params, load_baseline, needs_upgrade, save_baseline
+from pm_core.rotation import rotate_master_password
+from pm_core.settings_store import ensure_schema, is_initialized, unlock_vault, bootstrap_first_run
 from pm_core.vault_crypto import VaultCrypto
 from pm_core.ui.dialogs import MasterPasswordDialog, UnlockDialog
 from pm_core.config import DEFAULTS
@@ -34,30 +39,66 @@ def _unlock_pw(root: tk.Tk) -> str:
         raise SystemExit("Unlock cancelled.")
     return dlg.result
 
-def initialize_vault(root: tk.Tk) -> VaultCrypto:
+def initialize_vault(root: tk.Tk, runner: Optional[BackgroundRunner] = None) -> VaultCrypto:
     """
     Call once, after creating the Tk root, before you touch encrypt()/decrypt().
+    With a BackgroundRunner the Argon2 derivation runs off the Tk thread.
     """
     global _CRYPTO
     ensure_schema(DB_PATH)
-    try:
-        # Try to unlock existing vault
-        pw = _unlock_pw(root)
-        _CRYPTO = unlock_vault(DB_PATH, pw)
-    except Exception:
-        # First run bootstrap
+    call = runner.run if runner is not None else (lambda fn, *a, **kw: fn(*a, **kw))
+    if not is_initialized(DB_PATH):
+        # First run bootstrap, with Argon2 parameters tuned to this machine
         pw = _first_run_pw(root)
-        params = {
-            "primary": "argon2id",
-            "argon2_memory_kib": DEFAULTS.kdf.argon2_memory_kib,
-            "argon2_time_cost": DEFAULTS.kdf.argon2_time_cost,
-            "argon2_parallelism": DEFAULTS.kdf.argon2_parallelism,
-            "salt_bytes": DEFAULTS.kdf.salt_bytes,
-            "scrypt_N": DEFAULTS.kdf.scrypt_N,
-            "scrypt_r": DEFAULTS.kdf.scrypt_r,
-            "scrypt_p": DEFAULTS.kdf.scrypt_p,
-        }
-        _CRYPTO = bootstrap_first_run(DB_PATH, pw, params)
+        params = call(calibrate) if DEFAULTS.kdf.calibrate else default_params()
+        _CRYPTO = call(bootstrap_first_run, DB_PATH, pw, params)
+        if DEFAULTS.kdf.calibrate:
+            save_baseline(DB_PATH, params)
+        return _CRYPTO
+    # Existing vault: a failed unlock is a wrong password, never a reason to set up a new one
+    while True:
+        pw = _unlock_pw(root)
+        try:
+            _CRYPTO = call(unlock_vault, DB_PATH, pw)
+            break
+        except PermissionError:
+            messagebox.showerror("Unlock Vault", "Wrong master password. Please try again.", parent=root)
+    _offer_stronger_kdf(root, pw, call)
+    return _CRYPTO
+
+def _offer_stronger_kdf(root: tk.Tk, pw: str, call) -> None:
+    """
+    Re-derive with the calibrated baseline when the vault's KDF params are weaker.
+    The baseline is only measured at first-run setup: calibrating here would run
+    Argon2 at up to max_memory_kib while the user works, so a vault without one
+    is left as it is.
+    """
+    if not DEFAULTS.kdf.calibrate or load_baseline(DB_PATH) is None:
+        return
+    baseline = needs_upgrade(DB_PATH)
+    if baseline is None:
+        return
+    if not messagebox.askyesno(
+        "Strengthen Vault Key",
+        "This vault's key derivation settings are weaker than this machine can handle "
+        f"(~{baseline.get('calibrated_ms', DEFAULTS.kdf.target_unlock_ms):.0f} ms unlock).\n\n"
+        "Re-derive the key with stronger settings now?",
+        parent=root,
+    ):
+        return
+    try:
+        # only the data key is re-wrapped; the unlocked VaultCrypto stays valid
+        call(rotate_master_password, DB_PATH, pw, pw, new_kdf_params=baseline)
+    except Exception as e:
+        messagebox.showerror("Strengthen Vault Key", f"Kept the current settings: {e}", parent=root)
+
+def set_crypto(crypto: Optional[VaultCrypto]) -> None:
+    """Install an already unlocked VaultCrypto (scripts that unlock without Tk dialogs)."""
+    global _CRYPTO
+    _CRYPTO = crypto
+
+def get_crypto() -> Optional[VaultCrypto]:
+    """The session's VaultCrypto (None while locked); read it per use, rotation may swap it."""
     return _CRYPTO
 
 def _to_bytes(token) -> bytes:
@@ -75,6 +116,40 @@ def encrypt(plaintext: str) -> bytes:
         raise RuntimeError("Vault not initialized. Call initialize_vault(root) first.")
     return _CRYPTO.encrypt_text(plaintext)
 
+def encrypt_many(plaintexts: Iterable[str]) -> List[bytes]:
+    """Encrypt a batch of plaintext strings, preserving order."""
+    if _CRYPTO is None:
+        raise RuntimeError("Vault not initialized. Call initialize_vault(root) first.")
+    return _CRYPTO.encrypt_many(plaintexts)
+
+def decrypt_many(tokens: Iterable) -> List[str]:
+    """Decrypt a batch of tokens (bytes/str/memoryview), preserving order."""
+    if _CRYPTO is None:
+        raise RuntimeError("Vault not initialized. Call initialize_vault(root) first.")
+    return _CRYPTO.decrypt_many([_to_bytes(t) for t in tokens])
+
+def encrypt_record(plaintext: str, entry_id: int) -> bytes:
+    """Encrypt a column value for entry `entry_id` as a binary record (pm_core.records)."""
+    if _CRYPTO is None:
+        raise RuntimeError("Vault not initialized. Call initialize_vault(root) first.")
+    return _CRYPTO.encrypt_record(plaintext, entry_id)
+
+def encrypt_records(plaintexts: Iterable[str], entry_ids: Iterable[int]) -> List[bytes]:
+    if _CRYPTO is None:
+        raise RuntimeError("Vault not initialized. Call initialize_vault(root) first.")
+    return _CRYPTO.encrypt_records(list(plaintexts), list(entry_ids))
+
+def decrypt_record(value, entry_id: int) -> str:
+    """Decrypt a stored column value: a binary record or a legacy Fernet token."""
+    if _CRYPTO is None:
+        raise RuntimeError("Vault not initialized. Call initialize_vault(root) first.")
+    return _CRYPTO.decrypt_record(value, entry_id)
+
+def decrypt_records(values: Iterable, entry_ids: Iterable[int]) -> List[str]:
+    if _CRYPTO is None:
+        raise RuntimeError("Vault not initialized. Call initialize_vault(root) first.")
+    return _CRYPTO.decrypt_records(list(values), list(entry_ids))
+
 def decrypt(token) -> str:
     """Decrypt a Fernet token (bytes/str/memoryview) back to plaintext string."""
     if _CRYPTO is None:
@@ -5,7 +5,9 @@ Import plaintext Exported.json into the current DB, encrypting with the master k
 Usage:
   python import_plaintext_json.py --json Exported.json --db passwords.db --wipe
 """
-import argparse, json, sqlite3, getpass
+import argparse, json, getpass
+import database
+import encryption
 from pm_core.settings_store import ensure_schema, unlock_vault
 from pm_core.vault_crypto import VaultCrypto
 
@@ -20,36 +22,19 @@ def main():
     master = getpass.getpass("Enter master password: ")
     vc: VaultCrypto = unlock_vault(args.db, master)
 
-    data = json.load(open(args.json, "r", encoding="utf-8"))
-    conn = sqlite3.connect(args.db)
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS passwords (
-            id INTEGER PRIMARY KEY,
-            title TEXT NOT NULL,
-            username TEXT,
-            password TEXT NOT NULL,
-            recovery_codes TEXT,
-            created_at TEXT NOT NULL
-        )
-    """)
-    conn.commit()
+    with open(args.json, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    database.DB_FILE = args.db
+    encryption.set_crypto(vc)
+    database.create_tables()
 
     if args.wipe:
-        cur.execute("DELETE FROM passwords")
-        conn.commit()
-
-    inserted = 0
-    for rec in data:
-        token = vc.encrypt_text(rec["password"])  # bytes (Fernet token)
-        cur.execute(
-            "INSERT INTO passwords (title, username, password, recovery_codes, created_at) VALUES (?,?,?,?,?)",
-            (rec["title"], rec["username"], token, rec["recovery_codes"], rec["created_at"]),
-        )
-        inserted += 1
-    conn.commit()
-    conn.close()
-    print(f"Imported {inserted} row(s) from {args.json} into {args.db} (encrypted).")
+        database.get_db_connection().execute("DELETE FROM passwords")
+
+    # One transaction, executemany() per batch (see database.store_passwords_many)
+    ids = database.store_passwords_many(data)
+    print(f"Imported {len(ids)} row(s) from {args.json} into {args.db} (encrypted).")
 
 if __name__ == "__main__":
     main()
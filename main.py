@@ -1,5 +1,7 @@
+import argparse
 import os
 import sys
+import threading
 import tkinter as tk
 from tkinter import messagebox, simpledialog, filedialog
 from tkinter import font as tkfont
@@ -11,16 +13,27 @@ from ttkbootstrap.widgets import Meter
 
 # --- App modules (existing) ---
 from database import (
-    create_tables, list_passwords, get_password_details,
+    create_tables, search_passwords, search_is_substring, get_password_details,
     store_password, update_password, delete_password_entry,
-    export_passwords, DB_FILE
+    count_passwords, list_passwords_page, list_passwords_at,
+    export_passwords, clear_entry_cache, upgrade_legacy_tokens, DB_FILE
 )
-from encryption import generate_secure_password, initialize_vault
+from encryption import generate_secure_password, initialize_vault, set_crypto
 
 # Security features
+from pm_core.background import BackgroundRunner
 from pm_core.clipboard import copy_to_clipboard
+from pm_core.config import DEFAULTS
+from pm_core.db import close_all as close_db_connections
 from pm_core.export_import import export_encrypted
-from pm_core.rotation import rotate_master_password
+from pm_core.logging_setup import setup_logger, shutdown_logging
+from pm_core.metrics import start_exporters, stop_exporters
+from pm_core.rotation import rotate_data_key, rotate_master_password
+from pm_core.search import SearchResultCache
+from pm_core.session_lock import SessionLock
+from pm_core.tracing import log_totals, run_profiled, traced
+from pm_core.settings_store import unlock_vault
+from pm_core.ui.virtual_tree import VirtualTreeview, RowSource, ListSource
 
 
 # =========================
@@ -68,17 +81,45 @@ def apply_app_fonts():
     st.configure("Treeview.Heading", font=(chosen, 11, "bold"))
 
 
+class VaultRowSource(RowSource):
+    """All entries in `order` (default: id), paged straight from SQLite with keyset queries."""
+
+    def __init__(self, order=None):
+        self.order = list(order or [])
+
+    def count(self):
+        return count_passwords()
+
+    def fetch_after(self, row, limit):
+        return list_passwords_page(limit, after=row, order=self.order)
+
+    def fetch_before(self, row, limit):
+        return list_passwords_page(limit, before=row, order=self.order)
+
+    def fetch_at(self, offset, limit):
+        return list_passwords_at(offset, limit, order=self.order)
+
+
 class PasswordManagerApp:
-    def __init__(self, root: Window):
+    _HEADINGS = {"id": "ID", "title": "Title", "username": "Username"}
+
+    def __init__(self, root: Window, runner: BackgroundRunner = None):
         self.root = root
         self.root.title("Password Manager")
 
+        # KDF / bulk crypto run here, off the Tk thread
+        self.runner = runner or BackgroundRunner(root, DEFAULTS.background.workers, DEFAULTS.background.poll_ms)
+        self.runner.on_busy = self._set_busy
+        self._rotating = False
+
         # Search & status
         self.search_var = tk.StringVar()
         self.status_var = tk.StringVar(value="Ready")
+        self._search_cache = SearchResultCache(search_passwords, search_is_substring)
+        self._search_job = None
 
-        # Sorting state
-        self._sort_state = {"id": False, "title": False, "username": False}
+        # Sorting state: [(column, descending), ...]; kept across refreshes and searches
+        self._sort_spec = []
 
         # Build UI
         self._build_menu()
@@ -91,6 +132,11 @@ class PasswordManagerApp:
 
         create_tables()
         self.load_passwords()
+        self._sweep_cancel = threading.Event()
+        self._start_record_sweep()
+
+        # Idle lock: drop decrypted entries held in memory
+        self.session_lock = SessionLock(root, DEFAULTS.session_lock.idle_minutes, on_lock=self._on_session_lock)
 
     # =========================
     #       UI STRUCTURE
@@ -115,6 +161,10 @@ class PasswordManagerApp:
             label="Change Master Password",
             command=self.change_master_password_action
         )
+        security_menu.add_command(
+            label="Rotate Data Key (re-encrypt all)…",
+            command=self.rotate_data_key_action
+        )
         menubar.add_cascade(label="Security", menu=security_menu)
 
         self.root.config(menu=menubar)
@@ -126,7 +176,17 @@ class PasswordManagerApp:
         ttk.Label(bar, text="Search:").pack(side=tk.LEFT, padx=(0, 6))
         entry = ttk.Entry(bar, textvariable=self.search_var, width=32)
         entry.pack(side=tk.LEFT)
-        self.search_var.trace_add("write", lambda *_: self.load_passwords())
+        self.search_var.trace_add("write", lambda *_: self._schedule_search())
+
+    def _schedule_search(self):
+        # Debounce: only the last keystroke within the window triggers a refresh
+        if self._search_job is not None:
+            self.root.after_cancel(self._search_job)
+        self._search_job = self.root.after(DEFAULTS.ui.search_debounce_ms, self._run_search)
+
+    def _run_search(self):
+        self._search_job = None
+        self.load_passwords()
 
     def _build_tree(self):
         # Style tweaks
@@ -135,13 +195,25 @@ class PasswordManagerApp:
         style.configure("Treeview.Heading")
 
         # Table (manual striping)
+        table = ttk.Frame(self.root)
+        table.pack(fill=tk.BOTH, expand=True, padx=10, pady=8)
         columns = ("id", "title", "username")
-        self.tree = ttk.Treeview(self.root, columns=columns, show="headings")
-        self.tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=8)
+        self.tree = ttk.Treeview(table, columns=columns, show="headings")
+        scrollbar = ttk.Scrollbar(table, orient=tk.VERTICAL)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        # Virtual-list mode: only the visible window of rows lives in the widget
+        self.vtree = VirtualTreeview(
+            self.tree, scrollbar,
+            virtual=DEFAULTS.ui.virtual_list,
+            margin=DEFAULTS.ui.page_margin_rows,
+        )
 
-        self.tree.heading("id", text="ID", command=lambda: self.sort_by("id", 0))
-        self.tree.heading("title", text="Title", command=lambda: self.sort_by("title", 1))
-        self.tree.heading("username", text="Username", command=lambda: self.sort_by("username", 2))
+        for col in columns:
+            self.tree.heading(col, text=self._HEADINGS[col], command=lambda c=col: self.sort_by(c))
+        # Shift-click a heading to add it as a secondary sort key
+        self.tree.bind("<Shift-Button-1>", self._on_heading_shift_click)
 
         self.tree.column("id", width=60, anchor=tk.CENTER)
         self.tree.column("title", width=320, anchor=tk.W)
@@ -182,6 +254,8 @@ class PasswordManagerApp:
         bar = ttk.Frame(self.root, padding=(10, 6))
         bar.pack(fill=tk.X)
         ttk.Label(bar, textvariable=self.status_var, anchor="w").pack(side=tk.LEFT)
+        # Busy indicator for background crypto jobs (shown only while one runs)
+        self.busy_bar = ttk.Progressbar(bar, mode="indeterminate", length=120)
 
     def _bind_shortcuts(self):
         self.root.bind_all("<Control-n>", lambda e: self.store_password_dialog())
@@ -210,6 +284,21 @@ class PasswordManagerApp:
         self.tree.tag_configure("even", background=even_bg)
         self.tree.tag_configure("odd", background=odd_bg)
 
+    def _set_busy(self, busy: bool):
+        if busy:
+            self.busy_bar.pack(side=tk.RIGHT)
+            self.busy_bar.start(15)
+        else:
+            self.busy_bar.stop()
+            self.busy_bar.pack_forget()
+        self.root.configure(cursor="watch" if busy else "")
+
+    def _writes_blocked(self, parent=None) -> bool:
+        if self._rotating:
+            messagebox.showinfo("Please wait", "The vault is being re-encrypted; try again when it finishes.",
+                                parent=parent or self.root)
+        return self._rotating
+
     def set_status(self, msg: str):
         self.status_var.set(msg)
         self.root.update_idletasks()
@@ -234,35 +323,67 @@ class PasswordManagerApp:
     # =========================
     #       DATA & TABLE
     # =========================
-    def load_passwords(self):
-        q = (self.search_var.get() or "").strip().lower()
-
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-
-        rows = list_passwords()
+    def _table_source(self):
+        q = (self.search_var.get() or "").strip()
         if q:
-            rows = [r for r in rows if q in str(r[1]).lower() or q in str(r[2]).lower()]
-
-        for i, pwd in enumerate(rows):
-            tag = "odd" if i % 2 else "even"
-            self.tree.insert("", tk.END, values=pwd, tags=(tag,))
+            # Indexed prefix search (FTS5), sorted in SQL when a sort is active; a
+            # query that narrows the previous one is filtered from the cached result set.
+            return ListSource(self._search_cache.results(q, order=self._sort_spec))
+        # Browsing pages through the table (in sort order) as the user scrolls
+        return VaultRowSource(self._sort_spec)
 
+    @traced("ui.load_passwords")
+    def load_passwords(self):
+        self.vtree.set_source(self._table_source())
         self.on_tree_select()
-        self.set_status(f"{len(rows)} item(s)")
-
-    def sort_by(self, colname: str, idx: int):
-        self._sort_state[colname] = not self._sort_state[colname]
-        reverse = self._sort_state[colname]
+        self.set_status(f"{self.vtree.total} item(s)")
+
+    @traced("ui.refresh_passwords")
+    def refresh_passwords(self):
+        """After a write: diff the rows on screen, keeping scroll position and selection."""
+        self._search_cache.invalidate()
+        if isinstance(self.vtree.window.source, VaultRowSource):
+            self.vtree.refresh()
+        else:
+            self.vtree.set_source(self._table_source(), keep_position=True)
+        self.on_tree_select()
+        self.set_status(f"{self.vtree.total} item(s)")
+
+    def sort_by(self, colname: str, add: bool = False):
+        """
+        Click: sort by `colname` alone (clicking the primary column again flips it).
+        Shift-click (add=True): append it as a tie-breaker, or flip it if already sorted on.
+        """
+        spec = self._sort_spec
+        current = dict(spec)
+        if add and colname in current:
+            self._sort_spec = [(c, (not d) if c == colname else d) for c, d in spec]
+        elif add:
+            self._sort_spec = spec + [(colname, False)]
+        else:
+            flip = bool(spec) and spec[0][0] == colname and not spec[0][1]
+            self._sort_spec = [(colname, flip)]
+        self._update_headings()
+        self.load_passwords()
 
-        rows = [(self.tree.set(k, colname), k) for k in self.tree.get_children("")]
+    def _on_heading_shift_click(self, event):
+        if self.tree.identify_region(event.x, event.y) != "heading":
+            return None
+        column = self.tree.identify_column(event.x)  # "#1", "#2", ...
         try:
-            rows.sort(key=lambda t: int(t[0]) if colname == "id" else t[0].lower(), reverse=reverse)
-        except Exception:
-            rows.sort(key=lambda t: t[0], reverse=reverse)
-
-        for i, (_, k) in enumerate(rows):
-            self.tree.move(k, "", i)
+            colname = self.tree["columns"][int(column[1:]) - 1]
+        except (ValueError, IndexError):
+            return None
+        self.sort_by(colname, add=True)
+        return "break"
+
+    def _update_headings(self):
+        rank = {c: (i, d) for i, (c, d) in enumerate(self._sort_spec)}
+        for col, label in self._HEADINGS.items():
+            if col in rank:
+                i, desc = rank[col]
+                label = f"{label} {'▼' if desc else '▲'}" + (f"{i + 1}" if len(rank) > 1 else "")
+            self.tree.heading(col, text=label)
 
     def on_tree_select(self, event=None):
         selected = self.tree.selection()
@@ -328,10 +449,12 @@ class PasswordManagerApp:
             if not title_entry.get().strip():
                 messagebox.showerror("Validation", "Title is required.", parent=dialog)
                 return
+            if self._writes_blocked(dialog):
+                return
             store_password(title_entry.get(), username_entry.get(), password_entry.get(), recovery_entry.get())
             self.show_toast("Saved", "Password stored")
             dialog.destroy()
-            self.load_passwords()
+            self.refresh_passwords()
 
         btns = ttk.Frame(dialog)
         btns.pack(pady=10)
@@ -440,10 +563,12 @@ class PasswordManagerApp:
         recovery_entry = ttk.Entry(dialog, width=40); recovery_entry.insert(0, details['recovery_codes']); recovery_entry.pack(**pad)
 
         def save_update():
+            if self._writes_blocked(dialog):
+                return
             update_password(entry_id, title_entry.get(), username_entry.get(), password_entry.get(), recovery_entry.get())
             self.show_toast("Saved", "Password updated")
             dialog.destroy()
-            self.load_passwords()
+            self.refresh_passwords()
 
         btns = ttk.Frame(dialog); btns.pack(pady=10)
         ttk.Button(btns, text="Save", command=save_update, bootstyle="success").pack(side=tk.LEFT, padx=6)
@@ -456,10 +581,12 @@ class PasswordManagerApp:
         if not selected:
             return
         entry_id = self.tree.item(selected[0], 'values')[0]
+        if self._writes_blocked():
+            return
         if messagebox.askyesno("Delete", "Are you sure you want to delete this entry?", parent=self.root):
             delete_password_entry(entry_id)
             self.show_toast("Deleted", "Entry removed")
-            self.load_passwords()
+            self.refresh_passwords()
 
     def copy_password(self):
         selected = self.tree.selection()
@@ -475,6 +602,26 @@ class PasswordManagerApp:
     # =========================
     #     SECURITY ACTIONS
     # =========================
+    def _start_record_sweep(self):
+        """Upgrade legacy Fernet tokens to binary records in the background, a batch at a time."""
+        if not DEFAULTS.records.sweep_on_unlock:
+            return
+
+        def done(upgraded):
+            if upgraded:
+                self.set_status(f"Upgraded {upgraded:,} entries to the compact record format")
+
+        self.runner.submit(upgrade_legacy_tokens, cancel=self._sweep_cancel, on_done=done,
+                           on_error=lambda e: self.set_status(f"Record upgrade stopped: {e}"))
+
+    def shutdown(self):
+        """Stop background work that holds the DB (called before the connections close)."""
+        self._sweep_cancel.set()
+
+    def _on_session_lock(self):
+        clear_entry_cache()
+        self.set_status("Session idle: cached entries cleared")
+
     def change_master_password_action(self):
         old_pw = simpledialog.askstring("Change Master Password", "Enter current master password:", show="*")
         if not old_pw:
@@ -485,27 +632,75 @@ class PasswordManagerApp:
             messagebox.showerror("Change Master Password", "New passwords do not match.", parent=self.root)
             return
 
-        try:
-            updated = rotate_master_password(
-                db_path=DB_FILE,
-                old_password=old_pw,
-                new_password=new1,
-                table_name="passwords",
-                encrypted_fields=("password",),  # extend when encrypting more columns
-                id_column="id",
-            )
-            messagebox.showinfo("Change Master Password", f"Re-encrypted {updated} row(s) under the new master password.", parent=self.root)
+        def done(_):
+            messagebox.showinfo("Change Master Password", "Master password changed.", parent=self.root)
             self.set_status("Master password changed")
-        except Exception as e:
-            messagebox.showerror("Change Master Password", f"Failed to rotate key: {e}", parent=self.root)
+
+        def failed(e):
+            messagebox.showerror("Change Master Password", f"Failed to change password: {e}", parent=self.root)
+            self.set_status("Ready")
+
+        # Only the data key is re-wrapped (two KDF runs, in parallel, off the Tk thread)
+        self.set_status("Changing master password…")
+        self.runner.submit(
+            rotate_master_password,
+            db_path=DB_FILE,
+            old_password=old_pw,
+            new_password=new1,
+            on_done=done, on_error=failed,
+        )
+
+    def rotate_data_key_action(self):
+        if self._rotating:
+            return
+        pw = simpledialog.askstring("Rotate Data Key", "Enter your master password:", show="*", parent=self.root)
+        if not pw:
+            return
+
+        def done(updated):
+            def installed(crypto):
+                set_crypto(crypto)
+                self._rotating = False
+                clear_entry_cache()
+                messagebox.showinfo("Rotate Data Key", f"Re-encrypted {updated} row(s) under a new data key.", parent=self.root)
+                self.set_status("Data key rotated")
+            # entries are now under the new key: switch this session to it
+            self.runner.submit(unlock_vault, DB_FILE, pw, on_done=installed, on_error=failed)
+
+        def failed(e):
+            self._rotating = False
+            messagebox.showerror("Rotate Data Key", f"Failed to rotate key: {e}", parent=self.root)
+            self.set_status("Ready")
+
+        def progress(done_rows, total, rate):
+            # worker thread: hand the numbers to Tk
+            self.runner.call_soon(self.set_status, f"Re-encrypting vault… {done_rows:,}/{total:,} rows ({rate:,.0f} rows/s)")
+
+        # Re-encrypting every row in committed chunks (resumes if interrupted); the
+        # session reads both keys meanwhile, edits are held back until it finishes.
+        # It writes binary records too, so the token sweeper is not needed meanwhile.
+        self._sweep_cancel.set()
+        self._rotating = True
+        self.set_status("Re-encrypting vault…")
+        self.runner.submit(
+            rotate_data_key,
+            db_path=DB_FILE,
+            master_password=pw,
+            table_name="passwords",
+            encrypted_fields=("password",),  # extend when encrypting more columns
+            id_column="id",
+            progress=progress,
+            on_key=set_crypto,
+            on_done=done, on_error=failed,
+        )
 
     def export_encrypted_action(self):
-        default_name = "vault.pmjson.enc"
+        default_name = "vault.pmx"
         out_path = filedialog.asksaveasfilename(
             title="Save Encrypted Export",
-            defaultextension=".pmjson.enc",
+            defaultextension=".pmx",
             initialfile=default_name,
-            filetypes=[("Encrypted Export", "*.pmjson.enc"), ("All Files", "*.*")]
+            filetypes=[("Encrypted Export", "*.pmx"), ("All Files", "*.*")]
         )
         if not out_path:
             return
@@ -518,25 +713,31 @@ class PasswordManagerApp:
             parent=self.root
         )
 
-        try:
-            if use_pass:
-                p1 = simpledialog.askstring("Export Passphrase", "Enter export passphrase:", show="*", parent=self.root)
-                p2 = simpledialog.askstring("Export Passphrase", "Confirm export passphrase:", show="*", parent=self.root)
-                if not p1 or p1 != p2:
-                    messagebox.showerror("Encrypted Export", "Passphrases do not match.", parent=self.root)
-                    return
-                out = export_encrypted(DB_FILE, table="passwords", out_path=out_path, master_password="", passphrase=p1)
-            else:
-                master = simpledialog.askstring("Master Password", "Enter your master password:", show="*", parent=self.root)
-                if not master:
-                    return
-                out = export_encrypted(DB_FILE, table="passwords", out_path=out_path, master_password=master)
+        if use_pass:
+            p1 = simpledialog.askstring("Export Passphrase", "Enter export passphrase:", show="*", parent=self.root)
+            p2 = simpledialog.askstring("Export Passphrase", "Confirm export passphrase:", show="*", parent=self.root)
+            if not p1 or p1 != p2:
+                messagebox.showerror("Encrypted Export", "Passphrases do not match.", parent=self.root)
+                return
+            kwargs = {"master_password": "", "passphrase": p1}
+        else:
+            master = simpledialog.askstring("Master Password", "Enter your master password:", show="*", parent=self.root)
+            if not master:
+                return
+            kwargs = {"master_password": master}
 
+        def done(out):
             self.show_toast("Exported", os.path.basename(out))
             messagebox.showinfo("Encrypted Export", f"Encrypted export created:\n{out}", parent=self.root)
             self.set_status(f"Encrypted export saved: {out}")
-        except Exception as e:
+
+        def failed(e):
             messagebox.showerror("Encrypted Export", f"Failed: {e}", parent=self.root)
+            self.set_status("Ready")
+
+        self.set_status("Writing encrypted export…")
+        self.runner.submit(export_encrypted, DB_FILE, table="passwords", out_path=out_path,
+                           on_done=done, on_error=failed, **kwargs)
 
     # =========================
     #   PASSWORD STRENGTH
@@ -574,7 +775,8 @@ class PasswordManagerApp:
             messagebox.showerror("Export Failed", f"An error occurred: {e}", parent=self.root)
 
 
-if __name__ == "__main__":
+def run_app():
+    setup_logger(DEFAULTS.logging.level, DEFAULTS.logging.rotate_mb, DEFAULTS.logging.keep_files)
     # Create themed window (light by default)
     root = Window(themename="morph")  # change theme string here if you prefer another ttkbootstrap theme
     root.geometry("900x650")
@@ -585,14 +787,36 @@ if __name__ == "__main__":
      # 🔧 Ensure the unlock dialog is always visible
     root.withdraw()                 # hide main window
     root.update_idletasks()
+    runner = BackgroundRunner(root, DEFAULTS.background.workers, DEFAULTS.background.poll_ms)
     try:
-        # run your vault setup/unlock (shows dialogs)
-        initialize_vault(root)
+        # run your vault setup/unlock (shows dialogs; Argon2 runs on the runner)
+        initialize_vault(root, runner=runner)
     finally:
         root.deiconify()            # show main window after unlock
         root.lift()                 # bring to front
         root.after(0, root.focus_force)
 
-    # Start UI
-    app = PasswordManagerApp(root)
-    root.mainloop()
+    # Start UI (metrics endpoint/file only if configured)
+    exporters = start_exporters()
+    app = PasswordManagerApp(root, runner=runner)
+    try:
+        root.mainloop()
+    finally:
+        app.shutdown()
+        runner.shutdown()
+        stop_exporters(exporters)
+        close_db_connections()
+        log_totals()  # while the log handlers are still attached
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Password Manager")
+    ap.add_argument("--profile", nargs="?", const="pm-profile.prof", metavar="FILE",
+                    help="run under cProfile (Tk thread) and write the stats to FILE on exit")
+    args = ap.parse_args()
+    if args.profile:
+        run_profiled(run_app, args.profile)
+        print(f"Profile written to {os.path.abspath(args.profile)}", file=sys.stderr)
+    else:
+        run_app()
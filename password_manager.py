@@ -129,26 +129,32 @@ def update_password(id, new_title, new_username, new_password, new_recovery_code
     conn.close()
     return True
 
-def migrate_up(data):
-    """Migrates passwords from a JSON file into the database."""
+def store_passwords_many(entries):
+    """Encrypts a batch of entries and inserts them with one executemany() in one transaction."""
+    now = datetime.now().isoformat()
+    rows = [
+        (item['title'], item['username'], f.encrypt(item['password'].encode()).decode(),
+         item['recovery_codes'], now)
+        for item in entries
+    ]
     conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("BEGIN TRANSACTION")
     try:
-        for item in data:
-            encrypted_password = f.encrypt(item['password'].encode()).decode()
-            cursor.execute("""
+        with conn:
+            conn.executemany("""
                 INSERT INTO passwords (title, username, password, recovery_codes, created_at)
                 VALUES (?, ?, ?, ?, ?)
-            """, (item['title'], item['username'], encrypted_password, item['recovery_codes'], datetime.now().isoformat()))
-        conn.commit()
+            """, rows)
+        return len(rows)
+    finally:
+        conn.close()
+
+def migrate_up(data):
+    """Migrates passwords from a JSON file into the database."""
+    try:
+        store_passwords_many(data)
         return "Migration successful!"
     except Exception as e:
-        conn.rollback()
         return f"Migration failed: {e}"
-    finally:
-        conn.close()
 
 def migrate_down():
     """Deletes all passwords from the database."""
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Non-interactive command line for the vault (pm_core + database.py).
+
+Results are JSON lines on stdout, one object per entry; errors go to stderr.
+`get` and `add` read batches from stdin (one id / JSON object per line), so
+one invocation, one unlock, handles thousands of entries.
+
+With an agent running for the vault (`pm.py agent`, see pm_core.agent) no
+password is needed and no key is derived; otherwise the master password
+comes from $PM_PASSWORD, else a prompt on the terminal. export, import and
+rotate always take the password (or an export passphrase) and derive their
+keys once, without unlocking the vault first.
+
+Usage:
+  python pm.py list [--order title] [--desc] [--limit N]
+  python pm.py search QUERY [--limit N]
+  python pm.py get 12 40                  # or: ... | python pm.py get
+  python pm.py add --title T [--username U] [--generate 20]
+  python pm.py add < entries.jsonl        # {"title", "username", "password", "recovery_codes"}
+  python pm.py export out.pmx [--passphrase-env VAR]
+  python pm.py import in.pmx [--replace] [--passphrase-env VAR]
+  python pm.py rotate [--data-key]        # new password: $PM_NEW_PASSWORD or prompt
+  python pm.py agent [--foreground]       # unlock once; later runs skip Argon2
+  python pm.py agent --stop
+"""
+import argparse
+import getpass
+import json
+import os
+import sqlite3
+import sys
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from cryptography.fernet import InvalidToken
+
+import database
+import encryption
+from pm_core.db import close_all
+from pm_core.export_import import export_encrypted, import_encrypted
+from pm_core.rotation import rotate_data_key, rotate_master_password
+from pm_core.settings_store import ensure_schema, unlock_vault
+
+PAGE_ROWS = 1000
+
+class CliError(Exception):
+    """Bad input; reported as `pm: error: ...` with exit status 2 (other failures exit 1)."""
+
+def _out(obj: Dict[str, Any]) -> None:
+    sys.stdout.write(json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+def _row(row) -> Dict[str, Any]:
+    return {"id": row[0], "title": row[1], "username": row[2]}
+
+def _secret(env: str, prompt: str, confirm: bool = False) -> str:
+    value = os.environ.get(env)
+    if value:
+        return value
+    value = getpass.getpass(prompt)
+    if confirm and getpass.getpass("Confirm: ") != value:
+        raise CliError("passwords do not match")
+    if not value:
+        raise CliError(f"no password (set ${env})")
+    return value
+
+def _check_vault(db_path: str) -> None:
+    if not os.path.exists(db_path):
+        raise CliError(f"no vault at {db_path} (create one with the app first)")
+    ensure_schema(db_path)
+
+def _prepare(db_path: str) -> None:
+    # no key needed: tables and migrations only
+    _check_vault(db_path)
+    database.DB_FILE = db_path
+    database.create_tables()
+
+def _open_vault(db_path: str, use_agent: bool = True) -> None:
+    """Set up database.py for the vault: through a running agent, or by unlocking here."""
+    _prepare(db_path)
+    crypto = None
+    if use_agent:
+        from pm_core import agent  # imported on use: the agent only runs where AF_UNIX exists
+        crypto = agent.connect(db_path)
+    if crypto is None:
+        crypto = unlock_vault(db_path, _master())
+    encryption.set_crypto(crypto)
+
+def _master() -> str:
+    return _secret("PM_PASSWORD", "Master password: ")
+
+def _stdin_lines() -> Iterator[tuple]:
+    for n, line in enumerate(sys.stdin, 1):
+        line = line.strip()
+        if line:
+            yield n, line
+
+def _stdin_ids() -> Iterator[int]:
+    for n, line in _stdin_lines():
+        try:
+            value = json.loads(line)
+            yield int(value["id"] if isinstance(value, dict) else value)
+        except (ValueError, KeyError, TypeError):
+            raise CliError(f"stdin line {n}: expected an id or {{\"id\": ...}}")
+
+def _stdin_entries() -> Iterator[Dict[str, Any]]:
+    for n, line in _stdin_lines():
+        try:
+            entry = json.loads(line)
+        except ValueError as e:
+            raise CliError(f"stdin line {n}: {e}")
+        if not isinstance(entry, dict) or not entry.get("title") or not entry.get("password"):
+            raise CliError(f"stdin line {n}: an entry needs title and password")
+        yield entry
+
+def _chunks(items: Iterable[Any], size: int) -> Iterator[list]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def cmd_list(args) -> int:
+    order = [(args.order, args.desc)] if args.order else None
+    left = args.limit if args.limit is not None else float("inf")
+    last = None
+    while left > 0:
+        page = database.list_passwords_page(int(min(PAGE_ROWS, left)), after=last, order=order)
+        for row in page:
+            _out(_row(row))
+        if len(page) < min(PAGE_ROWS, left):
+            break
+        left -= len(page)
+        last = page[-1]
+    return 0
+
+def cmd_search(args) -> int:
+    for row in database.search_passwords(args.query, limit=args.limit):
+        _out(_row(row))
+    return 0
+
+def cmd_get(args) -> int:
+    ids = args.ids or _stdin_ids()
+    missing = 0
+    for chunk in _chunks(ids, database.BATCH_SIZE):
+        found = {d["id"]: d for d in database.get_passwords_many(chunk)}
+        for i in chunk:
+            if i in found:
+                _out(found[i])
+            else:
+                missing += 1
+                _out({"id": i, "error": "not found"})
+    return 1 if missing else 0
+
+def cmd_add(args) -> int:
+    if args.title:
+        password = (encryption.generate_secure_password(args.generate) if args.generate
+                    else _secret("PM_ENTRY_PASSWORD", "Entry password: ", confirm=True))
+        entries = [{"title": args.title, "username": args.username, "password": password}]
+    else:
+        entries = _stdin_entries()
+    # one transaction: a bad line anywhere leaves the vault unchanged
+    for i in database.store_passwords_many(entries):
+        _out({"id": i})
+    return 0
+
+def _passphrase(args) -> Optional[str]:
+    if not args.passphrase_env:
+        return None
+    value = os.environ.get(args.passphrase_env)
+    if not value:
+        raise CliError(f"${args.passphrase_env} is empty")
+    return value
+
+def _progress(done: int, total: int, rate: float) -> None:
+    print(f"\r{done}/{total} rows ({rate:,.0f}/s)", end="", file=sys.stderr, flush=True)
+
+# export, import and rotate take the master password and derive the keys they
+# need themselves; main() does not unlock the vault for them first
+
+def cmd_export(args) -> int:
+    passphrase = _passphrase(args)
+    path = export_encrypted(args.db, "passwords", args.file, "" if passphrase else _master(), passphrase,
+                            version=args.format, compression=args.compression)
+    _out({"exported": path})
+    return 0
+
+def cmd_import(args) -> int:
+    passphrase = _passphrase(args)
+    count = import_encrypted(args.db, args.file, "" if passphrase else _master(), passphrase,
+                             merge=not args.replace, progress=_progress if args.progress else None)
+    if args.progress:
+        print(file=sys.stderr)
+    _out({"imported": count})
+    return 0
+
+def cmd_rotate(args) -> int:
+    # a running agent notices the new wrapped key and locks itself
+    master = _master()
+    if args.data_key:
+        rows = rotate_data_key(args.db, master, progress=_progress if args.progress else None)
+        _out({"rotated": "data_key", "rows": rows})
+    else:
+        new = _secret("PM_NEW_PASSWORD", "New master password: ", confirm=True)
+        rotate_master_password(args.db, master, new)
+        _out({"rotated": "master_password"})
+    return 0
+
+def cmd_agent(args) -> int:
+    from pm_core import agent
+    path = args.socket or agent.default_socket_path()
+    if args.stop:
+        try:
+            agent.AgentCrypto(path).lock()
+        except (OSError, ConnectionError, agent.AgentError):
+            _out({"stopped": False, "socket": path})
+            return 1
+        _out({"stopped": True, "socket": path})
+        return 0
+
+    _check_vault(args.db)
+    crypto = unlock_vault(args.db, _secret("PM_PASSWORD", "Master password: "))
+    if args.foreground or not hasattr(os, "fork"):
+        server = agent.Agent(crypto, args.db, path, idle_minutes=args.idle_minutes)
+        _out({"agent": path, "pid": os.getpid()})
+        sys.stdout.flush()
+        server.serve_forever()
+        return 0
+    # no SQLite connection or listening socket crosses the fork: the child
+    # opens and binds its own, then reports on the pipe
+    close_all()
+    sys.stdout.flush()
+    ready_r, ready_w = os.pipe()
+    pid = os.fork()
+    if pid:
+        os.close(ready_w)
+        with os.fdopen(ready_r, "rb") as f:
+            status = json.loads(f.read() or b'{"error": "agent exited before it was ready"}')
+        if "error" in status:
+            os.waitpid(pid, 0)
+            raise agent.AgentError(status["error"])
+        _out({"agent": path, "pid": pid})
+        return 0
+    # child: detach from the terminal and serve until idle/locked
+    code = 1
+    try:
+        os.close(ready_r)
+        os.setsid()
+        try:
+            server = agent.Agent(crypto, args.db, path, idle_minutes=args.idle_minutes)
+        except Exception as e:
+            os.write(ready_w, json.dumps({"error": str(e)}).encode("utf-8"))
+            return 1
+        os.write(ready_w, b"{}")
+        os.close(ready_w)
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in (0, 1, 2):
+            os.dup2(devnull, fd)
+        server.serve_forever()
+        code = 0
+    finally:
+        os._exit(code)
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="pm", description="Password manager command line (JSON lines out).")
+    ap.add_argument("--db", default=os.environ.get("PM_DB", database.DB_FILE), help="vault database (default: $PM_DB or passwords.db)")
+    ap.add_argument("--no-agent", action="store_true", help="unlock here even if an agent is running")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("list", help="entries as {id, title, username}")
+    p.add_argument("--order", choices=("id", "title", "username"))
+    p.add_argument("--desc", action="store_true")
+    p.add_argument("--limit", type=int)
+    p.set_defaults(run=cmd_list)
+
+    p = sub.add_parser("search", help="prefix search over title/username")
+    p.add_argument("query")
+    p.add_argument("--limit", type=int)
+    p.set_defaults(run=cmd_search)
+
+    p = sub.add_parser("get", help="decrypted entries by id (arguments, or one per stdin line)")
+    p.add_argument("ids", nargs="*", type=int)
+    p.set_defaults(run=cmd_get)
+
+    p = sub.add_parser("add", help="one entry (--title), or JSON lines from stdin")
+    p.add_argument("--title")
+    p.add_argument("--username")
+    p.add_argument("--generate", type=int, metavar="LENGTH", help="generate the password")
+    p.set_defaults(run=cmd_add)
+
+    for name, run in (("export", cmd_export), ("import", cmd_import)):
+        p = sub.add_parser(name, help=f"encrypted {name} (.pmx)")
+        p.add_argument("file")
+        p.add_argument("--passphrase-env", metavar="VAR", help="read the export passphrase from $VAR "
+                       "(default: the master password)")
+        p.set_defaults(run=run, unlock=False)
+    sub.choices["export"].add_argument("--format", type=int, choices=(1, 2), default=2)
+    sub.choices["export"].add_argument("--compression", help="pm_core.codecs name (default: DEFAULTS.export)")
+    sub.choices["import"].add_argument("--replace", action="store_true", help="delete existing entries first")
+    sub.choices["import"].add_argument("--progress", action="store_true", help="progress on stderr")
+
+    p = sub.add_parser("rotate", help="change the master password, or re-encrypt under a new data key")
+    p.add_argument("--data-key", action="store_true")
+    p.add_argument("--progress", action="store_true", help="progress on stderr")
+    p.set_defaults(run=cmd_rotate, unlock=False)
+
+    p = sub.add_parser("agent", help="unlock once and serve crypto on a Unix socket (like ssh-agent)")
+    p.add_argument("--socket", help="socket path (default: $PM_AGENT_SOCK or a per-user runtime dir)")
+    p.add_argument("--idle-minutes", type=float, help="exit after this long unused (default: DEFAULTS.session_lock)")
+    p.add_argument("--foreground", action="store_true", help="do not detach")
+    p.add_argument("--stop", action="store_true", help="tell the running agent to forget the key and exit")
+    return ap
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        if args.command == "agent":
+            return cmd_agent(args)
+        try:
+            if getattr(args, "unlock", True):
+                _open_vault(args.db, use_agent=not args.no_agent)
+            else:
+                _prepare(args.db)
+            return args.run(args)
+        finally:
+            sys.stdout.flush()
+            database.clear_entry_cache()
+            crypto = encryption.get_crypto()
+            if hasattr(crypto, "close"):  # an agent.AgentCrypto connection
+                crypto.close()
+            encryption.set_crypto(None)
+            close_all()
+    except CliError as e:
+        print(f"pm: error: {e}", file=sys.stderr)
+        return 2
+    except InvalidToken:
+        print("pm: error: a stored value does not decrypt with this vault's key (corrupted entry?)", file=sys.stderr)
+        return 1
+    except (OSError, RuntimeError, ValueError, sqlite3.Error) as e:
+        # wrong password (PermissionError), missing files, agent errors (AgentError),
+        # bad or foreign import files, ids that already exist on a merge import
+        print(f"pm: error: {e}", file=sys.stderr)
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,8 @@
 # Phase-1 security modules for password-manager
 __all__ = [
-    'config', 'kdf', 'settings_store', 'vault_crypto',
+    'config', 'db', 'kdf', 'settings_store', 'vault_crypto',
     'migration', 'clipboard', 'export_import', 'logging_setup',
-    'rotation'
+    'rotation', 'entry_cache', 'background',
+    'kdf_calibration', 'reencrypt', 'export_v2', 'import_pipeline',
+    'codecs', 'records', 'tracing', 'metrics', 'agent', 'aio'
 ]
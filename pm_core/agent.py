@@ -0,0 +1,351 @@
+"""
+Unlock agent: pays the Argon2 derivation once and serves crypto to local processes.
+
+    crypto = unlock_vault(db, pw)
+    Agent(crypto, db).serve_forever()          # pm.py agent
+    ...
+    crypto = connect(db) or unlock_vault(db, pw)   # any client
+
+Like ssh-agent, it listens on a Unix domain socket: in a directory that
+must be ours and 0700, the socket itself 0600, and (where the OS reports
+it) only peers with our uid are served; clients likewise only talk to an
+agent running as our uid. It holds the VaultCrypto in memory and forgets it, then
+exits, after DEFAULTS.session_lock.idle_minutes without a request, or as
+soon as the vault's wrapped keys change (master password change, data key
+rotation), so it never writes with a retired key.
+
+Requests are batched: one round trip encrypts or decrypts a whole list of
+values (records bound to entry ids, or Fernet tokens). Frames are binary,
+
+    u32 header length | JSON header | u32 count | (u32 length | bytes) * count
+
+so values travel without base64. AgentCrypto is the client side; it has the
+VaultCrypto methods database.py uses, so it drops in via encryption.set_crypto().
+"""
+import json
+import os
+import socket
+import socketserver
+import stat
+import struct
+import tempfile
+import threading
+import time
+from typing import List, Optional, Sequence, Tuple, Union
+
+from cryptography.fernet import InvalidToken
+
+from .config import DEFAULTS
+from .db import open_connection
+from .settings_store import PENDING_DEK_KEY, WRAPPED_DEK_KEY
+from .vault_crypto import VaultCrypto
+
+SOCKET_ENV = "PM_AGENT_SOCK"
+PROTOCOL = 1
+MAX_FRAME = 256 * 1024 * 1024
+
+_U32 = struct.Struct(">I")
+
+class AgentError(RuntimeError):
+    """The agent refused or failed a request (other than a bad key/ciphertext)."""
+
+def default_socket_path() -> str:
+    """$PM_AGENT_SOCK, else pm-agent.sock in $XDG_RUNTIME_DIR or a per-user temp dir."""
+    if os.environ.get(SOCKET_ENV):
+        return os.environ[SOCKET_ENV]
+    user = os.getuid() if hasattr(os, "getuid") else os.environ.get("USERNAME", "user")
+    base = os.environ.get("XDG_RUNTIME_DIR") or os.path.join(tempfile.gettempdir(), f"pm-agent-{user}")
+    return os.path.join(base, "pm-agent.sock")
+
+# ---- framing ----
+
+def _read_exact(f, n: int) -> bytes:
+    data = f.read(n)
+    if len(data) != n:
+        raise ConnectionError("agent connection closed")
+    return data
+
+def _send(sock: socket.socket, header: dict, blobs: Sequence[bytes] = ()) -> None:
+    head = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    parts = [_U32.pack(len(head)), head, _U32.pack(len(blobs))]
+    for b in blobs:
+        parts.append(_U32.pack(len(b)))
+        parts.append(b)
+    sock.sendall(b"".join(parts))
+
+def _recv(f) -> Tuple[dict, List[bytes]]:
+    size = 0
+
+    def take(n):
+        nonlocal size
+        size += n
+        if size > MAX_FRAME:
+            raise ConnectionError("agent frame too large")
+        return _read_exact(f, n)
+
+    header = json.loads(take(_U32.unpack(take(4))[0]).decode("utf-8"))
+    count = _U32.unpack(take(4))[0]
+    return header, [take(_U32.unpack(take(4))[0]) for _ in range(count)]
+
+# ---- ownership checks ----
+
+def _peer_uid(sock: socket.socket) -> Optional[int]:
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None  # not reported here; the 0700 directory is the guard
+    creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    return struct.unpack("3i", creds)[1]
+
+def _check_private(path: str, what: str, is_type) -> None:
+    """Raise AgentError unless path (not followed if a symlink) is of the given type, ours, and not group/other accessible."""
+    st = os.lstat(path)
+    if not is_type(st.st_mode):
+        raise AgentError(f"agent {what} {path} is not a {what} (or is a symlink)")
+    if st.st_uid != os.getuid():
+        raise AgentError(f"agent {what} {path} is owned by uid {st.st_uid}, not {os.getuid()}")
+    if st.st_mode & 0o077:
+        raise AgentError(f"agent {what} {path} is accessible to other users (mode {st.st_mode & 0o777:o})")
+
+def _private_dir(folder: str) -> None:
+    """Create folder 0700, or make sure an existing one is safe to put the socket in."""
+    os.makedirs(folder, mode=0o700, exist_ok=True)
+    _check_private(folder, "directory", stat.S_ISDIR)
+
+# ---- server ----
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: "_Server"
+
+    def handle(self):
+        uid = _peer_uid(self.request)
+        if uid is not None and uid != os.getuid():
+            return
+        agent = self.server.agent
+        while True:
+            try:
+                header, blobs = _recv(self.rfile)
+            except (ConnectionError, ValueError):
+                return
+            try:
+                reply, out = agent.dispatch(header, blobs)
+            except InvalidToken:
+                reply, out = {"error": "InvalidToken"}, []
+            except Exception as e:  # reported to the client, the agent keeps serving
+                reply, out = {"error": type(e).__name__, "message": str(e)}, []
+            _send(self.request, reply, out)
+            if header.get("op") == "lock":
+                return
+
+# socketserver has no UnixStreamServer where the OS has no AF_UNIX (Windows);
+# the module still imports there, so connect() can report "no agent"
+if hasattr(socketserver, "UnixStreamServer"):
+    class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+        agent: "Agent"
+else:
+    _Server = None
+
+class Agent:
+    def __init__(self, crypto: VaultCrypto, db_path: str, socket_path: Optional[str] = None,
+                 idle_minutes: Optional[float] = None):
+        self.db_path = os.path.realpath(db_path)
+        self.socket_path = socket_path or default_socket_path()
+        minutes = DEFAULTS.session_lock.idle_minutes if idle_minutes is None else idle_minutes
+        self.idle_seconds = minutes * 60.0  # 0 = never time out
+        if _Server is None:
+            raise AgentError("the agent needs Unix domain sockets, which this platform lacks")
+        self._crypto: Optional[VaultCrypto] = crypto
+        # PRAGMA data_version moves when another connection commits; only then
+        # are the key settings read again
+        self._conn = open_connection(db_path, check_same_thread=False)
+        self._conn_lock = threading.Lock()
+        self._data_version = None
+        self._keys = self._read_keys()
+        self._last = time.monotonic()
+        self._stopped = threading.Event()
+        try:
+            self._server = self._bind()
+        except BaseException:
+            self._conn.close()
+            raise
+
+    def _bind(self) -> "_Server":
+        _private_dir(os.path.dirname(self.socket_path) or ".")
+        if os.path.exists(self.socket_path):
+            if _ping(self.socket_path):
+                raise AgentError(f"an agent is already running on {self.socket_path}")
+            os.unlink(self.socket_path)  # stale, from an agent that died
+        old = os.umask(0o177)
+        try:
+            server = _Server(self.socket_path, _Handler)
+        finally:
+            os.umask(old)
+        os.chmod(self.socket_path, 0o600)
+        server.agent = self
+        return server
+
+    def _read_keys(self):
+        with self._conn_lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._data_version:
+                return self._keys
+            self._data_version = version
+            return self._conn.execute("SELECT key, value FROM settings WHERE key IN (?, ?) ORDER BY key",
+                                      (WRAPPED_DEK_KEY, PENDING_DEK_KEY)).fetchall()
+
+    def dispatch(self, header: dict, blobs: List[bytes]) -> Tuple[dict, List[bytes]]:
+        self._last = time.monotonic()
+        crypto, op = self._crypto, header.get("op")
+        if op == "hello":
+            return {"protocol": PROTOCOL, "db": self.db_path, "pid": os.getpid()}, []
+        if op == "lock":
+            threading.Thread(target=self.stop, daemon=True).start()
+            return {}, []
+        if crypto is None:
+            raise AgentError("agent is locked")
+        if self._read_keys() != self._keys:
+            self._crypto = None
+            threading.Thread(target=self.stop, daemon=True).start()
+            raise AgentError("vault keys changed; agent locked")
+        ids = header.get("ids") or []
+        if op == "encrypt_records":
+            return {}, crypto.encrypt_records(blobs, ids)
+        if op == "decrypt_records":
+            return {}, crypto.decrypt_records(blobs, ids, as_bytes=True)
+        if op == "encrypt_many":
+            return {}, crypto.encrypt_many(blobs)
+        if op == "decrypt_many":
+            return {}, crypto.decrypt_many(blobs, as_bytes=True)
+        raise AgentError(f"unknown op {op!r}")
+
+    def _watch_idle(self):
+        while not self._stopped.wait(min(self.idle_seconds, 5.0)):
+            if time.monotonic() - self._last >= self.idle_seconds:
+                self.stop()
+
+    def serve_forever(self) -> None:
+        """Serve until stop(), a client's lock request or the idle timeout."""
+        if self.idle_seconds > 0:
+            threading.Thread(target=self._watch_idle, name="pm-agent-idle", daemon=True).start()
+        try:
+            self._server.serve_forever(poll_interval=0.2)
+        finally:
+            self._crypto = None
+            self._server.server_close()
+            self._conn.close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def stop(self) -> None:
+        if not self._stopped.is_set():
+            self._stopped.set()
+            self._crypto = None  # forget the key right away
+            self._server.shutdown()
+
+# ---- client ----
+
+def _open(socket_path: str, timeout: Optional[float]) -> socket.socket:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+def _ping(socket_path: str) -> bool:
+    try:
+        _open(socket_path, 1.0).close()
+        return True
+    except OSError:
+        return False
+
+class AgentCrypto:
+    """VaultCrypto stand-in that forwards every batch to the agent over one connection."""
+
+    def __init__(self, socket_path: str, timeout: Optional[float] = 60.0):
+        self.socket_path = socket_path
+        self._sock = _open(socket_path, timeout)
+        try:
+            # before sending anything: the agent must run as us
+            uid = _peer_uid(self._sock)
+            if uid is None:
+                _check_private(socket_path, "socket", stat.S_ISSOCK)
+            elif uid != os.getuid():
+                raise AgentError(f"agent on {socket_path} runs as uid {uid}, not {os.getuid()}")
+        except BaseException:
+            self._sock.close()
+            raise
+        self._rfile = self._sock.makefile("rb")
+        self._lock = threading.Lock()
+        self.info, _ = self._call("hello")
+
+    def _call(self, op: str, blobs: Sequence[bytes] = (), **fields) -> Tuple[dict, List[bytes]]:
+        with self._lock:
+            _send(self._sock, {"op": op, **fields}, blobs)
+            reply, out = _recv(self._rfile)
+        if "error" in reply:
+            if reply["error"] == "InvalidToken":
+                raise InvalidToken
+            raise AgentError(reply.get("message") or reply["error"])
+        return reply, out
+
+    def close(self) -> None:
+        self._rfile.close()
+        self._sock.close()
+
+    def lock(self) -> None:
+        """Ask the agent to forget the key and exit."""
+        self._call("lock")
+        self.close()
+
+    @staticmethod
+    def _raw(values) -> List[bytes]:
+        return [v.encode("utf-8") if isinstance(v, str) else bytes(v) for v in values]
+
+    def encrypt_records(self, plaintexts: Sequence[Union[str, bytes]], entry_ids: Sequence[int],
+                        workers: int = 0) -> List[bytes]:
+        return self._call("encrypt_records", self._raw(plaintexts), ids=[int(i) for i in entry_ids])[1]
+
+    def decrypt_records(self, values: Sequence, entry_ids: Sequence[int], workers: int = 0,
+                        as_bytes: bool = False) -> List[Union[str, bytes]]:
+        out = self._call("decrypt_records", self._raw(values), ids=[int(i) for i in entry_ids])[1]
+        return out if as_bytes else [b.decode("utf-8") for b in out]
+
+    def encrypt_record(self, plaintext: Union[str, bytes], entry_id: int) -> bytes:
+        return self.encrypt_records([plaintext], [entry_id])[0]
+
+    def decrypt_record(self, value, entry_id: int, as_bytes: bool = False) -> Union[str, bytes]:
+        return self.decrypt_records([value], [entry_id], as_bytes=as_bytes)[0]
+
+    def encrypt_many(self, plaintexts, workers: int = 0) -> List[bytes]:
+        return self._call("encrypt_many", self._raw(plaintexts))[1]
+
+    def decrypt_many(self, tokens, workers: int = 0, as_bytes: bool = False) -> List[Union[str, bytes]]:
+        out = self._call("decrypt_many", self._raw(tokens))[1]
+        return out if as_bytes else [b.decode("utf-8") for b in out]
+
+    def encrypt_text(self, plaintext: str) -> bytes:
+        return self.encrypt_many([plaintext])[0]
+
+    def decrypt_text(self, token) -> str:
+        return self.decrypt_many([token])[0]
+
+def connect(db_path: str, socket_path: Optional[str] = None) -> Optional[AgentCrypto]:
+    """
+    AgentCrypto for the agent serving db_path, or None when no agent runs
+    there (or it serves another vault): the caller then unlocks directly.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    path = socket_path or default_socket_path()
+    if not os.path.exists(path):
+        return None
+    try:
+        client = AgentCrypto(path)
+    except (OSError, ConnectionError, AgentError):
+        return None
+    if client.info.get("db") != os.path.realpath(db_path):
+        client.close()
+        return None
+    return client
@@ -0,0 +1,253 @@
+"""
+asyncio facade over a vault.
+
+    vault = await AsyncVault.open("passwords.db", master_password)
+    entry = await vault.get(42)                      # dict as database.get_password_details, or None
+    async for row in vault.iter_entries(): ...       # id order, next page read ahead
+    ids = await vault.store_many([{"title": ..., "username": ..., "password": ...}])
+    await vault.close()                              # or: async with await AsyncVault.open(...)
+
+Nothing blocks the event loop. SQLite runs on one dedicated thread with its
+own connection, AES on a small crypto pool, and the Argon2 unlock in the
+loop's default executor. get() calls coalesce: lookups made before the loop
+next gets round to it are answered by one IN (...) query and one
+decrypt_records() batch, and concurrent lookups of one id share a future.
+At most `max_concurrency` batches are in flight; the rest wait their turn,
+so a service can fan out thousands of gets at once. store_many() encrypts on
+the pool before taking the write lock and retries with fresh ids if another
+writer claimed them in the meantime.
+"""
+import asyncio
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Mapping, Optional, Sequence, Set
+
+from cryptography.fernet import InvalidToken
+
+from .db import open_connection, transaction
+from .schema import INSERT_WITH_ID_SQL, MAX_ID_SQL, PASSWORDS_TABLE_SQL, to_epoch, upgrade
+from .settings_store import ensure_schema, unlock_vault
+
+_COLUMNS = "id, title, username, password, recovery_codes, created_at"
+_BY_IDS_SQL = f"SELECT {_COLUMNS} FROM passwords WHERE id IN ({{}})"
+_PAGE_SQL = f"SELECT {_COLUMNS} FROM passwords WHERE id > ? ORDER BY id LIMIT ?"
+
+def _entry(row, password=None) -> Dict[str, Any]:
+    out = {"id": row[0], "title": row[1], "username": row[2], "recovery_codes": row[4], "created_at": row[5]}
+    if password is not None:
+        out["password"] = password
+    return out
+
+class AsyncVault:
+    def __init__(self, db_path: str, crypto, max_concurrency: int = 8, batch_size: int = 500,
+                 crypto_workers: Optional[int] = None):
+        """`crypto` is an unlocked VaultCrypto (or pm_core.agent.AgentCrypto); see open()."""
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self._crypto = crypto
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db = ThreadPoolExecutor(1, thread_name_prefix="pm-aio-db")
+        self._pool = ThreadPoolExecutor(crypto_workers or min(4, os.cpu_count() or 1),
+                                        thread_name_prefix="pm-aio-crypto")
+        self._limit = asyncio.Semaphore(max_concurrency)
+        self._waiting: Dict[int, asyncio.Future] = {}   # not yet sent to the db thread
+        self._loading: Dict[int, asyncio.Future] = {}   # in a batch being read
+        self._flush_scheduled = False
+        self._tasks: Set[asyncio.Task] = set()
+        self._closed = False
+
+    @classmethod
+    async def open(cls, db_path: str, master_password: str, **kwargs) -> "AsyncVault":
+        """Unlock (off the loop) and prepare the passwords table; kwargs go to the constructor."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, ensure_schema, db_path)
+        crypto = await loop.run_in_executor(None, unlock_vault, db_path, master_password)
+        vault = cls(db_path, crypto, **kwargs)
+        await vault._on_db(vault._prepare)
+        return vault
+
+    async def __aenter__(self) -> "AsyncVault":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    # ---- plumbing ----
+
+    def _on_db(self, fn, *args):
+        if self._closed:
+            raise RuntimeError("AsyncVault is closed")
+        return asyncio.get_running_loop().run_in_executor(self._db, fn, *args)
+
+    def _on_pool(self, fn, *args):
+        return asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+
+    def _prepare(self) -> None:
+        self._conn = open_connection(self.db_path)  # created on, and only used by, the db thread
+        self._conn.execute(PASSWORDS_TABLE_SQL)
+        upgrade(self._conn)
+
+    def _fetch_ids(self, ids: Sequence[int]) -> List[tuple]:
+        return self._conn.execute(_BY_IDS_SQL.format(",".join("?" * len(ids))), ids).fetchall()
+
+    def _fetch_page(self, after: int, limit: int) -> List[tuple]:
+        return self._conn.execute(_PAGE_SQL, (after, limit)).fetchall()
+
+    def _decrypt(self, rows: Sequence[tuple]) -> List[Any]:
+        """Plaintext per row; a row that fails to decrypt gets its exception instead of failing the batch."""
+        try:
+            return self._crypto.decrypt_records([r[3] for r in rows], [r[0] for r in rows])
+        except InvalidToken:
+            out: List[Any] = []
+            for r in rows:
+                try:
+                    out.append(self._crypto.decrypt_record(r[3], r[0]))
+                except InvalidToken as e:
+                    out.append(e)
+            return out
+
+    # ---- lookups ----
+
+    def _lookup(self, entry_id: int) -> asyncio.Future:
+        """The shared future for entry_id, queued for the next batch if none is pending."""
+        fut = self._waiting.get(entry_id) or self._loading.get(entry_id)
+        if fut is None:
+            loop = asyncio.get_running_loop()
+            fut = self._waiting[entry_id] = loop.create_future()
+            if not self._flush_scheduled:
+                self._flush_scheduled = True
+                loop.call_soon(self._flush)
+        return fut
+
+    async def get(self, entry_id: int) -> Optional[Dict[str, Any]]:
+        """Decrypted entry, or None; raises InvalidToken if its value does not decrypt."""
+        # shielded: one caller giving up must not cancel the others' lookup
+        return await asyncio.shield(self._lookup(int(entry_id)))
+
+    async def get_many(self, entry_ids: Iterable[int]) -> List[Optional[Dict[str, Any]]]:
+        """get() for many ids at once, without a task per id."""
+        futs = [self._lookup(int(i)) for i in entry_ids]
+        if futs:
+            await asyncio.wait(set(futs))  # does not cancel the shared futures if we are cancelled
+        return [f.result() for f in futs]
+
+    def _flush(self) -> None:
+        self._flush_scheduled = False
+        waiting, self._waiting = self._waiting, {}
+        ids = list(waiting)
+        for i in range(0, len(ids), self.batch_size):
+            batch = {k: waiting[k] for k in ids[i:i + self.batch_size]}
+            self._loading.update(batch)
+            task = asyncio.ensure_future(self._load(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _load(self, batch: Dict[int, asyncio.Future]) -> None:
+        try:
+            async with self._limit:
+                rows = await self._on_db(self._fetch_ids, list(batch))
+                plain = await self._on_pool(self._decrypt, rows) if rows else []
+        except BaseException as e:
+            cancelled = isinstance(e, asyncio.CancelledError)
+            for fut in batch.values():
+                if fut.done():
+                    continue
+                if cancelled:
+                    fut.cancel()
+                else:
+                    fut.set_exception(e)
+            if cancelled:
+                raise
+        else:
+            found = {r[0]: (r, p) for r, p in zip(rows, plain)}
+            for entry_id, fut in batch.items():
+                if fut.done():
+                    continue
+                hit = found.get(entry_id)
+                if hit is None:
+                    fut.set_result(None)
+                elif isinstance(hit[1], Exception):
+                    fut.set_exception(hit[1])
+                else:
+                    fut.set_result(_entry(*hit))
+        finally:
+            for entry_id, fut in batch.items():
+                if self._loading.get(entry_id) is fut:
+                    del self._loading[entry_id]
+
+    async def _page(self, after: int, limit: int, decrypt: bool) -> List[Dict[str, Any]]:
+        async with self._limit:
+            rows = await self._on_db(self._fetch_page, after, limit)
+            if not decrypt:
+                return [_entry(r) for r in rows]
+            plain = await self._on_pool(self._decrypt, rows)
+        for p in plain:
+            if isinstance(p, Exception):
+                raise p
+        return [_entry(r, p) for r, p in zip(rows, plain)]
+
+    async def iter_entries(self, page_size: int = 500, decrypt: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Every entry in id order (with "password" when decrypt=True). The next
+        page is read and decrypted while the caller works through this one.
+        """
+        ahead = asyncio.ensure_future(self._page(-1, page_size, decrypt))
+        try:
+            while ahead is not None:
+                page = await ahead
+                ahead = None
+                if len(page) == page_size:
+                    ahead = asyncio.ensure_future(self._page(page[-1]["id"], page_size, decrypt))
+                for entry in page:
+                    yield entry
+        finally:
+            if ahead is not None:
+                ahead.cancel()
+
+    # ---- writes ----
+
+    def _next_id(self) -> int:
+        return self._conn.execute(MAX_ID_SQL).fetchone()[0] + 1
+
+    def _insert(self, first: int, entries: List[Mapping[str, Any]], values: List[bytes]) -> bool:
+        """Insert under ids first.. unless another writer got there first (then False, nothing written)."""
+        now = datetime.now().isoformat()
+        with transaction(self._conn):
+            if self._next_id() != first:
+                return False
+            self._conn.executemany(INSERT_WITH_ID_SQL, [
+                (i, e["title"], e.get("username"), v, e.get("recovery_codes"),
+                 e.get("created_at") or now, to_epoch(e.get("created_at") or now))
+                for i, e, v in zip(range(first, first + len(entries)), entries, values)
+            ])
+        return True
+
+    async def store_many(self, entries: Iterable[Mapping[str, Any]]) -> List[int]:
+        """Insert entries (title, username, password, optional recovery_codes/created_at) in one transaction; returns their ids."""
+        entries = list(entries)
+        if not entries:
+            return []
+        plain = [e["password"] for e in entries]
+        async with self._limit:
+            while True:
+                # Records are bound to their ids: pick them, encrypt on the pool
+                # with no write lock held, then insert if they are still free
+                first = await self._on_db(self._next_id)
+                ids = list(range(first, first + len(entries)))
+                values = await self._on_pool(self._crypto.encrypt_records, plain, ids)
+                if await self._on_db(self._insert, first, entries, values):
+                    return ids
+
+    async def close(self) -> None:
+        """Finish lookups in flight, then close the connection and threads."""
+        if self._closed:
+            return
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._conn is not None:
+            await self._on_db(self._conn.close)
+        self._closed = True
+        self._db.shutdown(wait=False)
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,124 @@
+"""
+Background executor for slow crypto (Argon2 key derivation, bulk Fernet).
+
+Work runs on a thread pool: argon2-cffi and OpenSSL release the GIL, and
+the jobs are closures over app state and the process-wide crypto object, so
+they could not run in a worker process anyway. Tk is not thread-safe, so
+results are never delivered from the worker: completed futures are queued
+and the Tk thread picks them up with a root.after() poll, then calls the
+on_done / on_error callbacks. `on_busy(True/False)` fires when the first
+job starts and when the last one finishes, for a busy indicator.
+"""
+import queue
+import sys
+import threading
+import tkinter as tk
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+class BackgroundRunner:
+    def __init__(self, root: tk.Misc, workers: int = 2, poll_ms: int = 30,
+                 on_busy: Optional[Callable[[bool], None]] = None):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.on_busy = on_busy
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pm-bg")
+        self._done: "queue.Queue[tuple]" = queue.Queue()
+        self._calls: "queue.Queue[tuple]" = queue.Queue()
+        self._pending = 0
+        self._poll_id = None
+        self._tk_thread = threading.get_ident()
+
+    @property
+    def busy(self) -> bool:
+        return self._pending > 0
+
+    def submit(self, fn: Callable, *args,
+               on_done: Optional[Callable[[Any], None]] = None,
+               on_error: Optional[Callable[[BaseException], None]] = None, **kwargs) -> Future:
+        """Run fn(*args, **kwargs) off the Tk thread; callbacks run on the Tk thread."""
+        future = self._executor.submit(fn, *args, **kwargs)
+        self._pending += 1
+        if self._pending == 1 and self.on_busy:
+            self.on_busy(True)
+        # Runs on the worker thread: only queue it.
+        future.add_done_callback(lambda f: self._done.put((f, on_done, on_error)))
+        if self._poll_id is None:
+            self._poll_id = self.root.after(self.poll_ms, self._poll)
+        return future
+
+    def call_soon(self, fn: Callable, *args) -> None:
+        """
+        Thread-safe: run fn(*args) on the Tk thread at the next poll, e.g. progress
+        updates from a running job. Called on the Tk thread it starts a poll if
+        none is scheduled; from other threads (root.after is Tk-thread only) it
+        relies on the poll kept alive by a pending job or the next submit().
+        """
+        self._calls.put((fn, args))
+        if self._poll_id is None and threading.get_ident() == self._tk_thread:
+            self._poll_id = self.root.after(self.poll_ms, self._poll)
+
+    def wait(self, future: Future) -> Any:
+        """
+        Block the caller until `future` finishes while Tk keeps processing events
+        (repaints, dialogs). For flows that need the result inline, e.g. unlocking
+        the vault before mainloop() starts.
+        """
+        flag = tk.BooleanVar(master=self.root, value=False)
+
+        def _check():
+            if future.done():
+                flag.set(True)
+            else:
+                self.root.after(self.poll_ms, _check)
+
+        _check()
+        if not future.done():
+            self.root.wait_variable(flag)
+        return future.result()
+
+    def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """submit() + wait(): returns fn's result or raises its exception."""
+        return self.wait(self.submit(fn, *args, **kwargs))
+
+    def _poll(self) -> None:
+        self._poll_id = None
+        while True:
+            try:
+                fn, args = self._calls.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                fn(*args)
+            except Exception:
+                self.root.report_callback_exception(*sys.exc_info())
+        while True:
+            try:
+                future, on_done, on_error = self._done.get_nowait()
+            except queue.Empty:
+                break
+            self._pending -= 1
+            if self._pending == 0 and self.on_busy:
+                self.on_busy(False)
+            try:
+                exc = future.exception()
+                if exc is not None:
+                    if on_error:
+                        on_error(exc)
+                elif on_done:
+                    on_done(future.result())
+            except Exception:
+                # same reporting as any other Tk callback; keep draining the queue
+                self.root.report_callback_exception(*sys.exc_info())
+        # A worker may have queued a call_soon() after the drain above
+        if self._poll_id is None and (self._pending or not self._calls.empty()):
+            self._poll_id = self.root.after(self.poll_ms, self._poll)
+
+    def shutdown(self, wait: bool = False) -> None:
+        if self._poll_id is not None:
+            try:
+                self.root.after_cancel(self._poll_id)
+            except tk.TclError:
+                pass
+            self._poll_id = None
+        self._executor.shutdown(wait=wait)
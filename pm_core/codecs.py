@@ -0,0 +1,85 @@
+"""
+Compression codecs for encrypted exports.
+
+A codec turns chunk plaintext into compressed bytes before encryption. It is
+used through stateful objects so that it can stream: in stream mode one
+compressor runs across all chunks of an export (the window carries over and
+repeated values compress across chunk boundaries); otherwise a fresh one is
+made per chunk, so each chunk decompresses on its own. Either way every
+chunk's output is flushed and complete, ready to be sealed.
+
+Built in: "none" and "zlib". Others can be added with register_codec().
+"""
+import zlib
+from typing import Dict, Optional, Protocol
+
+class Compressor(Protocol):
+    def compress(self, data: bytes) -> bytes: ...
+
+class Decompressor(Protocol):
+    def decompress(self, data: bytes) -> bytes: ...
+
+class Codec(Protocol):
+    name: str
+    default_level: Optional[int]
+    def compressor(self, level: Optional[int]) -> Compressor: ...
+    def decompressor(self) -> Decompressor: ...
+
+class _Identity:
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def decompress(self, data: bytes) -> bytes:
+        return data
+
+class NoneCodec:
+    name = "none"
+    default_level = None
+
+    def compressor(self, level: Optional[int]) -> Compressor:
+        return _Identity()
+
+    def decompressor(self) -> Decompressor:
+        return _Identity()
+
+class _ZlibCompressor:
+    def __init__(self, level: int):
+        self._c = zlib.compressobj(level)
+
+    def compress(self, data: bytes) -> bytes:
+        # Sync flush ends the chunk on a byte boundary without closing the stream
+        return self._c.compress(data) + self._c.flush(zlib.Z_SYNC_FLUSH)
+
+class _ZlibDecompressor:
+    def __init__(self):
+        self._d = zlib.decompressobj()
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._d.decompress(data)
+
+class ZlibCodec:
+    name = "zlib"
+    default_level = 6
+
+    def compressor(self, level: Optional[int]) -> Compressor:
+        return _ZlibCompressor(self.default_level if level is None else level)
+
+    def decompressor(self) -> Decompressor:
+        return _ZlibDecompressor()
+
+_CODECS: Dict[str, Codec] = {}
+
+def register_codec(codec: Codec) -> None:
+    _CODECS[codec.name] = codec
+
+def get_codec(name: str) -> Codec:
+    try:
+        return _CODECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown compression codec {name!r}") from None
+
+def available_codecs():
+    return sorted(_CODECS)
+
+register_codec(NoneCodec())
+register_codec(ZlibCodec())
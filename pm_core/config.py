@@ -21,6 +21,9 @@ class ClipboardCfg:
 class ExportCfg:
     encrypted_default: bool = True
     allow_plaintext_with_confirmation: bool = True
+    compression: str = "zlib"        # pm_core.codecs name; "none" to disable
+    compression_level: int = 6
+    compression_stream: bool = False # one stream across chunks (better ratio, sequential reads)
 
 @dataclass(frozen=True)
 class LoggingCfg:
@@ -43,6 +46,50 @@ class KdfParams:
     scrypt_r: int = 8
     scrypt_p: int = 1
     salt_bytes: int = 16
+    # Calibration (pm_core.kdf_calibration): tune Argon2id to this unlock time
+    calibrate: bool = True
+    target_unlock_ms: int = 500
+    min_memory_kib: int = 19456      # 19 MiB floor
+    max_memory_kib: int = 1048576    # 1 GiB cap
+
+@dataclass(frozen=True)
+class DatabaseCfg:
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    cache_size_kib: int = 16384      # PRAGMA cache_size = -N (KiB per connection)
+    mmap_size_mb: int = 128
+    temp_store: str = "MEMORY"
+    busy_timeout_ms: int = 30000
+    cached_statements: int = 256     # sqlite3 prepared-statement cache per connection
+    pool_size: int = 4               # idle connections kept for worker threads
+
+@dataclass(frozen=True)
+class UiCfg:
+    virtual_list: bool = True        # insert only the visible rows into the Treeview
+    page_margin_rows: int = 100      # rows buffered above/below the visible window
+    search_debounce_ms: int = 150    # wait this long after the last keystroke
+
+@dataclass(frozen=True)
+class EntryCacheCfg:
+    max_entries: int = 32            # decrypted entries kept in memory
+    ttl_seconds: int = 30            # 0 disables the cache
+
+@dataclass(frozen=True)
+class BackgroundCfg:
+    workers: int = 2                 # KDF / bulk crypto jobs run off the Tk thread
+    poll_ms: int = 30                # how often the Tk thread collects finished jobs
+
+@dataclass(frozen=True)
+class RecordsCfg:
+    sweep_on_unlock: bool = True     # upgrade Fernet tokens to binary records in the background
+    sweep_batch_rows: int = 500      # rows per write lock while sweeping
+
+@dataclass(frozen=True)
+class MetricsCfg:
+    http_port: int = 0               # >0: Prometheus text at http://<http_host>:<port>/metrics
+    http_host: str = "127.0.0.1"     # must be a loopback address
+    file_path: str = ""              # non-empty: rewrite this file every flush_seconds
+    flush_seconds: int = 15
 
 @dataclass(frozen=True)
 class Defaults:
@@ -53,5 +100,11 @@ class Defaults:
     logging: LoggingCfg = LoggingCfg()
     crash_report: CrashReportCfg = CrashReportCfg()
     kdf: KdfParams = KdfParams()
+    database: DatabaseCfg = DatabaseCfg()
+    ui: UiCfg = UiCfg()
+    entry_cache: EntryCacheCfg = EntryCacheCfg()
+    background: BackgroundCfg = BackgroundCfg()
+    records: RecordsCfg = RecordsCfg()
+    metrics: MetricsCfg = MetricsCfg()
 
 DEFAULTS = Defaults()
@@ -0,0 +1,135 @@
+"""
+Shared SQLite connection layer.
+
+- open_connection(): one connection with the configured pragma profile applied.
+- ConnectionManager: a long-lived connection per thread plus a small pool of
+  connections that worker threads can borrow, all for one database file.
+- get_manager(): process-wide manager registry keyed by database path.
+
+Connections run in autocommit mode (isolation_level=None); use transaction()
+to group several statements into one commit.
+"""
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from .config import DEFAULTS, DatabaseCfg
+
+def apply_pragmas(conn: sqlite3.Connection, profile: Optional[DatabaseCfg] = None) -> None:
+    p = profile or DEFAULTS.database
+    conn.execute(f"PRAGMA journal_mode={p.journal_mode};")
+    conn.execute(f"PRAGMA synchronous={p.synchronous};")
+    conn.execute(f"PRAGMA cache_size=-{int(p.cache_size_kib)};")
+    conn.execute(f"PRAGMA mmap_size={int(p.mmap_size_mb) * 1024 * 1024};")
+    conn.execute(f"PRAGMA temp_store={p.temp_store};")
+    conn.execute(f"PRAGMA busy_timeout={int(p.busy_timeout_ms)};")
+
+def open_connection(
+    db_path: str,
+    profile: Optional[DatabaseCfg] = None,
+    check_same_thread: bool = True,
+) -> sqlite3.Connection:
+    p = profile or DEFAULTS.database
+    conn = sqlite3.connect(
+        db_path,
+        isolation_level=None,
+        timeout=p.busy_timeout_ms / 1000.0,
+        cached_statements=p.cached_statements,
+        check_same_thread=check_same_thread,
+    )
+    apply_pragmas(conn, p)
+    return conn
+
+@contextmanager
+def transaction(conn: sqlite3.Connection, mode: str = "IMMEDIATE") -> Iterator[sqlite3.Connection]:
+    """BEGIN/COMMIT around the block, ROLLBACK on error. Joins an already open transaction."""
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute(f"BEGIN {mode}")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+class ConnectionManager:
+    def __init__(self, db_path: str, profile: Optional[DatabaseCfg] = None):
+        self.db_path = db_path
+        self.profile = profile or DEFAULTS.database
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._owned: List[sqlite3.Connection] = []
+        self._pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+
+    def _open(self) -> sqlite3.Connection:
+        # Thread ownership is enforced by the manager itself (thread-local slot or
+        # pool checkout), so sqlite3's own same-thread check is disabled; this lets
+        # close() tear down connections created on other threads.
+        return open_connection(self.db_path, self.profile, check_same_thread=False)
+
+    def connection(self) -> sqlite3.Connection:
+        """Long-lived connection for the calling thread. Do not close it."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            with self._lock:
+                self._owned.append(conn)
+        return conn
+
+    @contextmanager
+    def pooled(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection for a short-lived worker task."""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._open()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            if self._pool.qsize() < self.profile.pool_size:
+                self._pool.put(conn)
+            else:
+                conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            owned, self._owned = self._owned, []
+        for conn in owned:
+            conn.close()
+        self._local = threading.local()
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+_MANAGERS: Dict[str, ConnectionManager] = {}
+_MANAGERS_LOCK = threading.Lock()
+
+def _key(db_path: str) -> str:
+    return db_path if db_path == ":memory:" else os.path.abspath(db_path)
+
+def get_manager(db_path: str) -> ConnectionManager:
+    key = _key(db_path)
+    mgr = _MANAGERS.get(key)
+    if mgr is None:
+        with _MANAGERS_LOCK:
+            mgr = _MANAGERS.get(key)
+            if mgr is None:
+                mgr = _MANAGERS[key] = ConnectionManager(db_path)
+    return mgr
+
+def close_all() -> None:
+    with _MANAGERS_LOCK:
+        managers = list(_MANAGERS.values())
+        _MANAGERS.clear()
+    for mgr in managers:
+        mgr.close()
@@ -0,0 +1,56 @@
+"""
+Short-lived LRU cache of decrypted entries.
+
+Viewing, copying and opening an entry for update usually hit the same id
+back-to-back; caching the decrypted details skips both the SELECT and the
+Fernet decrypt. Entries expire after a short TTL, the cache holds at most
+`max_entries`, and it is flushed whenever the session locks.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+class EntryCache:
+    def __init__(self, max_entries: int = 32, ttl_seconds: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max(0, max_entries)
+        self.ttl = ttl_seconds
+        self._clock = clock
+        self._items: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """A copy of the cached entry, or None when absent or expired."""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[0] <= self._clock():
+                if item is not None:
+                    del self._items[key]
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return dict(item[1])
+
+    def put(self, key: Hashable, value: Dict[str, Any]) -> None:
+        if not self.max_entries or self.ttl <= 0:
+            return
+        with self._lock:
+            self._items[key] = (self._clock() + self.ttl, dict(value))
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
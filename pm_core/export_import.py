@@ -1,12 +1,36 @@
 import base64
+import hashlib
+import itertools
 import json
 import os
 import sqlite3
-from typing import Optional, Dict, Any, List
-from .settings_store import _connect, unlock_vault
+import threading
+from typing import Optional, Dict, Any, Iterator, List
+from . import export_v2
+from .config import DEFAULTS
+from .import_pipeline import load_rows, prefetch
+from .reencrypt import Progress
+from .settings_store import _connect, get_setting, unlock_vault
 from .kdf import derive_fernet_key
+from .metrics import counter, histogram
 from .vault_crypto import VaultCrypto
 
+_ROWS = counter("pm_transfer_rows_total", "Rows written by encrypted export / read by import", ("op", "format"))
+_SECONDS = histogram("pm_transfer_seconds", "Encrypted export/import duration", ("op", "format"),
+                     buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0))
+
+def _vault_key_id(conn: sqlite3.Connection) -> Optional[str]:
+    # The canary is a token under the data key, replaced on data key rotation:
+    # its hash names the key without revealing anything about it
+    canary = get_setting(conn, "canary")
+    return hashlib.sha256(canary).hexdigest()[:32] if canary else None
+
+def _check_vault_key(conn: sqlite3.Connection, exported: Optional[str]) -> None:
+    here = _vault_key_id(conn)
+    if exported and here and exported != here:
+        raise ValueError("This export comes from another vault (or predates a data key rotation): "
+                         "its passwords are encrypted under that vault's key and cannot be read here")
+
 def _read_all_rows(conn: sqlite3.Connection, table: str) -> List[Dict[str, Any]]:
     rows = conn.execute(f"SELECT * FROM {table}").fetchall()
     col_names = [d[1] for d in conn.execute(f"PRAGMA table_info({table})")]
@@ -15,20 +39,72 @@ def _read_all_rows(conn: sqlite3.Connection, table: str) -> List[Dict[str, Any]]
         obj = {}
         for name, val in zip(col_names, r):
             if isinstance(val, bytes):
-                obj[name] = base64.b64encode(val).decode('ascii')
+                obj[name] = {"b64": base64.b64encode(val).decode('ascii')}
             else:
                 obj[name] = val
         result.append(obj)
     return result
 
-def export_encrypted(db_path: str, table: str, out_path: str, master_password: str, passphrase: Optional[str] = None) -> str:
+def _export_v2(db_path: str, table: str, out_path: str, master_password: str, passphrase: Optional[str],
+               compression: Optional[str]) -> str:
+    if passphrase:
+        password = passphrase
+        kdf_params = {"primary": "argon2id", "argon2_memory_kib": 65536, "argon2_time_cost": 3, "argon2_parallelism": 2}
+    else:
+        unlock_vault(db_path, master_password)  # verifies the master password
+        password = master_password
+        conn = _connect(db_path)
+        try:
+            kdf_params = json.loads(get_setting(conn, "kdf_params").decode("utf-8"))
+        finally:
+            conn.close()
+
+    # Written next to the target and renamed at the end: no half-written exports
+    tmp_path = out_path + ".part"
+    conn = _connect(db_path)
+    try:
+        with open(tmp_path, "wb") as f:
+            rows = export_v2.write_export(
+                conn, table, f, password, kdf_params, using_vault_key=not passphrase,
+                compression=compression or DEFAULTS.export.compression,
+                level=DEFAULTS.export.compression_level, stream=DEFAULTS.export.compression_stream,
+                vault_key_id=_vault_key_id(conn),
+            )
+        os.replace(tmp_path, out_path)
+        _ROWS.labels("export", "v2").inc(rows)
+    finally:
+        conn.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return out_path
+
+def export_encrypted(db_path: str, table: str, out_path: str, master_password: str, passphrase: Optional[str] = None,
+                     version: int = 2, compression: Optional[str] = None) -> str:
+    """
+    Encrypted export of `table`. Version 2 (default, pm_core.export_v2) streams
+    authenticated binary chunks in bounded memory; the file is keyed from a
+    password (the passphrase, or the master password with the vault's KDF
+    params). Rows are copied as stored, so password values stay encrypted
+    under this vault's data key: the export is a backup of this vault, and
+    import_encrypted() refuses it in a vault with a different data key.
+    Chunks are compressed before encryption (`compression`, a pm_core.codecs
+    name; defaults to DEFAULTS.export). Version 1 is the legacy uncompressed
+    single-token JSON file, kept for older readers.
+    """
+    with _SECONDS.labels("export", f"v{version}").time():
+        if version == 2:
+            return _export_v2(db_path, table, out_path, master_password, passphrase, compression)
+        return _export_v1(db_path, table, out_path, master_password, passphrase)
+
+def _export_v1(db_path: str, table: str, out_path: str, master_password: str, passphrase: Optional[str]) -> str:
     conn = _connect(db_path)
     try:
         data = _read_all_rows(conn, table)
+        key_id = _vault_key_id(conn)
     finally:
         conn.close()
 
-    payload = json.dumps({"table": table, "records": data}).encode('utf-8')
+    payload = json.dumps({"table": table, "typed": True, "records": data}).encode('utf-8')
 
     if passphrase:
         salt = os.urandom(16)
@@ -39,6 +115,7 @@ def export_encrypted(db_path: str, table: str, out_path: str, master_password: s
         out = {
             "version": 1,
             "using_vault_key": False,
+            "vault_key_id": key_id,
             "kdf": kdf_params,
             "salt": base64.b64encode(salt).decode('ascii'),
             "ciphertext": base64.b64encode(token).decode('ascii'),
@@ -49,15 +126,78 @@ def export_encrypted(db_path: str, table: str, out_path: str, master_password: s
         out = {
             "version": 1,
             "using_vault_key": True,
+            "vault_key_id": key_id,
             "ciphertext": base64.b64encode(token).decode('ascii'),
         }
 
     with open(out_path, "w", encoding="utf-8") as f:
         json.dump(out, f, separators=(',', ':'))
-
+    _ROWS.labels("export", "v1").inc(len(data))
     return out_path
 
-def import_encrypted(db_path: str, in_path: str, master_password: str, passphrase: Optional[str] = None, merge: bool = True) -> int:
+def _import_v2(db_path: str, in_path: str, master_password: str, passphrase: Optional[str], merge: bool,
+               progress: Optional[Progress], cancel: Optional[threading.Event]) -> int:
+    with open(in_path, "rb") as f:
+        f.read(len(export_v2.MAGIC))
+        header_raw, header = export_v2.read_header(f)
+        if header.get("using_vault_key"):
+            password = master_password
+        elif passphrase:
+            password = passphrase
+        else:
+            raise ValueError("Export requires passphrase to import")
+        chunks = export_v2.iter_chunks(f, header_raw, header, password)
+        # The header is authenticated as part of every chunk: decrypt the first
+        # one before trusting anything in it (table name, schema).
+        first = next(chunks)
+        rest = prefetch(chunks)
+        conn = _connect(db_path)
+        try:
+            _check_vault_key(conn, header.get("vault_key_id"))
+            return load_rows(
+                conn, header["table"], header["columns"], itertools.chain([first], rest),
+                merge=merge, schema=header.get("schema"), total=header.get("rows", 0),
+                progress=progress, cancel=cancel,
+            )
+        finally:
+            rest.close()  # waits for a read in flight before the file closes
+            conn.close()
+
+def _v1_value(v: Any, typed: bool) -> Any:
+    if typed:
+        return base64.b64decode(v["b64"]) if isinstance(v, dict) else v
+    # Untagged legacy files: BLOBs were written as bare base64 strings
+    if isinstance(v, str) and v.strip().endswith('='):
+        return base64.b64decode(v)
+    return v
+
+def _v1_batches(records: List[Dict[str, Any]], columns: List[str], typed: bool,
+                batch_rows: int) -> Iterator[List[tuple]]:
+    for start in range(0, len(records), batch_rows):
+        yield [tuple(_v1_value(rec.get(c), typed) for c in columns)
+               for rec in records[start:start + batch_rows]]
+
+def import_encrypted(db_path: str, in_path: str, master_password: str, passphrase: Optional[str] = None,
+                     merge: bool = True, progress: Optional[Progress] = None,
+                     cancel: Optional[threading.Event] = None, batch_rows: int = 1000) -> int:
+    """
+    Import an encrypted export (v2 binary or legacy v1 JSON, detected from the
+    file) through pm_core.import_pipeline: columns are matched by name, rows go
+    in executemany batches, progress(done, total, rate) is reported per batch
+    and setting `cancel` stops it with ImportCancelled and no change. An
+    export from a vault with another data key raises ValueError up front.
+    """
+    version = "v2" if export_v2.is_v2(in_path) else "v1"
+    with _SECONDS.labels("import", version).time():
+        if version == "v2":
+            count = _import_v2(db_path, in_path, master_password, passphrase, merge, progress, cancel)
+        else:
+            count = _import_v1(db_path, in_path, master_password, passphrase, merge, progress, cancel, batch_rows)
+    _ROWS.labels("import", version).inc(count)
+    return count
+
+def _import_v1(db_path: str, in_path: str, master_password: str, passphrase: Optional[str], merge: bool,
+               progress: Optional[Progress], cancel: Optional[threading.Event], batch_rows: int) -> int:
     with open(in_path, "r", encoding="utf-8") as f:
         obj = json.load(f)
 
@@ -76,22 +216,18 @@ def import_encrypted(db_path: str, in_path: str, master_password: str, passphras
         crypto = VaultCrypto(key)
         inner = crypto.decrypt_json(token_b)
 
+    # v1 is one Fernet token, so the payload is decrypted whole; from here on
+    # it is handled like v2, batch by batch.
     payload = json.loads(base64.b64decode(inner["k"]).decode('utf-8'))
-    table = payload["table"]
     records = payload["records"]
-
+    columns = list(dict.fromkeys(c for rec in records for c in rec))
     conn = _connect(db_path)
     try:
-        cols = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
-        placeholders = ", ".join("?" for _ in cols)
-        count = 0
-        with conn:
-            if not merge:
-                conn.execute(f"DELETE FROM {table}")
-            for rec in records:
-                values = [base64.b64decode(rec[c]) if (c in rec and isinstance(rec[c], str) and rec[c].strip().endswith('=')) else rec.get(c) for c in cols]
-                conn.execute(f"INSERT INTO {table} VALUES ({placeholders})", values)
-                count += 1
-        return count
+        _check_vault_key(conn, obj.get("vault_key_id"))
+        return load_rows(
+            conn, payload["table"], columns,
+            _v1_batches(records, columns, payload.get("typed", False), batch_rows),
+            merge=merge, total=len(records), progress=progress, cancel=cancel,
+        )
     finally:
         conn.close()
@@ -0,0 +1,193 @@
+"""
+Encrypted export format v2: binary, streamed, chunk-authenticated.
+
+Layout:
+    b"PMX2" | u32 header_len | header (JSON: table, columns, rows, kdf, salt, ...)
+    then chunks:  u32 body_len | nonce (12) | AES-256-GCM(compress(records)) + tag
+    The last chunk has the FINAL flag in its associated data, so a truncated
+    file fails to authenticate instead of importing silently short.
+
+Each chunk's associated data is the header bytes + chunk index + final flag:
+chunks cannot be reordered, dropped or moved between files. Records are
+typed binary values (no base64), written straight from a cursor with
+fetchmany(), so memory stays bounded by one chunk. Records are compressed
+before encryption with the codec named in the header (pm_core.codecs; files
+without one are uncompressed); in stream mode one compressor spans the chunks.
+"""
+import base64
+import json
+import os
+import sqlite3
+import struct
+from typing import BinaryIO, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from .codecs import get_codec
+from .db import transaction
+from .kdf import derive_fernet_key
+
+MAGIC = b"PMX2"
+CHUNK_ROWS = 1000
+_U32 = struct.Struct(">I")
+_AAD_TAIL = struct.Struct(">QB")
+
+# value tags
+_NULL, _INT, _REAL, _TEXT, _BLOB = range(5)
+_I64 = struct.Struct(">q")
+_F64 = struct.Struct(">d")
+
+def encode_rows(rows: Sequence[Sequence]) -> bytes:
+    out = bytearray(_U32.pack(len(rows)))
+    for row in rows:
+        for v in row:
+            if v is None:
+                out.append(_NULL)
+            elif isinstance(v, int):
+                out.append(_INT)
+                out += _I64.pack(v)
+            elif isinstance(v, float):
+                out.append(_REAL)
+                out += _F64.pack(v)
+            elif isinstance(v, str):
+                b = v.encode("utf-8")
+                out.append(_TEXT)
+                out += _U32.pack(len(b))
+                out += b
+            else:
+                b = bytes(v)
+                out.append(_BLOB)
+                out += _U32.pack(len(b))
+                out += b
+    return bytes(out)
+
+def decode_rows(data: bytes, ncols: int) -> List[tuple]:
+    view = memoryview(data)
+    (n,), pos = _U32.unpack_from(view, 0), _U32.size
+    rows = []
+    for _ in range(n):
+        row = []
+        for _ in range(ncols):
+            tag = view[pos]
+            pos += 1
+            if tag == _NULL:
+                row.append(None)
+            elif tag == _INT:
+                row.append(_I64.unpack_from(view, pos)[0])
+                pos += _I64.size
+            elif tag == _REAL:
+                row.append(_F64.unpack_from(view, pos)[0])
+                pos += _F64.size
+            elif tag in (_TEXT, _BLOB):
+                (size,) = _U32.unpack_from(view, pos)
+                pos += _U32.size
+                raw = bytes(view[pos:pos + size])
+                pos += size
+                row.append(raw.decode("utf-8") if tag == _TEXT else raw)
+            else:
+                raise ValueError(f"Corrupt export: unknown value tag {tag}")
+        rows.append(tuple(row))
+    return rows
+
+def _key(password: str, salt: bytes, kdf_params: Dict) -> bytes:
+    return base64.urlsafe_b64decode(derive_fernet_key(password, salt, kdf_params))
+
+def _aad(header: bytes, index: int, final: bool) -> bytes:
+    return header + _AAD_TAIL.pack(index, 1 if final else 0)
+
+def write_export(conn: sqlite3.Connection, table: str, out: BinaryIO, password: str,
+                 kdf_params: Dict, using_vault_key: bool = False, chunk_rows: int = CHUNK_ROWS,
+                 compression: str = "zlib", level: Optional[int] = None, stream: bool = False,
+                 vault_key_id: Optional[str] = None) -> int:
+    """Stream `table` into `out`; returns the number of rows written."""
+    with transaction(conn, "DEFERRED"):  # one snapshot for the row count and the rows
+        return _write(conn, table, out, password, kdf_params, using_vault_key, chunk_rows,
+                      compression, level, stream, vault_key_id)
+
+def _write(conn, table, out, password, kdf_params, using_vault_key, chunk_rows,
+           compression, level, stream, vault_key_id) -> int:
+    codec = get_codec(compression)
+    level = codec.default_level if level is None else level
+    schema = conn.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()
+    total = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    cur = conn.execute(f"SELECT * FROM {table}")
+    columns = [d[0] for d in cur.description]
+    salt = os.urandom(16)
+    header = json.dumps({
+        "version": 2,
+        "table": table,
+        "schema": schema[0] if schema else None,  # lets an import create the table
+        "columns": columns,
+        "rows": total,  # for import progress only
+        "using_vault_key": using_vault_key,
+        "vault_key_id": vault_key_id,  # which data key the encrypted values are under
+        "kdf": kdf_params,
+        "salt": base64.b64encode(salt).decode("ascii"),
+        "compression": {"codec": codec.name, "level": level, "stream": stream},
+    }, separators=(",", ":")).encode("utf-8")
+    aead = AESGCM(_key(password, salt, kdf_params))
+
+    out.write(MAGIC)
+    out.write(_U32.pack(len(header)))
+    out.write(header)
+
+    compressor = codec.compressor(level) if stream else None
+    count, index = 0, 0
+    rows = cur.fetchmany(chunk_rows)
+    while True:
+        following = cur.fetchmany(chunk_rows) if rows else []
+        final = not following
+        packed = (compressor or codec.compressor(level)).compress(encode_rows(rows))
+        nonce = os.urandom(12)
+        body = nonce + aead.encrypt(nonce, packed, _aad(header, index, final))
+        out.write(_U32.pack(len(body)))
+        out.write(body)
+        count += len(rows)
+        index += 1
+        if final:
+            return count
+        rows = following
+
+def _read_exact(f: BinaryIO, n: int) -> bytes:
+    data = f.read(n)
+    if len(data) != n:
+        raise ValueError("Corrupt export: unexpected end of file")
+    return data
+
+def read_header(f: BinaryIO) -> Tuple[bytes, Dict]:
+    """Header bytes (for AAD) and parsed header; `f` must be positioned after MAGIC."""
+    (size,) = _U32.unpack(_read_exact(f, _U32.size))
+    raw = _read_exact(f, size)
+    return raw, json.loads(raw.decode("utf-8"))
+
+def iter_chunks(f: BinaryIO, header_raw: bytes, header: Dict, password: str) -> Iterator[List[tuple]]:
+    """Decrypt and decode chunk by chunk; raises InvalidTag on tampering or truncation."""
+    aead = AESGCM(_key(password, base64.b64decode(header["salt"]), header["kdf"]))
+    ncols = len(header["columns"])
+    comp = header.get("compression") or {"codec": "none"}
+    codec = get_codec(comp["codec"])
+    decompressor = codec.decompressor() if comp.get("stream") else None
+    index = 0
+    while True:
+        prefix = f.read(_U32.size)
+        if not prefix:
+            raise ValueError("Corrupt export: missing final chunk")
+        (size,) = _U32.unpack(prefix)
+        body = _read_exact(f, size)
+        nonce, ct = body[:12], body[12:]
+        final = _at_eof(f)
+        plain = aead.decrypt(nonce, ct, _aad(header_raw, index, final))
+        yield decode_rows((decompressor or codec.decompressor()).decompress(plain), ncols)
+        if final:
+            return
+        index += 1
+
+def _at_eof(f: BinaryIO) -> bool:
+    pos = f.tell()
+    eof = not f.read(1)
+    f.seek(pos)
+    return eof
+
+def is_v2(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
@@ -0,0 +1,108 @@
+"""
+Batched, cancellable import of decoded rows into a table.
+
+load_rows() takes batches of row tuples (in `columns` order), maps them onto
+the target table by column name and writes each batch with executemany() into
+a TEMP staging table (connection-private, so staging never takes the vault's
+write lock). The connection's temp store is switched to FILE for the import,
+so staging spills to a temp file instead of holding the whole file in RAM
+(DEFAULTS.database.temp_store is MEMORY). Only the final step touches the target: the optional DELETE and
+one INSERT ... SELECT from the stage, in a single transaction. Progress and
+cancel work at batch boundaries, and a failed, cancelled or tampered import
+leaves the table exactly as it was.
+
+prefetch() runs the producer (decrypt + decode) one batch ahead on a worker
+thread, overlapping it with the SQLite writes.
+"""
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Sequence, TypeVar
+
+from .db import transaction
+from .reencrypt import Progress
+
+STAGING_TABLE = "temp._import_staging"
+
+T = TypeVar("T")
+_END = object()
+
+class ImportCancelled(Exception):
+    """Stopped at a batch boundary; the target table was not changed."""
+
+def prefetch(items: Iterable[T]) -> Iterator[T]:
+    """Yield from `items`, computing the next item on a worker thread meanwhile."""
+    it = iter(items)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pending = pool.submit(next, it, _END)
+        while True:
+            item = pending.result()
+            if item is _END:
+                return
+            pending = pool.submit(next, it, _END)
+            yield item
+
+def load_rows(
+    conn: sqlite3.Connection,
+    table: str,
+    columns: Sequence[str],
+    batches: Iterable[List[tuple]],
+    merge: bool = True,
+    schema: Optional[str] = None,
+    total: int = 0,
+    progress: Optional[Progress] = None,
+    cancel: Optional[threading.Event] = None,
+) -> int:
+    """
+    Insert every row of `batches` into `table`; returns the row count.
+    Columns missing from the target are dropped. If the table does not exist
+    and `schema` is a CREATE TABLE statement, it is created first.
+    """
+    target = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    if not target and not (schema or "").upper().startswith("CREATE TABLE"):
+        raise ValueError(f"No table {table!r} to import into")
+    cols = [c for c in columns if c in target] if target else list(columns)
+    idx = [list(columns).index(c) for c in cols]
+    col_sql = ", ".join(cols)
+    if not cols:  # nothing to insert (e.g. an empty v1 export)
+        if target and not merge:
+            with transaction(conn):
+                conn.execute(f"DELETE FROM {table}")
+        return 0
+
+    temp_store = conn.execute("PRAGMA temp_store").fetchone()[0]
+    conn.execute("PRAGMA temp_store=FILE")  # before the stage exists: it applies when TEMP is opened
+    conn.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+    if target:
+        conn.execute(f"CREATE TABLE {STAGING_TABLE} AS SELECT {col_sql} FROM {table} WHERE 0")
+    else:
+        conn.execute(f"CREATE TABLE {STAGING_TABLE} ({col_sql})")
+    stage = f"INSERT INTO {STAGING_TABLE} ({col_sql}) VALUES ({', '.join('?' for _ in cols)})"
+    whole_rows = idx == list(range(len(columns)))
+
+    count = 0
+    started = time.perf_counter()
+    try:
+        for rows in batches:
+            if cancel is not None and cancel.is_set():
+                raise ImportCancelled(f"stopped after {count} rows")
+            with transaction(conn, "DEFERRED"):
+                conn.executemany(stage, rows if whole_rows else [tuple(r[i] for i in idx) for r in rows])
+            count += len(rows)
+            if progress is not None:
+                elapsed = time.perf_counter() - started
+                progress(count, max(total, count), count / elapsed if elapsed > 0 else 0.0)
+        if cancel is not None and cancel.is_set():
+            raise ImportCancelled(f"stopped after {count} rows")
+
+        with transaction(conn):
+            if not target:
+                conn.execute(schema)
+            elif not merge:
+                conn.execute(f"DELETE FROM {table}")
+            conn.execute(f"INSERT INTO {table} ({col_sql}) SELECT {col_sql} FROM {STAGING_TABLE} ORDER BY rowid")
+        return count
+    finally:
+        conn.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+        conn.execute(f"PRAGMA temp_store={int(temp_store)}")
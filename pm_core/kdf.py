@@ -2,6 +2,8 @@ import base64
 from typing import Dict
 from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
 
+from .tracing import traced
+
 try:
     # argon2-cffi low-level API for deterministic KDF
     from argon2.low_level import Type, hash_secret_raw
@@ -12,6 +14,7 @@ except Exception:  # optional
 def _b(s: str) -> bytes:
     return s.encode('utf-8') if isinstance(s, str) else s
 
+@traced()
 def derive_key_argon2id(password: str, salt: bytes, params: Dict) -> bytes:
     if not has_argon2:
         raise RuntimeError("argon2-cffi not available")
@@ -29,6 +32,7 @@ def derive_key_argon2id(password: str, salt: bytes, params: Dict) -> bytes:
     )
     return raw  # 32 bytes
 
+@traced()
 def derive_key_scrypt(password: str, salt: bytes, params: Dict) -> bytes:
     N = int(params.get("scrypt_N", 2**14))
     r = int(params.get("scrypt_r", 8))
@@ -36,6 +40,7 @@ def derive_key_scrypt(password: str, salt: bytes, params: Dict) -> bytes:
     kdf = Scrypt(salt=salt, length=32, n=N, r=r, p=p)
     return kdf.derive(_b(password))
 
+@traced()
 def derive_fernet_key(password: str, salt: bytes, params: Dict) -> bytes:
     # Derive raw 32 bytes then base64-url encode to Fernet key format
     algo = params.get("primary", "argon2id")
@@ -0,0 +1,115 @@
+"""
+Per-machine Argon2id calibration.
+
+calibrate() times derive_key_argon2id on this machine and picks parameters
+that take about `target_ms` to unlock: one lane per CPU (up to os.cpu_count()),
+memory doubled from the floor while a single pass still fits well inside the
+target, then as many passes as the remaining budget allows. The result is the
+machine's baseline, stored in the `kdf_baseline` setting; vaults whose
+`kdf_params` are weaker than the baseline are offered a re-derivation at unlock.
+"""
+import json
+import os
+import time
+from typing import Callable, Dict, Optional
+
+from .config import DEFAULTS
+from .kdf import derive_key_argon2id, has_argon2
+from .settings_store import _connect, get_setting, set_setting
+
+BASELINE_KEY = "kdf_baseline"
+
+def default_params() -> Dict:
+    k = DEFAULTS.kdf
+    return {
+        "primary": k.primary,
+        "argon2_memory_kib": k.argon2_memory_kib,
+        "argon2_time_cost": k.argon2_time_cost,
+        "argon2_parallelism": k.argon2_parallelism,
+        "salt_bytes": k.salt_bytes,
+        "scrypt_N": k.scrypt_N,
+        "scrypt_r": k.scrypt_r,
+        "scrypt_p": k.scrypt_p,
+    }
+
+def calibrate(target_ms: Optional[int] = None,
+              min_memory_kib: Optional[int] = None,
+              max_memory_kib: Optional[int] = None,
+              max_lanes: Optional[int] = None,
+              derive: Callable = derive_key_argon2id,
+              clock: Callable[[], float] = time.perf_counter) -> Dict:
+    """KDF params (the kdf_params shape) tuned to take about target_ms here."""
+    k = DEFAULTS.kdf
+    target = float(target_ms or k.target_unlock_ms)
+    mem = int(min_memory_kib or k.min_memory_kib)
+    mem_cap = int(max_memory_kib or k.max_memory_kib)
+    lanes = max(1, min(os.cpu_count() or 1, max_lanes or os.cpu_count() or 1))
+
+    params = default_params()
+    if not has_argon2 and derive is derive_key_argon2id:
+        return params  # scrypt fallback keeps the static defaults
+
+    def one_pass(memory_kib: int) -> float:
+        p = {"argon2_memory_kib": memory_kib, "argon2_time_cost": 1, "argon2_parallelism": lanes}
+        t0 = clock()
+        derive("calibration", b"\x00" * 16, p)
+        return (clock() - t0) * 1000.0
+
+    mem = max(mem, 8 * lanes)  # Argon2 needs at least 8 KiB per lane
+    elapsed = one_pass(mem)
+    # Memory hardness first: double while a pass at twice the memory still fits
+    while elapsed * 2 <= target and mem * 2 <= mem_cap:
+        mem *= 2
+        elapsed = one_pass(mem)
+    passes = max(1, int(target // max(elapsed, 1e-3)))
+
+    params.update({
+        "primary": "argon2id",
+        "argon2_memory_kib": mem,
+        "argon2_time_cost": passes,
+        "argon2_parallelism": lanes,
+        "calibrated_ms": round(elapsed * passes, 1),
+    })
+    return params
+
+def work(params: Dict) -> int:
+    """Relative cost of a parameter set (memory x passes); scrypt counts as no Argon2 work."""
+    if params.get("primary", "argon2id") != "argon2id":
+        return 0
+    return int(params.get("argon2_memory_kib", 0)) * int(params.get("argon2_time_cost", 0))
+
+def is_weaker(params: Dict, baseline: Dict) -> bool:
+    """True when `params` does less work than `baseline` or uses less memory."""
+    return (work(params) < work(baseline)
+            or int(params.get("argon2_memory_kib", 0)) < int(baseline.get("argon2_memory_kib", 0)))
+
+def load_baseline(db_path: str) -> Optional[Dict]:
+    conn = _connect(db_path)
+    try:
+        raw = get_setting(conn, BASELINE_KEY)
+    finally:
+        conn.close()
+    return json.loads(raw.decode("utf-8")) if raw else None
+
+def save_baseline(db_path: str, params: Dict) -> None:
+    conn = _connect(db_path)
+    try:
+        with conn:
+            set_setting(conn, BASELINE_KEY, json.dumps(params).encode("utf-8"))
+    finally:
+        conn.close()
+
+def load_kdf_params(db_path: str) -> Optional[Dict]:
+    conn = _connect(db_path)
+    try:
+        raw = get_setting(conn, "kdf_params")
+    finally:
+        conn.close()
+    return json.loads(raw.decode("utf-8")) if raw else None
+
+def needs_upgrade(db_path: str) -> Optional[Dict]:
+    """The stored baseline when the vault's kdf_params fall below it, else None."""
+    baseline, current = load_baseline(db_path), load_kdf_params(db_path)
+    if baseline and current and is_weaker(current, baseline):
+        return baseline
+    return None
@@ -1,33 +1,97 @@
+"""
+The "pm" logger: a QueueHandler on the logger, and one QueueListener thread
+that redacts, formats and writes (rotating file + stderr). A log call only
+renders its message and enqueues the record, so file I/O and rotation never
+run on the Tk or crypto threads.
+
+setup_logger() is idempotent: calling it again only updates the level, or
+rebuilds the pipeline when the file settings change. shutdown_logging()
+drains the queue (also run at exit).
+"""
+import atexit
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import re
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional, Tuple
 
 SENSITIVE_KEYS = {"password", "secret", "token", "key", "recovery", "passphrase"}
 
+# longest first, so "passphrase" is not masked as "pass" + ...
+_SENSITIVE_RE = re.compile("|".join(sorted(map(re.escape, SENSITIVE_KEYS), key=len, reverse=True)), re.IGNORECASE)
+
+def _mask(m: "re.Match") -> str:
+    word = m.group()
+    return f"{word[0]}***{word[-1]}"
+
 def _redact(msg: str) -> str:
-    lower = msg.lower()
-    for k in SENSITIVE_KEYS:
-        if k in lower:
-            msg = msg.replace(k, f"{k[0]}***{k[-1]}")
-    return msg
+    return _SENSITIVE_RE.sub(_mask, msg)
 
 class RedactingFormatter(logging.Formatter):
     def format(self, record: logging.LogRecord) -> str:
-        record.msg = _redact(str(record.msg))
-        return super().format(record)
+        # the whole line (message, args and traceback), without touching the record
+        return _redact(super().format(record))
+
+class _EnqueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener; it only pins the message text."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # args may be mutated after the call returns, so render them now
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
 
-def setup_logger(level: str = "INFO", rotate_mb: int = 5, keep_files: int = 5) -> logging.Logger:
+_lock = threading.Lock()
+_state: Optional[Tuple[Tuple, QueueHandler, QueueListener]] = None
+
+def setup_logger(level: str = "INFO", rotate_mb: int = 5, keep_files: int = 5,
+                 log_dir: str = "logs", stream: bool = True) -> logging.Logger:
+    global _state
     logger = logging.getLogger("pm")
     logger.setLevel(getattr(logging, level.upper(), logging.INFO))
+    key = (os.path.abspath(log_dir), rotate_mb, keep_files, stream)
+    with _lock:
+        if _state is not None and _state[0] == key:
+            return logger
+        _shutdown_locked()
 
-    os.makedirs("logs", exist_ok=True)
-    handler = RotatingFileHandler("logs/app.log", maxBytes=rotate_mb * 1024 * 1024, backupCount=keep_files)
-    formatter = RedactingFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
-
-    stream = logging.StreamHandler()
-    stream.setFormatter(formatter)
-    logger.addHandler(stream)
+        os.makedirs(log_dir, exist_ok=True)
+        formatter = RedactingFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        handler = RotatingFileHandler(os.path.join(log_dir, "app.log"),
+                                      maxBytes=rotate_mb * 1024 * 1024, backupCount=keep_files)
+        handler.setFormatter(formatter)
+        handlers = [handler]
+        if stream:
+            console = logging.StreamHandler()
+            console.setFormatter(formatter)
+            handlers.append(console)
 
+        q = queue.SimpleQueue()
+        listener = QueueListener(q, *handlers, respect_handler_level=True)
+        listener.start()
+        enqueue = _EnqueueHandler(q)
+        logger.addHandler(enqueue)
+        _state = (key, enqueue, listener)
     return logger
+
+def _shutdown_locked() -> None:
+    global _state
+    if _state is None:
+        return
+    _, enqueue, listener = _state
+    logging.getLogger("pm").removeHandler(enqueue)
+    listener.stop()  # writes everything still queued
+    for h in listener.handlers:
+        h.close()
+    _state = None
+
+def shutdown_logging() -> None:
+    with _lock:
+        _shutdown_locked()
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,348 @@
+"""
+In-process metrics: counters, gauges and fixed-bucket histograms.
+
+    UNLOCKS = counter("pm_unlock_total", "Unlock attempts", ("result",))
+    UNLOCKS.labels("ok").inc()
+    with DB_SECONDS.labels("store_password").time(): ...
+
+Recording takes no lock: each thread adds into its own shard (a plain list
+reached through a threading.local), and a scrape sums the shards. A shard is
+registered once per thread and metric, under the registry lock, and folded
+into a retired total once its thread has ended, so short-lived threads do
+not pile up shards. So inc() and observe() cost a few hundred ns and can sit
+on per-row paths.
+
+Exposition is Prometheus text (render()). serve_http() serves it on a
+loopback address only; FileExporter rewrites a file every few seconds.
+Both are started from DEFAULTS.metrics by start_exporters().
+"""
+import bisect
+import collections
+import functools
+import http.server
+import ipaddress
+import os
+import threading
+import time
+import weakref
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# Latency buckets in seconds: 50 us .. 10 s
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class _Owner:
+    """Held only by a thread's threading.local: collected when that thread ends."""
+    __slots__ = ("__weakref__",)
+
+class _Sharded:
+    """Per-thread cells of `width` numbers; writers only touch their own cell."""
+
+    def __init__(self, width: int, lock: threading.Lock):
+        self._width = width
+        self._lock = lock
+        self._local = threading.local()
+        self._cells: Dict[int, List[float]] = {}
+        self._retired = [0] * width          # folded-in cells of threads that have ended
+        self._dead: "collections.deque[int]" = collections.deque()
+
+    def cell(self) -> List[float]:
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = self._local.cell = [0] * self._width
+            owner = self._local.owner = _Owner()
+            # may run on any thread, even inside a `with self._lock`: only queue it
+            weakref.finalize(owner, self._dead.append, id(cell))
+            with self._lock:
+                self._fold()
+                self._cells[id(cell)] = cell
+            return cell
+
+    def _fold(self) -> None:
+        # caller holds the lock
+        while self._dead:
+            cell = self._cells.pop(self._dead.popleft())
+            self._retired = [a + b for a, b in zip(self._retired, cell)]
+
+    def total(self) -> List[float]:
+        with self._lock:
+            self._fold()
+            cells = [self._retired, *self._cells.values()]
+        return [sum(col) for col in zip(*cells)]
+
+class _CounterChild:
+    def __init__(self, lock):
+        self._s = _Sharded(1, lock)
+
+    def inc(self, n: float = 1) -> None:
+        self._s.cell()[0] += n
+
+    def value(self) -> float:
+        return self._s.total()[0]
+
+class _GaugeChild:
+    def __init__(self, lock):
+        self._lock = lock
+        self._value = 0.0
+
+    def set(self, v: float) -> None:
+        self._value = v
+
+    def inc(self, n: float = 1) -> None:
+        with self._lock:
+            self._value += n
+
+    def dec(self, n: float = 1) -> None:
+        self.inc(-n)
+
+    def value(self) -> float:
+        return self._value
+
+class _Timer:
+    __slots__ = ("_observe", "_t0")
+
+    def __init__(self, observe):
+        self._observe = observe
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._observe(time.perf_counter() - self._t0)
+        return False
+
+class _HistogramChild:
+    def __init__(self, buckets: Sequence[float], lock):
+        self.buckets = tuple(buckets)
+        # cell: one count per bucket + overflow (+Inf), then sum
+        self._s = _Sharded(len(self.buckets) + 2, lock)
+
+    def observe(self, v: float) -> None:
+        cell = self._s.cell()
+        cell[bisect.bisect_left(self.buckets, v)] += 1
+        cell[-1] += v
+
+    def time(self) -> "_Timer":
+        """Context manager observing the block's duration in seconds."""
+        return _Timer(self.observe)
+
+    def timed(self, fn: Callable) -> Callable:
+        """Decorator observing every call's duration in seconds."""
+        observe, clock = self.observe, time.perf_counter
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            t0 = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(clock() - t0)
+        return inner
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        """(cumulative bucket counts incl. +Inf, sum, count)."""
+        t = self._s.total()
+        counts, cum = [], 0
+        for c in t[:-1]:
+            cum += c
+            counts.append(int(cum))
+        return counts, t[-1], counts[-1]
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], lock: threading.Lock):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._lock = lock
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            # unlabelled: inc/observe/... go straight to the single child
+            child = self.labels()
+            for attr in dir(child):
+                if not attr.startswith("_") and attr != "buckets":
+                    setattr(self, attr, getattr(child, attr))
+
+    def _make(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """The child for these label values; keep it around on hot paths."""
+        key = tuple(str(v) for v in values)
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}")
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._make())
+        return child
+
+    def children(self):
+        with self._lock:
+            return list(self._children.items())
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _make(self):
+        return _CounterChild(self._lock)
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _make(self):
+        return _GaugeChild(self._lock)
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames, lock, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames, lock)
+
+    def _make(self):
+        return _HistogramChild(self.buckets, self._lock)
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _num(v: float) -> str:
+    return repr(float(v)) if isinstance(v, float) and not float(v).is_integer() else str(int(v))
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _get(self, cls, name, help, labelnames, **kw):
+        with self._lock:
+            m = self._metrics.get(name)
+            if m is None:
+                m = self._metrics[name] = cls(name, help, labelnames, threading.Lock(), **kw)
+            elif not isinstance(m, cls):
+                raise ValueError(f"{name} is already registered as a {m.kind}")
+            return m
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get(Gauge, name, help, labelnames)
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        out = []
+        for m in metrics:
+            out.append(f"# HELP {m.name} {m.help}")
+            out.append(f"# TYPE {m.name} {m.kind}")
+            for values, child in sorted(m.children()):
+                if m.kind == "histogram":
+                    counts, total, count = child.snapshot()
+                    bounds = [repr(b) for b in m.buckets] + ["+Inf"]
+                    for le, c in zip(bounds, counts):
+                        le_label = 'le="%s"' % le
+                        out.append(f"{m.name}_bucket{_fmt_labels(m.labelnames, values, le_label)} {c}")
+                    out.append(f"{m.name}_sum{_fmt_labels(m.labelnames, values)} {_num(total)}")
+                    out.append(f"{m.name}_count{_fmt_labels(m.labelnames, values)} {count}")
+                else:
+                    out.append(f"{m.name}{_fmt_labels(m.labelnames, values)} {_num(child.value())}")
+        return "\n".join(out) + "\n"
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+render = REGISTRY.render
+
+def _check_loopback(host: str) -> None:
+    try:
+        loopback = ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        loopback = host == "localhost"
+    if not loopback:
+        raise ValueError(f"Metrics are only served on loopback, not {host!r}")
+
+def serve_http(port: int, host: str = "127.0.0.1", registry: Registry = REGISTRY) -> http.server.HTTPServer:
+    """Serve GET /metrics on a loopback address from a daemon thread; returns the server (shutdown() to stop)."""
+    _check_loopback(host)
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):  # no access log
+            pass
+
+    server = http.server.ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="pm-metrics-http", daemon=True).start()
+    return server
+
+class FileExporter:
+    """Rewrites `path` with render() every `interval` seconds (atomically) until stop()."""
+
+    def __init__(self, path: str, interval: float = 15.0, registry: Registry = REGISTRY):
+        self.path, self.interval, self.registry = path, interval, registry
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="pm-metrics-file", daemon=True)
+
+    def start(self) -> "FileExporter":
+        self._thread.start()
+        return self
+
+    def flush(self) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.registry.render())
+        os.replace(tmp, self.path)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.flush()
+
+def start_exporters(cfg=None) -> List[object]:
+    """
+    Start what DEFAULTS.metrics asks for (PM_METRICS_PORT / PM_METRICS_FILE
+    override it); returns the handles for stop_exporters().
+    """
+    from .config import DEFAULTS
+    cfg = cfg or DEFAULTS.metrics
+    port = int(os.environ.get("PM_METRICS_PORT") or cfg.http_port)
+    path = os.environ.get("PM_METRICS_FILE") or cfg.file_path
+    handles: List[object] = []
+    if port:
+        handles.append(serve_http(port, cfg.http_host))
+    if path:
+        handles.append(FileExporter(path, cfg.flush_seconds).start())
+    return handles
+
+def stop_exporters(handles: List[object]) -> None:
+    for h in handles:
+        if isinstance(h, FileExporter):
+            h.stop()
+        else:
+            h.shutdown()
+            h.server_close()
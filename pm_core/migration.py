@@ -2,10 +2,12 @@ import base64
 import logging
 import os
 import sqlite3
-from typing import Sequence
+import threading
+from typing import Optional, Sequence
 
 from cryptography.fernet import Fernet, InvalidToken
 
+from .reencrypt import Progress, clear_checkpoint, reencrypt_rows
 from .settings_store import _connect, unlock_vault
 from .vault_crypto import VaultCrypto
 
@@ -27,7 +29,15 @@ def migrate_from_secret_key(
     table_name: str = "passwords",
     encrypted_fields: Sequence[str] = ("password", "recovery_codes"),
     id_column: str = "id",
+    chunk_size: int = 1000,
+    progress: Optional[Progress] = None,
+    cancel: Optional[threading.Event] = None,
 ) -> int:
+    """
+    Re-encrypt rows from the legacy secret.key to the vault key in committed,
+    checkpointed chunks (pm_core.reencrypt); an interrupted migration resumes
+    where it stopped. secret.key is wiped only once every row is done.
+    """
     if not os.path.exists(secret_key_path):
         raise FileNotFoundError(secret_key_path)
 
@@ -35,8 +45,17 @@ def migrate_from_secret_key(
     old_fernet = Fernet(old_key)
     new_crypto: VaultCrypto = unlock_vault(db_path, master_password)
 
+    def convert(val) -> bytes:
+        try:
+            decrypted = old_fernet.decrypt(val).decode('utf-8')
+        except InvalidToken:
+            try:
+                decrypted = val.decode('utf-8')
+            except Exception:
+                decrypted = str(val)
+        return new_crypto.encrypt_text(decrypted)
+
     conn = _connect(db_path)
-    count = 0
     try:
         cur = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
         if not cur.fetchone():
@@ -48,30 +67,9 @@ def migrate_from_secret_key(
         if not to_process:
             raise RuntimeError(f"No matching encrypted fields found in {table_name}.")
 
-        with conn:
-            rows = conn.execute(f"SELECT {id_column}, {', '.join(to_process)} FROM {table_name}").fetchall()
-            for row in rows:
-                _id = row[0]
-                old_values = row[1:]
-                new_values = []
-                for val in old_values:
-                    if val is None:
-                        new_values.append(None)
-                        continue
-                    try:
-                        decrypted = old_fernet.decrypt(val).decode('utf-8')
-                    except InvalidToken:
-                        try:
-                            decrypted = val.decode('utf-8')
-                        except Exception:
-                            decrypted = str(val)
-                    new_values.append(new_crypto.encrypt_text(decrypted))
-                assignments = ", ".join(f"{col} = ?" for col in to_process)
-                conn.execute(
-                    f"UPDATE {table_name} SET {assignments} WHERE {id_column} = ?",
-                    (*new_values, _id),
-                )
-                count += 1
+        count = reencrypt_rows(conn, table_name, to_process, convert, job="migrate_secret_key",
+                               id_column=id_column, chunk_size=chunk_size, progress=progress, cancel=cancel)
+        clear_checkpoint(conn)
     finally:
         conn.close()
 
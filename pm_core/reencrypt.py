@@ -0,0 +1,98 @@
+"""
+Chunked, resumable re-encryption of encrypted columns.
+
+reencrypt_rows() walks a table in id order (keyset, `chunk_size` rows at a
+time), converts each encrypted value and writes the chunk with executemany().
+Every chunk commits together with a checkpoint in `settings`, so memory stays
+flat, a crash or cancel loses at most one chunk, and calling it again with the
+same job name continues after the last committed id. The caller makes the
+final switch (new key, canary) and clear_checkpoint() in one transaction.
+"""
+import json
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+from .db import transaction
+from .settings_store import delete_setting, get_setting, set_setting
+
+CHECKPOINT_KEY = "reencrypt_checkpoint"
+
+# progress(rows_done, rows_total, rows_per_second)
+Progress = Callable[[int, int, float], None]
+
+class ReencryptCancelled(Exception):
+    """Stopped at a chunk boundary; the checkpoint is kept for a later resume."""
+
+def load_checkpoint(conn: sqlite3.Connection) -> Optional[Dict]:
+    raw = get_setting(conn, CHECKPOINT_KEY)
+    return json.loads(bytes(raw).decode("utf-8")) if raw else None
+
+def clear_checkpoint(conn: sqlite3.Connection) -> None:
+    delete_setting(conn, CHECKPOINT_KEY)
+
+def reencrypt_rows(
+    conn: sqlite3.Connection,
+    table: str,
+    fields: Sequence[str],
+    convert: Callable[[bytes], bytes],
+    job: str,
+    id_column: str = "id",
+    chunk_size: int = 1000,
+    progress: Optional[Progress] = None,
+    cancel: Optional[threading.Event] = None,
+    convert_many: Optional[Callable[[List[bytes], List[int]], List[bytes]]] = None,
+) -> int:
+    """
+    Apply `convert` to every non-NULL value of `fields`; returns rows done
+    (including earlier runs). With convert_many, each chunk's values are
+    converted in one batch call instead, given the values and their row ids
+    (for formats that bind the id, e.g. VaultCrypto.encrypt_records).
+    """
+    cp = load_checkpoint(conn)
+    if cp and (cp.get("job"), cp.get("table")) != (job, table):
+        raise RuntimeError(f"Another re-encryption ({cp.get('job')} on {cp.get('table')}) is unfinished")
+    last_id = cp["last_id"] if cp else None
+    done = cp["done"] if cp else 0
+
+    cols = ", ".join(fields)
+    assigns = ", ".join(f"{c}=?" for c in fields)
+    select_first = f"SELECT {id_column}, {cols} FROM {table} ORDER BY {id_column} LIMIT ?"
+    select_next = f"SELECT {id_column}, {cols} FROM {table} WHERE {id_column} > ? ORDER BY {id_column} LIMIT ?"
+    update = f"UPDATE {table} SET {assigns} WHERE {id_column}=?"
+
+    total = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    started, run_rows = time.perf_counter(), 0
+    while True:
+        if cancel is not None and cancel.is_set():
+            raise ReencryptCancelled(f"stopped after {done} of {total} rows")
+        # Read and write the chunk under one write lock so a concurrent edit
+        # cannot be overwritten with a stale re-encrypted value.
+        with transaction(conn):
+            rows = (conn.execute(select_first, (chunk_size,)) if last_id is None
+                    else conn.execute(select_next, (last_id, chunk_size))).fetchall()
+            if not rows:
+                return done
+            if convert_many is not None:
+                pairs = [(v, row[0]) for row in rows for v in row[1:] if v is not None]
+                converted = iter(convert_many([v for v, _ in pairs], [i for _, i in pairs]))
+                batch = [
+                    (*(None if v is None else next(converted) for v in row[1:]), row[0])
+                    for row in rows
+                ]
+            else:
+                batch = [
+                    (*(None if v is None else convert(v) for v in row[1:]), row[0])
+                    for row in rows
+                ]
+            last_id = rows[-1][0]
+            conn.executemany(update, batch)
+            done += len(rows)
+            set_setting(conn, CHECKPOINT_KEY, json.dumps(
+                {"job": job, "table": table, "last_id": last_id, "done": done}
+            ).encode("utf-8"))
+        run_rows += len(rows)
+        if progress is not None:
+            elapsed = time.perf_counter() - started
+            progress(done, max(total, done), run_rows / elapsed if elapsed > 0 else 0.0)
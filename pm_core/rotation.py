@@ -1,18 +1,20 @@
 from __future__ import annotations
 
-import json
-import secrets
-from typing import Iterable
+import threading
+from typing import Callable, Dict, Iterable, Optional
 
-from .settings_store import _connect, ensure_schema, unlock_vault, get_setting, set_setting
+from cryptography.fernet import Fernet
+
+from .db import transaction
+from .reencrypt import Progress, clear_checkpoint, load_checkpoint, reencrypt_rows
+from .settings_store import (
+    PENDING_DEK_KEY, WRAPPED_DEK_KEY, _connect, _data_key, _load_kdf, _unwrap, _wrap,
+    change_master_password, delete_setting, ensure_schema, get_setting, set_setting,
+)
 from .kdf import derive_fernet_key
 from .vault_crypto import VaultCrypto
 
-def _to_bytes(x):
-    if isinstance(x, bytes): return x
-    if isinstance(x, memoryview): return bytes(x)
-    if isinstance(x, str): return x.encode("utf-8")
-    raise TypeError(type(x))
+_ROTATE_JOB = "rotate_data_key"
 
 def rotate_master_password(
     db_path: str,
@@ -21,54 +23,77 @@ def rotate_master_password(
     table_name: str = "passwords",
     encrypted_fields: Iterable[str] = ("password",),
     id_column: str = "id",
+    new_kdf_params: Optional[Dict] = None,
 ) -> int:
     """
-    Re-encrypt all selected columns with a NEW key derived from new_password.
-    Also rotates the vault salt + canary. Returns number of rows processed.
+    Switch the vault to new_password (new salt; new_kdf_params if given, e.g. a
+    stronger calibrated set). Entries are encrypted with the data key, which is
+    only re-wrapped, so nothing is re-encrypted and 0 rows are returned.
+    table_name/encrypted_fields/id_column are kept for callers of the old
+    row-by-row rotation; use rotate_data_key() to re-encrypt every row.
     """
     ensure_schema(db_path)
-    old_vc: VaultCrypto = unlock_vault(db_path, old_password)  # verifies old password
+    change_master_password(db_path, old_password, new_password, new_kdf_params)
+    return 0
+
+def rotate_data_key(
+    db_path: str,
+    master_password: str,
+    table_name: str = "passwords",
+    encrypted_fields: Iterable[str] = ("password",),
+    id_column: str = "id",
+    chunk_size: int = 1000,
+    progress: Optional[Progress] = None,
+    cancel: Optional[threading.Event] = None,
+    on_key: Optional[Callable[[VaultCrypto], None]] = None,
+    workers: int = 0,
+) -> int:
+    """
+    Re-encrypt all selected columns under a NEW random data key, wrapped by the
+    current master password. Returns number of rows processed.
 
+    Runs in committed chunks (pm_core.reencrypt). The new key is kept in
+    settings as pending_dek meanwhile and the vault unlocks with both keys, so
+    an interrupted run leaves a usable vault; calling this again resumes it.
+    on_key receives a VaultCrypto that reads both keys (and writes the new one)
+    before any row changes, so an open session can keep working meanwhile.
+    """
+    ensure_schema(db_path)
     conn = _connect(db_path)
     try:
-        # Load KDF params and derive NEW key with NEW salt
-        kdf_params_b = get_setting(conn, "kdf_params")
-        if not kdf_params_b:
-            raise RuntimeError("kdf_params missing; vault not initialized")
-        kdf_params = json.loads(kdf_params_b.decode("utf-8"))
-        new_salt = secrets.token_bytes(int(kdf_params.get("salt_bytes", 16)))
-        new_key = derive_fernet_key(new_password, new_salt, kdf_params)
-        new_vc = VaultCrypto(new_key)
+        salt, kdf_params, canary = _load_kdf(conn)
+        kek = derive_fernet_key(master_password, salt, kdf_params)
+        old_dek = _data_key(conn, kek, canary)  # verifies the password
 
-        # Fetch rows to rewrap
-        cols = list(encrypted_fields)
-        col_expr = ", ".join(cols)
-        rows = conn.execute(f"SELECT {id_column}, {col_expr} FROM {table_name}").fetchall()
+        pending = get_setting(conn, PENDING_DEK_KEY)
+        if pending:
+            new_dek = _unwrap(kek, pending)  # resume the interrupted rotation
+        else:
+            new_dek = Fernet.generate_key()
+            with transaction(conn):
+                cp = load_checkpoint(conn)
+                if cp and cp.get("job") == _ROTATE_JOB:
+                    clear_checkpoint(conn)  # stale: its pending key is gone
+                set_setting(conn, PENDING_DEK_KEY, _wrap(kek, new_dek))
 
-        conn.execute("BEGIN")
-        try:
-            count = 0
-            for row in rows:
-                pk = row[0]
-                old_vals = row[1:]
-                new_vals = []
-                for val in old_vals:
-                    if val is None:
-                        new_vals.append(None)
-                        continue
-                    plain = old_vc.decrypt_text(_to_bytes(val))
-                    new_vals.append(new_vc.encrypt_text(plain))
-                assigns = ", ".join(f"{c}=?" for c in cols)
-                conn.execute(f"UPDATE {table_name} SET {assigns} WHERE {id_column}=?", (*new_vals, pk))
-                count += 1
+        both = VaultCrypto(new_dek, old_dek)  # reads either key, writes the new one
+        if on_key is not None:
+            on_key(both)
+        count = reencrypt_rows(
+            conn, table_name, list(encrypted_fields), None,
+            job=_ROTATE_JOB, id_column=id_column, chunk_size=chunk_size,
+            progress=progress, cancel=cancel,
+            # legacy Fernet tokens come out as binary records (pm_core.records)
+            convert_many=lambda vals, ids: both.encrypt_records(
+                both.decrypt_records(vals, ids, workers=workers, as_bytes=True), ids, workers=workers),
+        )
 
-            # Switch vault salt + canary after data is safely rewrapped
-            set_setting(conn, "salt", new_salt)
-            set_setting(conn, "canary", new_vc.encrypt_text("canary-ok"))
-            conn.execute("COMMIT")
-            return count
-        except Exception:
-            conn.execute("ROLLBACK")
-            raise
+        # Every row is under the new key: switch wrapped key + canary atomically
+        with transaction(conn):
+            set_setting(conn, WRAPPED_DEK_KEY, _wrap(kek, new_dek))
+            set_setting(conn, "canary", VaultCrypto(new_dek).encrypt_text("canary-ok"))
+            delete_setting(conn, PENDING_DEK_KEY)
+            clear_checkpoint(conn)
+        return count
     finally:
         conn.close()
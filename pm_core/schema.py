@@ -0,0 +1,139 @@
+"""
+Versioned migrations for the `passwords` table, recorded in schema_migrations.
+
+v1 is the original table (settings_store.ensure_schema records it).
+v2 adds case-insensitive indexes on title/username and an integer
+created_epoch column (back-filled from created_at in batches).
+v3 adds the passwords_fts FTS5 index over title/username, kept in sync by
+triggers. On a SQLite build without FTS5 it is not recorded (search falls
+back to LIKE) and upgrade() tries it again next time.
+"""
+import logging
+import sqlite3
+from datetime import datetime
+from typing import Callable, Dict, Optional, Set
+
+from .db import transaction
+
+BACKFILL_BATCH = 1000
+
+PASSWORDS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS passwords (
+        id INTEGER PRIMARY KEY,
+        title TEXT NOT NULL,
+        username TEXT,
+        password BLOB NOT NULL,
+        recovery_codes TEXT,
+        created_at TEXT NOT NULL
+    )
+"""
+
+# Records are bound to their entry id, so writers allocate ids (MAX + 1)
+# before encrypting and insert with explicit ids (database.py, pm_core.aio).
+MAX_ID_SQL = "SELECT COALESCE(MAX(id), 0) FROM passwords"
+INSERT_WITH_ID_SQL = """
+    INSERT INTO passwords (id, title, username, password, recovery_codes, created_at, created_epoch)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT MAX(version) FROM schema_migrations").fetchone()
+    return int(row[0] or 0)
+
+def _applied(conn: sqlite3.Connection) -> Set[int]:
+    return {int(v) for (v,) in conn.execute("SELECT version FROM schema_migrations")}
+
+def _columns(conn: sqlite3.Connection, table: str):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+def to_epoch(created_at: Optional[str]) -> Optional[int]:
+    if not created_at:
+        return None
+    try:
+        return int(datetime.fromisoformat(str(created_at)).timestamp())
+    except ValueError:
+        return None
+
+def _backfill_created_epoch(conn: sqlite3.Connection, batch: int = BACKFILL_BATCH) -> int:
+    # Keyset walk over id with one short transaction per batch, so a large
+    # vault never holds the write lock for the whole back-fill.
+    last_id, done = 0, 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, created_at FROM passwords WHERE id > ? AND created_epoch IS NULL ORDER BY id LIMIT ?",
+            (last_id, batch),
+        ).fetchall()
+        if not rows:
+            return done
+        with transaction(conn):
+            conn.executemany(
+                "UPDATE passwords SET created_epoch = ? WHERE id = ?",
+                [(to_epoch(created), pk) for pk, created in rows],
+            )
+        last_id = rows[-1][0]
+        done += len(rows)
+
+def _v2_indexes_and_epoch(conn: sqlite3.Connection) -> None:
+    if "created_epoch" not in _columns(conn, "passwords"):
+        conn.execute("ALTER TABLE passwords ADD COLUMN created_epoch INTEGER")
+    _backfill_created_epoch(conn)
+    with transaction(conn):
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_passwords_title_nocase ON passwords(title COLLATE NOCASE)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_passwords_username_nocase ON passwords(username COLLATE NOCASE)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_passwords_created_epoch ON passwords(created_epoch)")
+
+FTS_TABLE = "passwords_fts"
+
+_FTS_SQL = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, username,
+        content='passwords', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS passwords_fts_ai AFTER INSERT ON passwords BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, username) VALUES (new.id, new.title, new.username);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS passwords_fts_ad AFTER DELETE ON passwords BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, username) VALUES ('delete', old.id, old.title, old.username);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS passwords_fts_au AFTER UPDATE OF title, username ON passwords BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, username) VALUES ('delete', old.id, old.title, old.username);
+        INSERT INTO {FTS_TABLE}(rowid, title, username) VALUES (new.id, new.title, new.username);
+    END""",
+)
+
+def has_fts(conn: sqlite3.Connection) -> bool:
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (FTS_TABLE,)).fetchone()
+    return row is not None
+
+def _v3_fts(conn: sqlite3.Connection) -> bool:
+    try:
+        with transaction(conn):
+            for sql in _FTS_SQL:
+                conn.execute(sql)
+            conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    except sqlite3.OperationalError as e:
+        if "fts5" not in str(e).lower():
+            raise
+        logging.getLogger("pm").warning("SQLite build lacks FTS5; search will use LIKE scans")
+        return False
+    return True
+
+# A migration returning False could not be applied here: it is not recorded and is retried
+MIGRATIONS: Dict[int, Callable[[sqlite3.Connection], Optional[bool]]] = {
+    2: _v2_indexes_and_epoch,
+    3: _v3_fts,
+}
+
+def upgrade(conn: sqlite3.Connection) -> int:
+    """
+    Apply unrecorded migrations in order (each is idempotent), including one
+    skipped earlier; returns the highest recorded version.
+    """
+    applied = _applied(conn)
+    for target in sorted(v for v in MIGRATIONS if v not in applied):
+        if MIGRATIONS[target](conn) is False:
+            continue
+        conn.execute("INSERT OR IGNORE INTO schema_migrations(version) VALUES (?)", (target,))
+    return current_version(conn)
@@ -0,0 +1,113 @@
+"""
+Search semantics shared by the SQL path (database.search_passwords, FTS5) and
+the in-memory path used while the user keeps typing.
+
+A query is split into terms; an entry matches when every term is a prefix of
+some token in its title or username. Entries whose title alone matches every
+term rank first ("tier 0"), then the rest, each tier in id order. Queries
+without word characters, and every query on a SQLite build without FTS5,
+fall back to a case-insensitive substring match.
+"""
+import re
+import unicodedata
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+Row = Tuple
+
+# Same token boundaries as FTS5's unicode61 tokenizer (letters/digits; '_' separates).
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+def fold(text: str) -> str:
+    # unicode61 remove_diacritics=2 + case folding
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+def tokens(text: Optional[str]) -> List[str]:
+    return _TOKEN_RE.findall(fold(text or ""))
+
+def fts_match_expr(query: str) -> str:
+    """FTS5 MATCH expression: "git hu" -> "git"* "hu"*  (empty when the query has no terms)."""
+    return " ".join(f'"{tok}"*' for tok in _TOKEN_RE.findall(query))
+
+def narrows(previous: Optional[str], query: str, substring: bool = False) -> bool:
+    """True when every hit for `query` is guaranteed to be a hit for `previous`."""
+    prev, new = (previous or "").strip(), query.strip()
+    if not prev or not new.startswith(prev):
+        return False
+    if substring:
+        return True
+    # Appending text only extends the last term or adds terms, unless the match
+    # mode flips between term matching and the substring fallback.
+    return bool(tokens(prev)) == bool(tokens(new))
+
+def _prefix_hit(term: str, toks: Sequence[str]) -> bool:
+    for t in toks:
+        if t.startswith(term):
+            return True
+    return False
+
+def refine(query: str, rows: Sequence[Row], token_cache: Optional[Dict] = None,
+           ranked: bool = True, substring: bool = False) -> List[Row]:
+    """
+    Re-apply the search to rows already fetched (id, title, username, ...), keeping
+    rank order. With ranked=False the input order is kept as-is (rows that came
+    back from a sorted query). substring=True matches the way the LIKE fallback
+    does, for rows fetched without FTS5.
+    """
+    terms = [] if substring else tokens(query)
+    if not terms:
+        needle = query.strip().lower()
+        return [r for r in rows if needle in str(r[1] or "").lower() or needle in str(r[2] or "").lower()]
+
+    cache = token_cache if token_cache is not None else {}
+    title_hits, other_hits = [], []
+    for r in rows:
+        toks = cache.get(r[0])
+        if toks is None:
+            toks = cache[r[0]] = (tokens(r[1]), tokens(r[2]))
+        title_toks, user_toks = toks
+        if ranked and all(_prefix_hit(term, title_toks) for term in terms):
+            title_hits.append(r)
+        elif all(_prefix_hit(term, title_toks) or _prefix_hit(term, user_toks) for term in terms):
+            other_hits.append(r)
+    return title_hits + other_hits
+
+class SearchResultCache:
+    """
+    Remembers the last query's full result set. A query that narrows it is
+    answered by refine() in memory; anything else goes back to `fetch`.
+    A sort order is part of the key: `fetch(query, order=order)` is called
+    when one is given, and a change of order always fetches again.
+    `substring()` says whether fetch is on the substring fallback (no FTS5);
+    it is asked on each fetch so refine() matches what SQL did.
+    """
+
+    def __init__(self, fetch: Callable[..., List[Row]], substring: Callable[[], bool] = lambda: False):
+        self._fetch = fetch
+        self._substring_mode = substring
+        self._substring = False
+        self._query: Optional[str] = None
+        self._order: Optional[tuple] = None
+        self._rows: List[Row] = []
+        self._tokens: Dict = {}
+        self.fetches = 0
+
+    def results(self, query: str, order=None) -> List[Row]:
+        query = query.strip()
+        order = tuple(order) if order else None
+        if order != self._order:
+            self.invalidate()
+        if query == self._query:
+            return self._rows
+        if narrows(self._query, query, self._substring):
+            rows = refine(query, self._rows, self._tokens, ranked=order is None, substring=self._substring)
+        else:
+            self._substring = self._substring_mode()
+            rows = self._fetch(query, order=order) if order else self._fetch(query)
+            self.fetches += 1
+            self._tokens = {}
+        self._query, self._order, self._rows = query, order, rows
+        return rows
+
+    def invalidate(self) -> None:
+        self._query, self._order, self._rows, self._tokens = None, None, [], {}
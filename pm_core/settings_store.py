@@ -2,9 +2,15 @@ import json
 import os
 import sqlite3
 import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Dict
 
+from cryptography.fernet import Fernet, InvalidToken
+
+from .db import open_connection, transaction
 from .kdf import derive_fernet_key
+from .metrics import counter, histogram
 from .vault_crypto import VaultCrypto
 
 SETTINGS_TABLE_SQL = """CREATE TABLE IF NOT EXISTS settings (
@@ -19,10 +25,9 @@ MIGRATIONS_TABLE_SQL = """CREATE TABLE IF NOT EXISTS schema_migrations (
 """
 
 def _connect(db_path: str) -> sqlite3.Connection:
-    conn = sqlite3.connect(db_path, isolation_level=None, timeout=30.0)
-    conn.execute("PRAGMA journal_mode=WAL;")
-    conn.execute("PRAGMA synchronous=NORMAL;")
-    return conn
+    # Fresh connection with the shared pragma profile (see pm_core.db);
+    # callers own it and close it when done.
+    return open_connection(db_path)
 
 def ensure_schema(db_path: str) -> None:
     conn = _connect(db_path)
@@ -42,6 +47,54 @@ def get_setting(conn: sqlite3.Connection, key: str) -> Optional[bytes]:
 def set_setting(conn: sqlite3.Connection, key: str, value: bytes) -> None:
     conn.execute("INSERT OR REPLACE INTO settings(key, value) VALUES (?, ?)", (key, value))
 
+def delete_setting(conn: sqlite3.Connection, key: str) -> None:
+    conn.execute("DELETE FROM settings WHERE key=?", (key,))
+
+# Envelope encryption: entries are encrypted with a random data key (DEK);
+# settings hold that key wrapped (Fernet) by the key derived from the master
+# password. Changing the master password only re-wraps the DEK.
+WRAPPED_DEK_KEY = "wrapped_dek"
+# New data key of an unfinished rotate_data_key(); rows are under either key
+# until it completes.
+PENDING_DEK_KEY = "pending_dek"
+
+def _wrap(kek: bytes, dek: bytes) -> bytes:
+    return Fernet(kek).encrypt(dek)
+
+def _unwrap(kek: bytes, wrapped: bytes) -> bytes:
+    try:
+        return Fernet(kek).decrypt(bytes(wrapped))
+    except InvalidToken:
+        raise PermissionError("Invalid master password") from None
+
+def _load_kdf(conn: sqlite3.Connection):
+    salt = get_setting(conn, "salt")
+    kdf_params_b = get_setting(conn, "kdf_params")
+    canary = get_setting(conn, "canary")
+    if not (salt and kdf_params_b and canary):
+        raise RuntimeError("Vault not initialized")
+    return salt, json.loads(kdf_params_b.decode("utf-8")), canary
+
+def is_initialized(db_path: str) -> bool:
+    """True once bootstrap_first_run() has set up this vault (so a failed unlock is a wrong password)."""
+    ensure_schema(db_path)
+    conn = _connect(db_path)
+    try:
+        return get_setting(conn, "kdf_params") is not None
+    finally:
+        conn.close()
+
+def _data_key(conn: sqlite3.Connection, kek: bytes, canary: bytes) -> bytes:
+    """Unwrap the DEK with `kek`. A legacy vault (no wrapped DEK yet) adopts kek itself as its DEK."""
+    wrapped = get_setting(conn, WRAPPED_DEK_KEY)
+    dek = _unwrap(kek, wrapped) if wrapped else kek
+    if not VaultCrypto.is_valid_token(dek, canary):
+        raise PermissionError("Invalid master password")
+    if not wrapped:
+        # rows are already encrypted under the derived key: keep it as the DEK
+        set_setting(conn, WRAPPED_DEK_KEY, _wrap(kek, dek))
+    return dek
+
 def bootstrap_first_run(db_path: str, master_password: str, kdf_params: Dict) -> VaultCrypto:
     ensure_schema(db_path)
     conn = _connect(db_path)
@@ -49,26 +102,43 @@ def bootstrap_first_run(db_path: str, master_password: str, kdf_params: Dict) ->
         if get_setting(conn, "kdf_params"):
             raise RuntimeError("Vault already initialized")
         salt = secrets.token_bytes(int(kdf_params.get("salt_bytes", 16)))
-        fernet_key = derive_fernet_key(master_password, salt, kdf_params)
+        kek = derive_fernet_key(master_password, salt, kdf_params)
+        dek = Fernet.generate_key()
         set_setting(conn, "salt", salt)
         set_setting(conn, "kdf_params", json.dumps(kdf_params).encode("utf-8"))
-        crypto = VaultCrypto(fernet_key)
+        set_setting(conn, WRAPPED_DEK_KEY, _wrap(kek, dek))
+        crypto = VaultCrypto(dek)
         canary = crypto.encrypt_text("canary-ok")
         set_setting(conn, "canary", canary)
     conn.close()
     return crypto
 
+_UNLOCKS = counter("pm_unlock_total", "Vault unlock attempts by result (ok, failed, error)", ("result",))
+_UNLOCK_SECONDS = histogram("pm_unlock_seconds", "Vault unlock latency: key derivation and unwrap")
+
 def unlock_vault(db_path: str, master_password: str) -> VaultCrypto:
+    t0 = time.perf_counter()
+    try:
+        crypto = _unlock(db_path, master_password)
+    except PermissionError:
+        _UNLOCKS.labels("failed").inc()
+        raise
+    except Exception:
+        _UNLOCKS.labels("error").inc()
+        raise
+    finally:
+        _UNLOCK_SECONDS.observe(time.perf_counter() - t0)
+    _UNLOCKS.labels("ok").inc()
+    return crypto
+
+def _unlock(db_path: str, master_password: str) -> VaultCrypto:
     conn = _connect(db_path)
     try:
-        salt = get_setting(conn, "salt")
-        kdf_params_b = get_setting(conn, "kdf_params")
-        canary = get_setting(conn, "canary")
-        if not (salt and kdf_params_b and canary):
-            raise RuntimeError("Vault not initialized")
-        kdf_params = json.loads(kdf_params_b.decode("utf-8"))
-        fernet_key = derive_fernet_key(master_password, salt, kdf_params)
-        crypto = VaultCrypto(fernet_key)
+        salt, kdf_params, canary = _load_kdf(conn)
+        kek = derive_fernet_key(master_password, salt, kdf_params)
+        dek = _data_key(conn, kek, canary)
+        pending = get_setting(conn, PENDING_DEK_KEY)
+        crypto = VaultCrypto(_unwrap(kek, pending), dek) if pending else VaultCrypto(dek)
         txt = crypto.decrypt_text(canary)
         if txt != "canary-ok":
             raise PermissionError("Invalid master password")
@@ -76,25 +146,31 @@ def unlock_vault(db_path: str, master_password: str) -> VaultCrypto:
     finally:
         conn.close()
 
-def change_master_password(db_path: str, old_password: str, new_password: str) -> None:
+def change_master_password(db_path: str, old_password: str, new_password: str,
+                           new_kdf_params: Optional[Dict] = None) -> None:
+    """
+    Re-wrap the data key under a key derived from new_password (new salt; new
+    KDF params if given). No entry is re-encrypted; the old and new key
+    derivations run in parallel, so this costs about one KDF run.
+    """
     conn = _connect(db_path)
     try:
-        salt = get_setting(conn, "salt")
-        kdf_params_b = get_setting(conn, "kdf_params")
-        canary = get_setting(conn, "canary")
-        if not (salt and kdf_params_b and canary):
-            raise RuntimeError("Vault not initialized")
-        kdf_params = json.loads(kdf_params_b.decode("utf-8"))
-        old_key = derive_fernet_key(old_password, salt, kdf_params)
-        old_crypto = VaultCrypto(old_key)
-        if old_crypto.decrypt_text(canary) != "canary-ok":
-            raise PermissionError("Invalid current master password")
-
-        new_salt = os.urandom(int(kdf_params.get("salt_bytes", 16)))
-        new_key = derive_fernet_key(new_password, new_salt, kdf_params)
-        new_crypto = VaultCrypto(new_key)
-        with conn:
+        salt, kdf_params, canary = _load_kdf(conn)
+        params = new_kdf_params or kdf_params
+        new_salt = os.urandom(int(params.get("salt_bytes", 16)))
+        # Argon2 releases the GIL, so two threads really derive concurrently
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            old_f = pool.submit(derive_fernet_key, old_password, salt, kdf_params)
+            new_f = pool.submit(derive_fernet_key, new_password, new_salt, params)
+            old_kek, new_kek = old_f.result(), new_f.result()
+        with transaction(conn):
+            dek = _data_key(conn, old_kek, canary)
             set_setting(conn, "salt", new_salt)
-            set_setting(conn, "canary", new_crypto.encrypt_text("canary-ok"))
+            set_setting(conn, WRAPPED_DEK_KEY, _wrap(new_kek, dek))
+            pending = get_setting(conn, PENDING_DEK_KEY)
+            if pending:
+                set_setting(conn, PENDING_DEK_KEY, _wrap(new_kek, _unwrap(old_kek, pending)))
+            if new_kdf_params:
+                set_setting(conn, "kdf_params", json.dumps(new_kdf_params).encode("utf-8"))
     finally:
         conn.close()
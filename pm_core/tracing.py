@@ -0,0 +1,138 @@
+"""
+Lightweight spans for hot paths.
+
+    with span("tree.fill", rows=n): ...
+    @traced()                      # span named module.qualname
+    def list_passwords(...): ...
+
+Off by default: span() hands back one shared no-op context manager and a
+@traced function costs one flag check on top of the call. Set PM_TRACE=1 (or
+call enable()) to time them: every span is logged at INFO on the "pm.trace"
+logger with its total and self time (minus nested spans), indented by
+depth, and per-name totals are logged at exit (log_totals()). No handler is attached here:
+records propagate to the app's redacting "pm" handlers (setup_logger), or
+configure logging yourself (e.g. logging.basicConfig) in a script. Spans nest per thread, so a slow
+refresh shows how much went to the database, crypto, the KDF or Tk.
+
+run_profiled() runs a callable under cProfile and dumps the stats to a file
+(main.py --profile).
+"""
+import atexit
+import cProfile
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+TRACE_ENV = "PM_TRACE"
+
+_enabled = os.environ.get(TRACE_ENV, "").strip().lower() not in ("", "0", "false", "no")
+_local = threading.local()
+_lock = threading.Lock()
+_totals: Dict[str, List[float]] = {}  # name -> [count, total_ms, self_ms]
+_log = logging.getLogger("pm.trace")
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+def enabled() -> bool:
+    return _enabled
+
+def enable(on: bool = True) -> None:
+    global _enabled
+    _enabled = on
+    # spans are INFO even when the app logs at WARNING; otherwise inherit from "pm"
+    _log.setLevel(logging.INFO if on else logging.NOTSET)
+
+def _stack() -> List[List[float]]:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+@contextmanager
+def _timed(name: str, fields: Dict[str, Any]):
+    stack = _stack()
+    frame = [0.0]  # time spent in nested spans
+    stack.append(frame)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        total = (time.perf_counter() - t0) * 1000.0
+        stack.pop()
+        if stack:
+            stack[-1][0] += total
+        own = total - frame[0]
+        with _lock:
+            t = _totals.setdefault(name, [0, 0.0, 0.0])
+            t[0] += 1
+            t[1] += total
+            t[2] += own
+        extra = "".join(f" {k}={v}" for k, v in fields.items())
+        _log.info("span %s%s %.3f ms (self %.3f ms)%s", "  " * len(stack), name, total, own, extra)
+
+def span(name: str, **fields: Any):
+    """Time the block as `name` when tracing is on; `fields` are logged with it."""
+    if not _enabled:
+        return _NO_SPAN
+    return _timed(name, fields)
+
+def traced(name: Optional[str] = None) -> Callable[[Callable], Callable]:
+    """Decorator: run the function inside span(name or module.qualname)."""
+    def wrap(fn: Callable) -> Callable:
+        label = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _timed(label, {}):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+def totals() -> List[Tuple[str, int, float, float]]:
+    """(name, count, total_ms, self_ms) per span name, most self time first."""
+    with _lock:
+        rows = [(k, int(v[0]), v[1], v[2]) for k, v in _totals.items()]
+    return sorted(rows, key=lambda r: r[3], reverse=True)
+
+def reset() -> None:
+    with _lock:
+        _totals.clear()
+
+@atexit.register
+def log_totals() -> None:
+    """
+    Log per-span totals and start counting afresh. The app calls it before
+    shutdown_logging(), while the "pm" handlers are still attached; the atexit
+    call then covers scripts (and logs nothing twice).
+    """
+    if _enabled:
+        for name, count, total, own in totals():
+            _log.info("span total %s: %d call(s), %.1f ms (self %.1f ms)", name, count, total, own)
+        reset()
+
+def run_profiled(fn: Callable[..., Any], out_path: str, *args, **kwargs) -> Any:
+    """Call fn under cProfile and dump the stats to out_path (read with pstats/snakeviz), even on error."""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        profiler.disable()
+        profiler.dump_stats(out_path)
+        _log.info("profile written to %s", os.path.abspath(out_path))
+
+if _enabled:
+    enable()
@@ -0,0 +1,84 @@
+"""
+Reconcile a flat ttk.Treeview with a new list of rows, keyed by entry id.
+
+Instead of deleting every item and inserting the new rows, only rows that
+were added, removed, moved or edited touch the widget, and only rows whose
+stripe parity changed are re-tagged. Moves are minimal: the longest run of
+items already in the right relative order (a longest increasing subsequence)
+stays put, and only the rest are detached and re-attached in place.
+"""
+import bisect
+from typing import Dict, List, Sequence, Set, Tuple
+
+Row = Tuple
+
+def stripe(index: int) -> str:
+    return "odd" if index % 2 else "even"
+
+def _in_order(positions: List[int]) -> Set[int]:
+    """Indexes into `positions` (distinct ints) forming one longest increasing subsequence, O(n log n)."""
+    tails: List[int] = []   # tails[k]: smallest last value of an increasing run of length k + 1
+    tail_at: List[int] = []  # index in positions of that value
+    prev = [-1] * len(positions)
+    for i, p in enumerate(positions):
+        k = bisect.bisect_left(tails, p)
+        if k == len(tails):
+            tails.append(p)
+            tail_at.append(i)
+        else:
+            tails[k] = p
+            tail_at[k] = i
+        prev[i] = tail_at[k - 1] if k else -1
+    keep, i = set(), tail_at[-1] if tail_at else -1
+    while i >= 0:
+        keep.add(i)
+        i = prev[i]
+    return keep
+
+def reconcile(tree, rows: Sequence[Row], shadow: Dict[str, Tuple[Row, str]], first_index: int = 0) -> int:
+    """
+    Make the tree's top-level items equal `rows` (iid = str(row[0])).
+    `shadow` maps iid -> (values, tag) as last written to the widget and is
+    updated in place; `first_index` is the absolute position of rows[0], used
+    for striping. Returns the number of widget operations performed.
+    """
+    ops = 0
+    want = [str(r[0]) for r in rows]
+    target = {iid: i for i, iid in enumerate(want)}
+
+    current = list(tree.get_children())
+    stale = [iid for iid in current if iid not in target]
+    if stale:
+        tree.delete(*stale)
+        ops += 1
+        for iid in stale:
+            shadow.pop(iid, None)
+        current = [iid for iid in current if iid in target]
+
+    # Keep the largest set of survivors already in order; detach the others so
+    # that, walking `want` in order, every item belongs at index i
+    stay = _in_order([target[iid] for iid in current])
+    moving = [iid for n, iid in enumerate(current) if n not in stay]
+    if moving:
+        tree.detach(*moving)
+        ops += 1
+    placed = {current[n] for n in stay}
+    detached = set(moving)
+
+    for i, (iid, row) in enumerate(zip(want, rows)):
+        tag = stripe(first_index + i)
+        values = tuple(row)
+        if iid in detached:
+            tree.move(iid, "", i)  # re-attaches it
+            ops += 1
+        elif iid not in placed:
+            tree.insert("", i, iid=iid, values=values, tags=(tag,))
+            shadow[iid] = (values, tag)
+            ops += 1
+            continue
+        old_values, old_tag = shadow.get(iid, (None, None))
+        if old_values != values or old_tag != tag:
+            tree.item(iid, values=values, tags=(tag,))
+            shadow[iid] = (values, tag)
+            ops += 1
+    return ops
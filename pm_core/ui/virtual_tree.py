@@ -0,0 +1,258 @@
+"""
+Virtual-list mode for ttk.Treeview.
+
+Only the rows that fit in the widget are inserted; everything else stays in
+the database. RowWindow keeps a small buffer (visible rows plus a margin on
+each side) and refills it with keyset queries while scrolling sequentially,
+or with one OFFSET query when the scrollbar is dragged somewhere far away.
+"""
+import tkinter as tk
+import tkinter.ttk as ttk
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .tree_sync import reconcile
+
+Row = Tuple
+
+class RowSource:
+    """Rows for a VirtualTreeview; each row is a tuple whose first item is the entry id."""
+
+    # True when fetch_at() is cheap and stable (in-memory lists); keyset
+    # sources re-anchor on row keys instead.
+    positional = False
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def fetch_after(self, row: Row, limit: int) -> List[Row]:
+        """Up to `limit` rows that sort after `row`, in display order."""
+        raise NotImplementedError
+
+    def fetch_before(self, row: Row, limit: int) -> List[Row]:
+        """Up to `limit` rows that sort before `row`, in display order."""
+        raise NotImplementedError
+
+    def fetch_at(self, offset: int, limit: int) -> List[Row]:
+        raise NotImplementedError
+
+class ListSource(RowSource):
+    """In-memory rows (search results, small tables)."""
+
+    positional = True
+
+    def __init__(self, rows: Sequence[Row]):
+        self.rows = list(rows)
+        self._pos = {r[0]: i for i, r in enumerate(self.rows)}
+
+    def count(self) -> int:
+        return len(self.rows)
+
+    def fetch_after(self, row, limit):
+        i = self._pos.get(row[0])
+        return [] if i is None else self.rows[i + 1:i + 1 + limit]
+
+    def fetch_before(self, row, limit):
+        i = self._pos.get(row[0])
+        return [] if i is None else self.rows[max(0, i - limit):i]
+
+    def fetch_at(self, offset, limit):
+        return self.rows[offset:offset + limit]
+
+class RowWindow:
+    """Buffered slice [start, start + len(rows)) of a RowSource."""
+
+    def __init__(self, source: RowSource, margin: int = 100):
+        self.margin = max(1, margin)
+        self.reset(source)
+
+    def reset(self, source: Optional[RowSource] = None) -> None:
+        if source is not None:
+            self.source = source
+        self.total = self.source.count()
+        self.start = 0
+        self.rows: List[Row] = []
+
+    def reload(self) -> None:
+        """
+        Re-read the buffered range after writes without moving it. Keyset sources
+        re-anchor on the row just before the buffer, so the cost does not depend
+        on how far down the table the buffer is.
+        """
+        n = len(self.rows)
+        self.total = self.source.count()
+        if not n:
+            return
+        if self.source.positional or self.start == 0:
+            self.rows = self.source.fetch_at(self.start, n)
+            return
+        prev = self.source.fetch_before(self.rows[0], 1)
+        self.rows = self.source.fetch_after(prev[0], n) if prev else self.source.fetch_at(0, n)
+        if not prev:
+            self.start = 0
+
+    def index_of(self, iid: str) -> Optional[int]:
+        """Absolute position of a buffered row by id, or None."""
+        for i, row in enumerate(self.rows):
+            if str(row[0]) == iid:
+                return self.start + i
+        return None
+
+    def get(self, top: int, n: int) -> List[Row]:
+        lo = max(0, min(top, self.total))
+        hi = min(self.total, lo + n)
+        buf_end = self.start + len(self.rows)
+        if self.rows and self.start <= lo and hi <= buf_end:
+            pass
+        elif self.rows and self.start <= lo <= buf_end + self.margin:
+            # scrolled down past the buffer: keyset-continue after the last row
+            more = self.source.fetch_after(self.rows[-1], hi + self.margin - buf_end)
+            self.rows.extend(more)
+        elif self.rows and self.start - self.margin <= hi <= buf_end:
+            # scrolled up past the buffer: keyset-continue before the first row
+            want = self.start - max(0, lo - self.margin)
+            more = self.source.fetch_before(self.rows[0], want)
+            self.rows[:0] = more
+            self.start -= len(more)
+        else:
+            first = max(0, lo - self.margin)
+            self.rows = self.source.fetch_at(first, hi + self.margin - first)
+            self.start = first
+        self._trim(lo, hi)
+        return self.rows[lo - self.start:hi - self.start]
+
+    def _trim(self, lo: int, hi: int) -> None:
+        keep_lo = max(self.start, lo - self.margin)
+        keep_hi = hi + self.margin
+        if keep_lo > self.start:
+            del self.rows[:keep_lo - self.start]
+            self.start = keep_lo
+        if self.start + len(self.rows) > keep_hi:
+            del self.rows[keep_hi - self.start:]
+
+class VirtualTreeview:
+    """
+    Drives `tree` from a RowSource. With virtual=True the tree never holds more
+    than one screenful of items and `scrollbar` reflects the position in the
+    full row set; with virtual=False all rows are inserted (plain mode).
+    """
+
+    def __init__(self, tree: ttk.Treeview, scrollbar: ttk.Scrollbar,
+                 source: Optional[RowSource] = None, virtual: bool = True, margin: int = 100):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.virtual = virtual
+        self.window = RowWindow(source or ListSource([]), margin)
+        self.top = 0
+        self._selected: Optional[str] = None
+        self._shown: List[str] = []
+        self._shadow: Dict = {}  # iid -> (values, tag) currently in the widget
+
+        if virtual:
+            scrollbar.configure(command=self._on_scrollbar)
+            tree.bind("<Configure>", lambda e: self.render(), add="+")
+            for seq in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+                tree.bind(seq, self._on_wheel)
+            tree.bind("<Up>", lambda e: self._on_key(-1))
+            tree.bind("<Down>", lambda e: self._on_key(1))
+            tree.bind("<Prior>", lambda e: self._on_page(-1))
+            tree.bind("<Next>", lambda e: self._on_page(1))
+        else:
+            scrollbar.configure(command=tree.yview)
+            tree.configure(yscrollcommand=scrollbar.set)
+
+    @property
+    def total(self) -> int:
+        return self.window.total
+
+    def set_source(self, source: RowSource, keep_position: bool = False) -> None:
+        self.window.reset(source)
+        if not keep_position:
+            self.top = 0
+        self.render()
+
+    def refresh(self) -> None:
+        """Re-read the rows on screen after writes, keeping scroll position and selection."""
+        anchor = self._shown[0] if self._shown else None
+        self.window.reload()
+        if anchor is not None:
+            pos = self.window.index_of(anchor)
+            if pos is not None:
+                self.top = pos  # keep the same first row on screen
+        self.render()
+
+    def visible_rows(self) -> int:
+        if not self.virtual:
+            return self.total
+        try:
+            rowheight = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        except (tk.TclError, ValueError):
+            rowheight = 20
+        # one row's worth of height goes to the heading
+        return max(1, self.tree.winfo_height() // rowheight - 1)
+
+    def scroll_to(self, top: int) -> None:
+        self.top = top
+        self.render()
+
+    def render(self) -> None:
+        n = self.visible_rows()
+        self.top = max(0, min(self.top, self.total - n))
+        rows = self.window.get(self.top, n)
+
+        sel = self.tree.selection()
+        if sel:
+            self._selected = sel[0]
+        elif self._selected in self._shown:
+            self._selected = None  # deselected by the user while visible
+
+        # Only rows that entered, left, moved or changed touch the widget
+        reconcile(self.tree, rows, self._shadow, first_index=self.top)
+        self._shown = [str(r[0]) for r in rows]
+        if self._selected in self._shown and self._selected not in sel:
+            self.tree.selection_set(self._selected)
+
+        if self.virtual:
+            if self.total:
+                self.scrollbar.set(self.top / self.total, (self.top + len(rows)) / self.total)
+            else:
+                self.scrollbar.set(0.0, 1.0)
+
+    # ---- scrolling ----
+    def _on_scrollbar(self, action, *args):
+        n = self.visible_rows()
+        if action == "moveto":
+            self.scroll_to(int(float(args[0]) * self.total))
+        elif action == "scroll":
+            step = int(args[0]) * (n if args[1] == "pages" else 1)
+            self.scroll_to(self.top + step)
+
+    def _on_wheel(self, event):
+        if event.num == 4:
+            step = -3
+        elif event.num == 5:
+            step = 3
+        elif abs(event.delta) >= 120:  # Windows
+            step = -3 * (event.delta // 120)
+        else:  # macOS reports small deltas
+            step = -event.delta
+        self.scroll_to(self.top + step)
+        return "break"
+
+    def _on_key(self, direction: int):
+        focus = self.tree.focus()
+        if not self._shown:
+            return None
+        edge = self._shown[0] if direction < 0 else self._shown[-1]
+        if focus != edge:
+            return None  # let ttk move the cursor inside the visible window
+        before = self.top
+        self.scroll_to(self.top + direction)
+        if self.top != before and self._shown:
+            target = self._shown[0] if direction < 0 else self._shown[-1]
+            self.tree.selection_set(target)
+            self.tree.focus(target)
+        return "break"
+
+    def _on_page(self, direction: int):
+        self.scroll_to(self.top + direction * self.visible_rows())
+        return "break"
@@ -1,20 +1,167 @@
 import json
-from typing import Any, Dict
-from cryptography.fernet import Fernet, InvalidToken
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Union
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+
+from .metrics import counter
+from .records import is_record, open_record, record_aead, seal
+from .tracing import traced
+
+# Batches smaller than this stay on the calling thread: below it, handing
+# chunks to a pool costs more than the AES/HMAC work it spreads out.
+PARALLEL_MIN_ITEMS = 4096
+
+_VALUES = counter("pm_crypto_values_total", "Column values encrypted/decrypted, by op and format", ("op", "format"))
+_FAILURES = counter("pm_crypto_failures_total", "Values that failed to decrypt (wrong key or id, tampered)")
+# bound once: these run per value
+_ENC_FERNET, _DEC_FERNET = _VALUES.labels("encrypt", "fernet").inc, _VALUES.labels("decrypt", "fernet").inc
+_ENC_RECORD, _DEC_RECORD = _VALUES.labels("encrypt", "record").inc, _VALUES.labels("decrypt", "record").inc
+
+def _chunks(items: Sequence, n: int) -> List[Sequence]:
+    size = -(-len(items) // n)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def _map_ordered(fn: Callable[[Sequence], List], items: Sequence, workers: int) -> List:
+    """fn over contiguous chunks of items, on `workers` threads (OpenSSL releases the GIL); order kept."""
+    if workers == 0:
+        workers = (os.cpu_count() or 1) if len(items) >= PARALLEL_MIN_ITEMS else 1
+    if workers <= 1 or len(items) < 2:
+        return fn(items)
+    out: List = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for part in pool.map(fn, _chunks(items, workers * 4)):
+            out.extend(part)
+    return out
 
 class VaultCrypto:
-    def __init__(self, fernet_key: bytes):
-        self._fernet = Fernet(fernet_key)
+    def __init__(self, fernet_key: bytes, *fallback_keys: bytes):
+        # Fallback keys only decrypt (e.g. the old data key while a rotation is
+        # half done); new tokens always use fernet_key.
+        if fallback_keys:
+            self._fernet = MultiFernet([Fernet(k) for k in (fernet_key, *fallback_keys)])
+        else:
+            self._fernet = Fernet(fernet_key)
+        self._records = [record_aead(k) for k in (fernet_key, *fallback_keys)]
 
+    @traced()
     def encrypt_text(self, plaintext: str) -> bytes:
+        _ENC_FERNET()
         return self._fernet.encrypt(plaintext.encode('utf-8'))
 
+    @traced()
     def decrypt_text(self, token: bytes) -> str:
-        return self._fernet.decrypt(token).decode('utf-8')
+        try:
+            data = self._fernet.decrypt(token)
+        except InvalidToken:
+            _FAILURES.inc()
+            raise
+        _DEC_FERNET()
+        return data.decode('utf-8')
+
+    @traced()
+    def encrypt_many(self, plaintexts: Iterable[Union[str, bytes]], workers: int = 0) -> List[bytes]:
+        """
+        Encrypt a batch, preserving order. Items may already be bytes (no re-encoding).
+        workers: 0 = pool only for large batches, 1 = this thread, n = n threads.
+        """
+        items = plaintexts if isinstance(plaintexts, (list, tuple)) else list(plaintexts)
+        enc = self._fernet.encrypt_at_time
+
+        def run(part):
+            now = int(time.time())  # one clock read per chunk instead of per token
+            return [enc(p if isinstance(p, bytes) else p.encode('utf-8'), now) for p in part]
+
+        _ENC_FERNET(len(items))
+        return _map_ordered(run, items, workers)
+
+    @traced()
+    def decrypt_many(self, tokens: Iterable[Union[bytes, str]], workers: int = 0,
+                     as_bytes: bool = False) -> List[Union[str, bytes]]:
+        """
+        Decrypt a batch of tokens to text (raw bytes with as_bytes=True, e.g. to
+        re-encrypt without a decode/encode round trip), preserving order.
+        """
+        items = tokens if isinstance(tokens, (list, tuple)) else list(tokens)
+        dec = self._fernet.decrypt
+
+        def run(part):
+            if as_bytes:
+                return [dec(t) for t in part]
+            return [dec(t).decode('utf-8') for t in part]
+
+        try:
+            out = _map_ordered(run, items, workers)
+        except InvalidToken:
+            _FAILURES.inc()
+            raise
+        _DEC_FERNET(len(items))
+        return out
+
+    # ---- column values: binary records (pm_core.records), bound to the entry id ----
+
+    @traced()
+    def encrypt_record(self, plaintext: Union[str, bytes], entry_id: int) -> bytes:
+        data = plaintext if isinstance(plaintext, bytes) else plaintext.encode('utf-8')
+        _ENC_RECORD()
+        return seal(self._records[0], data, entry_id)
+
+    def _open_value(self, value: Union[bytes, str, memoryview], entry_id: int) -> bytes:
+        if is_record(value):
+            for aead in self._records:
+                try:
+                    data = open_record(aead, value, entry_id)
+                except InvalidTag:
+                    continue
+                _DEC_RECORD()
+                return data
+            _FAILURES.inc()
+            raise InvalidToken
+        try:
+            data = self._fernet.decrypt(value.encode('ascii') if isinstance(value, str) else bytes(value))
+        except InvalidToken:
+            _FAILURES.inc()
+            raise
+        _DEC_FERNET()
+        return data
+
+    @traced()
+    def decrypt_record(self, value: Union[bytes, str, memoryview], entry_id: int,
+                       as_bytes: bool = False) -> Union[str, bytes]:
+        """Plaintext of a stored value: a record or a legacy Fernet token."""
+        data = self._open_value(value, entry_id)
+        return data if as_bytes else data.decode('utf-8')
+
+    @traced()
+    def encrypt_records(self, plaintexts: Sequence[Union[str, bytes]], entry_ids: Sequence[int],
+                        workers: int = 0) -> List[bytes]:
+        """encrypt_record over a batch (pairs with entry_ids), preserving order."""
+        aead = self._records[0]
+        _ENC_RECORD(len(entry_ids))
+        return _map_ordered(
+            lambda part: [seal(aead, p if isinstance(p, bytes) else p.encode('utf-8'), i) for p, i in part],
+            list(zip(plaintexts, entry_ids)), workers)
+
+    @traced()
+    def decrypt_records(self, values: Sequence, entry_ids: Sequence[int], workers: int = 0,
+                        as_bytes: bool = False) -> List[Union[str, bytes]]:
+        """decrypt_record over a batch (records and tokens may be mixed), preserving order."""
+        dec = self._open_value
+
+        def run(part):
+            if as_bytes:
+                return [dec(v, i) for v, i in part]
+            return [dec(v, i).decode('utf-8') for v, i in part]
+
+        return _map_ordered(run, list(zip(values, entry_ids)), workers)
 
+    @traced()
     def encrypt_json(self, obj: Dict[str, Any]) -> bytes:
         return self._fernet.encrypt(json.dumps(obj, separators=(',', ':')).encode('utf-8'))
 
+    @traced()
     def decrypt_json(self, token: bytes) -> Dict[str, Any]:
         data = self._fernet.decrypt(token)
         return json.loads(data.decode('utf-8'))
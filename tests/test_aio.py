@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+from cryptography.fernet import InvalidToken
+
+from pm_core.aio import AsyncVault
+from pm_core.db import open_connection
+from pm_core.settings_store import bootstrap_first_run, ensure_schema
+
+KDF = {"primary": "argon2id", "argon2_memory_kib": 8192, "argon2_time_cost": 1, "argon2_parallelism": 1, "salt_bytes": 16}
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "v.db")
+    ensure_schema(path)
+    bootstrap_first_run(path, "pw", KDF)
+    return path
+
+def test_coalesced_gets_iteration_and_store(db):
+    async def scenario():
+        async with await AsyncVault.open(db, "pw", batch_size=500) as vault:
+            ids = await vault.store_many({"title": f"t{i}", "username": "u", "password": f"p{i}"} for i in range(1200))
+            assert ids == list(range(1, 1201))
+
+            queries = []
+            fetch = vault._fetch_ids
+            vault._fetch_ids = lambda chunk: queries.append(len(chunk)) or fetch(chunk)
+            wanted = ids + ids[:100] + [99999]  # duplicates share a lookup; 99999 is missing
+            got = await asyncio.gather(*(vault.get(i) for i in wanted))
+            assert sorted(queries) == [201, 500, 500]  # 1201 distinct ids, three IN (...) batches
+            assert got[0]["password"] == "p0" and got[1199]["password"] == "p1199"
+            assert got[1200] == got[0] and got[-1] is None
+            assert [e and e["id"] for e in await vault.get_many([3, 99999, 1])] == [3, None, 1]
+
+            rows = [r async for r in vault.iter_entries(page_size=256, decrypt=True)]
+            assert [r["id"] for r in rows] == ids and rows[-1]["password"] == "p1199"
+            async for r in vault.iter_entries(page_size=100):
+                assert "password" not in r
+                break
+    asyncio.run(scenario())
+
+def test_bad_value_fails_only_its_lookup(db):
+    async def scenario():
+        vault = await AsyncVault.open(db, "pw")
+        await vault.store_many([{"title": "a", "password": "x"}, {"title": "b", "password": "y"}])
+        conn = open_connection(db)
+        conn.execute("UPDATE passwords SET password = (SELECT password FROM passwords WHERE id = 1) WHERE id = 2")
+        conn.close()
+        ok, bad = await asyncio.gather(vault.get(1), vault.get(2), return_exceptions=True)
+        assert ok["password"] == "x" and isinstance(bad, InvalidToken)
+        await vault.close()
+        with pytest.raises(RuntimeError):
+            await vault.store_many([{"title": "c", "password": "z"}])
+    asyncio.run(scenario())
+
+def test_store_retries_when_another_writer_takes_the_ids(db):
+    async def scenario():
+        async with await AsyncVault.open(db, "pw") as vault:
+            encrypt, calls = vault._crypto.encrypt_records, []
+            def racing(values, ids):
+                if not calls:  # a second writer commits while we encrypt
+                    conn = open_connection(db)
+                    conn.execute("INSERT INTO passwords (title, password, created_at) VALUES ('other', x'00', '2024-01-01')")
+                    conn.close()
+                calls.append(list(ids))
+                return encrypt(values, ids)
+            vault._crypto.encrypt_records = racing
+            ids = await vault.store_many([{"title": "a", "password": "x"}, {"title": "b", "password": "y"}])
+            assert calls == [[1, 2], [2, 3]] and ids == [2, 3]
+            assert [e["password"] for e in await vault.get_many(ids)] == ["x", "y"]
+    asyncio.run(scenario())
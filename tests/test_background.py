@@ -0,0 +1,70 @@
+import threading
+
+from pm_core.background import BackgroundRunner
+
+class FakeRoot:
+    """root.after() bookkeeping only; the test plays the Tk event loop."""
+
+    def __init__(self):
+        self.timers, self.errors = [], []
+
+    def after(self, ms, fn):
+        self.timers.append(fn)
+        return len(self.timers)
+
+    def after_cancel(self, timer_id):
+        pass
+
+    def report_callback_exception(self, *exc_info):
+        self.errors.append(exc_info[1])
+
+    def run_timers(self):
+        timers, self.timers = self.timers, []
+        for fn in timers:
+            fn()
+
+def test_callbacks_run_on_the_polling_thread_with_busy_edges():
+    root = FakeRoot()
+    busy, got = [], []
+    tk_thread = threading.get_ident()
+    runner = BackgroundRunner(root, workers=2, on_busy=busy.append)
+    release = threading.Event()
+
+    def work(x):
+        release.wait(5)
+        return x * 2, threading.get_ident()
+
+    runner.submit(work, 1, on_done=lambda r: got.append((r[0], threading.get_ident())))
+    runner.submit(lambda: 1 / 0, on_error=lambda e: got.append(type(e).__name__))
+    runner.submit(lambda: None, on_done=lambda r: 1 / 0)  # a failing callback is reported
+    assert busy == [True] and runner.busy
+
+    release.set()
+    while runner.busy:
+        root.run_timers()
+    runner.shutdown(wait=True)
+
+    assert busy == [True, False]
+    assert sorted(map(str, got)) == sorted(map(str, ["ZeroDivisionError", (2, tk_thread)]))
+    assert len(root.errors) == 1 and isinstance(root.errors[0], ZeroDivisionError)
+
+def test_call_soon_is_delivered_without_a_pending_job():
+    root = FakeRoot()
+    runner = BackgroundRunner(root)
+    got = []
+    runner.call_soon(got.append, "tk")  # on the Tk thread: schedules its own poll
+    assert len(root.timers) == 1
+    root.run_timers()
+    assert got == ["tk"] and not root.timers
+
+    def late(_):
+        # a worker queues a call after this poll drained the calls, as its job ends
+        t = threading.Thread(target=runner.call_soon, args=(got.append, "worker"))
+        t.start()
+        t.join()
+    runner.submit(lambda: None, on_done=late).result(5)
+    root.run_timers()
+    assert len(root.timers) == 1  # kept polling for the stray call
+    root.run_timers()
+    runner.shutdown(wait=True)
+    assert got == ["tk", "worker"] and not root.timers
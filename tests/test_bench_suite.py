@@ -0,0 +1,19 @@
+import copy
+
+from benchmarks import suite
+
+def test_suite_runs_small_vault_and_compare_flags_regressions():
+    params = dict(suite.default_params(), argon2_memory_kib=8192, argon2_time_cost=1, argon2_parallelism=1)
+    report = suite.run_suite(sizes=(300,), runs=2, kdf_params=params)
+    results = report["results"]
+    for name in ("derive_fernet_key", "store_password@300", "list_passwords@300", "get_password_details@300",
+                 "search[vpn]@300", "rotate_master_password@300", "export_encrypted@300", "import_encrypted@300"):
+        assert results[name]["median_ms"] > 0
+    assert report["meta"]["sizes"] == [300]
+
+    assert {r["status"] for r in suite.compare(report, report)} == {"ok"}
+    slower = copy.deepcopy(report)
+    slower["results"]["list_passwords@300"]["median_ms"] = results["list_passwords@300"]["median_ms"] * 2 + 1
+    rows = {r["bench"]: r["status"] for r in suite.compare(slower, report)}
+    assert rows["list_passwords@300"] == "REGRESSION"
+    assert rows["store_password@300"] == "ok"
@@ -0,0 +1,215 @@
+import io
+import json
+import importlib
+import os
+import socket
+import socketserver
+import sqlite3
+import threading
+
+import pytest
+
+import database
+import pm
+from pm_core import agent
+from pm_core.settings_store import bootstrap_first_run, ensure_schema, unlock_vault
+
+needs_unix = pytest.mark.skipif(not hasattr(socket, "AF_UNIX") or not hasattr(os, "getuid"),
+                                reason="the agent needs Unix domain sockets")
+needs_fork = pytest.mark.skipif(not hasattr(os, "fork"), reason="daemonizing needs os.fork")
+
+KDF = {"primary": "argon2id", "argon2_memory_kib": 8192, "argon2_time_cost": 1, "argon2_parallelism": 1, "salt_bytes": 16}
+
+@pytest.fixture
+def vault(tmp_path, monkeypatch):
+    db = str(tmp_path / "v.db")
+    ensure_schema(db)
+    bootstrap_first_run(db, "master-pw", KDF)
+    monkeypatch.setattr(database, "DB_FILE", database.DB_FILE)  # pm.main points it at --db
+    monkeypatch.setenv("PM_PASSWORD", "master-pw")
+    return db
+
+def _run(capsys, monkeypatch, *argv, stdin=""):
+    monkeypatch.setattr("sys.stdin", io.StringIO(stdin))
+    code = pm.main(list(argv))
+    captured = capsys.readouterr()
+    return code, [json.loads(l) for l in captured.out.splitlines()], captured.err
+
+def test_batch_add_get_list_search(vault, capsys, monkeypatch):
+    lines = "\n".join(json.dumps({"title": f"site {i}", "username": f"u{i}", "password": f"p{i}"}) for i in range(2500))
+    code, out, _ = _run(capsys, monkeypatch, "--db", vault, "add", stdin=lines)
+    assert code == 0 and [o["id"] for o in out] == list(range(1, 2501))
+
+    code, out, _ = _run(capsys, monkeypatch, "--db", vault, "get", stdin='7\n{"id": 2500}\n9999\n')
+    assert code == 1
+    assert [o.get("password") for o in out] == ["p6", "p2499", None] and out[2]["error"] == "not found"
+
+    code, out, _ = _run(capsys, monkeypatch, "--db", vault, "list", "--order", "title", "--desc", "--limit", "1200")
+    assert len(out) == 1200 and out[0]["title"] == "site 999"
+    code, out, _ = _run(capsys, monkeypatch, "--db", vault, "search", "u42", "--limit", "5")
+    assert {"id": 43, "title": "site 42", "username": "u42"} in out
+
+def test_bad_batch_line_writes_nothing(vault, capsys, monkeypatch):
+    code, _, err = _run(capsys, monkeypatch, "--db", vault, "add", stdin='{"title": "a", "password": "x"}\n{"title": "b"}\n')
+    assert code == 2 and "line 2" in err
+    _, out, _ = _run(capsys, monkeypatch, "--db", vault, "list")
+    assert out == []
+
+def test_wrong_password_and_export_import(vault, tmp_path, capsys, monkeypatch):
+    _run(capsys, monkeypatch, "--db", vault, "add", stdin='{"title": "a", "password": "x"}\n')
+    monkeypatch.setenv("EXPORT_PASS", "portable")
+    out_file = str(tmp_path / "e.pmx")
+    code, out, _ = _run(capsys, monkeypatch, "--db", vault, "export", out_file, "--passphrase-env", "EXPORT_PASS")
+    assert code == 0 and out == [{"exported": out_file}]
+    code, out, _ = _run(capsys, monkeypatch, "--db", vault, "import", out_file, "--replace", "--passphrase-env", "EXPORT_PASS")
+    assert code == 0 and out == [{"imported": 1}]
+
+    monkeypatch.setenv("PM_PASSWORD", "wrong")
+    code, out, err = _run(capsys, monkeypatch, "--db", vault, "list")
+    assert code == 1 and out == [] and err.startswith("pm: error:")
+
+def test_errors_exit_nonzero_with_message(vault, tmp_path, capsys, monkeypatch):
+    _run(capsys, monkeypatch, "--db", vault, "add", stdin='{"title": "a", "password": "x"}\n')
+    conn = sqlite3.connect(vault)
+    with conn:
+        conn.execute("UPDATE passwords SET password = ? WHERE id = 1", (b"\x01" + bytes(40),))
+    conn.close()
+    code, out, err = _run(capsys, monkeypatch, "--db", vault, "get", "1")
+    assert code == 1 and out == [] and err.startswith("pm: error:") and "decrypt" in err
+
+    # an export from another vault: its values are under another data key
+    other = str(tmp_path / "other.db")
+    ensure_schema(other)
+    bootstrap_first_run(other, "master-pw", KDF)
+    monkeypatch.setenv("EXPORT_PASS", "portable")
+    out_file = str(tmp_path / "o.pmx")
+    assert _run(capsys, monkeypatch, "--db", other, "export", out_file, "--passphrase-env", "EXPORT_PASS")[0] == 0
+    code, out, err = _run(capsys, monkeypatch, "--db", vault, "import", out_file, "--passphrase-env", "EXPORT_PASS")
+    assert code == 1 and out == [] and err.startswith("pm: error:") and "another vault" in err
+
+    code, out, err = _run(capsys, monkeypatch, "--db", vault, "import", str(tmp_path / "missing.pmx"))
+    assert code == 1 and out == [] and err.startswith("pm: error:") and "missing.pmx" in err
+    mine = str(tmp_path / "mine.pmx")
+    assert _run(capsys, monkeypatch, "--db", vault, "export", mine)[0] == 0
+    code, out, err = _run(capsys, monkeypatch, "--db", vault, "import", mine)  # merge: id 1 is taken
+    assert code == 1 and out == [] and err.startswith("pm: error:") and "UNIQUE" in err
+
+def test_transfer_and_rotate_do_not_unlock_first(vault, tmp_path, capsys, monkeypatch):
+    # they derive the keys they need themselves; a pre-unlock was one more Argon2 run
+    monkeypatch.setattr(pm, "unlock_vault", lambda *a: pytest.fail("unlocked before the command"))
+    monkeypatch.setenv("EXPORT_PASS", "portable")
+    out_file = str(tmp_path / "e.pmx")
+    assert _run(capsys, monkeypatch, "--db", vault, "--no-agent", "export", out_file, "--passphrase-env", "EXPORT_PASS")[0] == 0
+    assert _run(capsys, monkeypatch, "--db", vault, "--no-agent", "import", out_file, "--replace",
+                "--passphrase-env", "EXPORT_PASS")[0] == 0
+    monkeypatch.setenv("PM_NEW_PASSWORD", "next-pw")
+    assert _run(capsys, monkeypatch, "--db", vault, "--no-agent", "rotate")[0] == 0
+
+@needs_unix
+def test_agent_skips_unlock_and_locks_on_key_change(vault, tmp_path, capsys, monkeypatch):
+    sock = str(tmp_path / "run" / "agent.sock")
+    monkeypatch.setenv(agent.SOCKET_ENV, sock)
+    server = agent.Agent(unlock_vault(vault, "master-pw"), vault, idle_minutes=0)
+    t = threading.Thread(target=server.serve_forever)
+    t.start()
+    try:
+        assert oct(os.stat(sock).st_mode & 0o777) == "0o600"
+        monkeypatch.setenv("PM_PASSWORD", "wrong")  # never used: the agent has the key
+        code, out, _ = _run(capsys, monkeypatch, "--db", vault, "add", stdin='{"title": "a", "password": "x"}\n')
+        assert code == 0 and out == [{"id": 1}]
+        code, out, _ = _run(capsys, monkeypatch, "--db", vault, "get", "1")
+        assert out[0]["password"] == "x"
+        assert agent.connect(str(tmp_path / "other.db")) is None  # serves one vault only
+
+        monkeypatch.setenv("PM_PASSWORD", "master-pw")
+        monkeypatch.setenv("PM_NEW_PASSWORD", "next-pw")
+        code, _, _ = _run(capsys, monkeypatch, "--db", vault, "--no-agent", "rotate")
+        assert code == 0
+        code, _, err = _run(capsys, monkeypatch, "--db", vault, "get", "1")
+        assert code == 1 and err.startswith("pm: error:") and "keys changed" in err
+        t.join(5)
+        assert not t.is_alive() and not os.path.exists(sock)
+    finally:
+        if t.is_alive():
+            server.stop()
+            t.join()
+
+@needs_unix
+def test_agent_idle_timeout(vault, tmp_path):
+    sock = str(tmp_path / "a.sock")
+    server = agent.Agent(unlock_vault(vault, "master-pw"), vault, sock, idle_minutes=0.3 / 60)
+    t = threading.Thread(target=server.serve_forever)
+    t.start()
+    client = agent.AgentCrypto(sock)
+    assert client.decrypt_records(client.encrypt_records(["s"], [5]), [5]) == ["s"]
+    t.join(5)  # returns once idle
+    assert not t.is_alive() and not os.path.exists(sock) and agent.connect(vault, sock) is None
+    client.close()
+
+@needs_unix
+@pytest.mark.parametrize("problem", ["foreign owner", "world writable"])
+def test_agent_refuses_unsafe_socket_dir(vault, tmp_path, monkeypatch, problem):
+    folder = tmp_path / "run"
+    folder.mkdir(mode=0o700)
+    if problem == "foreign owner":
+        uid = os.getuid() + 1
+        monkeypatch.setattr(agent.os, "getuid", lambda: uid)
+    else:
+        os.chmod(folder, 0o777)
+    with pytest.raises(agent.AgentError, match="uid|other users"):
+        agent.Agent(unlock_vault(vault, "master-pw"), vault, str(folder / "a.sock"), idle_minutes=0)
+    assert not (folder / "a.sock").exists()
+
+@needs_unix
+def test_client_refuses_agent_of_another_uid(vault, tmp_path, monkeypatch):
+    sock = str(tmp_path / "a.sock")
+    server = agent.Agent(unlock_vault(vault, "master-pw"), vault, sock, idle_minutes=0)
+    t = threading.Thread(target=server.serve_forever)
+    t.start()
+    try:
+        uid = os.getuid() + 1
+        with monkeypatch.context() as m:
+            m.setattr(agent.os, "getuid", lambda: uid)
+            with pytest.raises(agent.AgentError, match="runs as uid|owned by uid"):
+                agent.AgentCrypto(sock)
+            assert agent.connect(vault, sock) is None
+    finally:
+        server.stop()
+        t.join()
+
+@needs_unix
+@needs_fork
+def test_agent_daemon_binds_after_fork(vault, tmp_path, capsys, monkeypatch):
+    sock = str(tmp_path / "a.sock")
+    code, out, _ = _run(capsys, monkeypatch, "--db", vault, "agent", "--socket", sock, "--idle-minutes", "1")
+    assert code == 0 and out[0]["agent"] == sock
+    pid = out[0]["pid"]
+    try:
+        client = agent.connect(vault, sock)
+        assert client is not None and client.info["pid"] == pid  # the child serves
+        client.close()
+    finally:
+        code, out, _ = _run(capsys, monkeypatch, "agent", "--socket", sock, "--stop")
+        os.waitpid(pid, 0)
+    assert out == [{"stopped": True, "socket": sock}]
+
+    bad = tmp_path / "open"
+    bad.mkdir(mode=0o777)
+    os.chmod(bad, 0o777)
+    code, out, err = _run(capsys, monkeypatch, "--db", vault, "agent", "--socket", str(bad / "a.sock"))
+    assert code == 1 and out == [] and "other users" in err
+
+def test_without_unix_sockets_cli_unlocks_directly(vault, capsys, monkeypatch):
+    # what Windows looks like: the module imports, connect() finds no agent
+    monkeypatch.delattr(socket, "AF_UNIX", raising=False)
+    monkeypatch.delattr(socketserver, "UnixStreamServer", raising=False)
+    try:
+        importlib.reload(agent)
+        assert agent.connect(vault) is None
+        with pytest.raises(agent.AgentError, match="Unix domain sockets"):
+            agent.Agent(unlock_vault(vault, "master-pw"), vault, idle_minutes=0)
+        code, out, _ = _run(capsys, monkeypatch, "--db", vault, "add", stdin='{"title": "a", "password": "x"}\n')
+        assert code == 0 and out == [{"id": 1}]
+    finally:
+        monkeypatch.undo()
+        importlib.reload(agent)
@@ -0,0 +1,156 @@
+import pytest
+from cryptography.fernet import Fernet
+
+import database
+import encryption
+from pm_core.db import close_all
+from pm_core.vault_crypto import VaultCrypto
+
+@pytest.fixture
+def vault_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_FILE", str(tmp_path / "passwords.db"))
+    encryption.set_crypto(VaultCrypto(Fernet.generate_key()))
+    database.create_tables()
+    yield database
+    close_all()
+    encryption.set_crypto(None)
+
+def test_bulk_store_update_delete(vault_db):
+    ids = vault_db.store_passwords_many(
+        {"title": f"t{i}", "username": f"u{i}", "password": f"p{i}"} for i in range(2500)
+    )
+    assert ids == list(range(1, 2501))
+    assert vault_db.get_password_details(ids[-1])["password"] == "p2499"
+
+    n = vault_db.update_passwords_many(
+        {"id": i, "title": "new", "username": "u", "password": "changed"} for i in ids[:10]
+    )
+    assert n == 10
+    assert vault_db.get_password_details(ids[0])["password"] == "changed"
+
+    assert vault_db.delete_entries_many(ids[:100] + [99999]) == 100
+    assert len(vault_db.list_passwords()) == 2400
+
+def test_search_prefix_ranked_and_synced(vault_db):
+    ids = vault_db.store_passwords_many([
+        {"title": "GitHub", "username": "octocat@example.com", "password": "a"},
+        {"title": "Gitea internal", "username": "admin", "password": "b"},
+        {"title": "Bank", "username": "github-backup", "password": "c"},
+        {"title": "50% off", "username": "shop", "password": "d"},
+    ])
+    # title hits rank above username-only hits
+    assert [r[0] for r in vault_db.search_passwords("git")] == [ids[0], ids[1], ids[2]]
+    assert [r[0] for r in vault_db.search_passwords("GITH OCTO")] == [ids[0]]
+    assert [r[0] for r in vault_db.search_passwords("git", limit=1, offset=2)] == [ids[2]]
+    assert [r[0] for r in vault_db.search_passwords("%")] == [ids[3]]  # no word chars -> LIKE
+
+    vault_db.update_password(ids[1], "Forgejo", "admin", "b")
+    vault_db.delete_password_entry(ids[0])
+    assert [r[0] for r in vault_db.search_passwords("git")] == [ids[2]]
+    assert [r[0] for r in vault_db.search_passwords("forg")] == [ids[1]]
+
+def test_keyset_pages(vault_db):
+    vault_db.store_passwords_many({"title": f"t{i}", "username": "u", "password": "p"} for i in range(50))
+    assert vault_db.count_passwords() == 50
+    assert [r[0] for r in vault_db.list_passwords_page(3)] == [1, 2, 3]
+    assert [r[0] for r in vault_db.list_passwords_page(3, after=(10,))] == [11, 12, 13]
+    assert [r[0] for r in vault_db.list_passwords_page(3, before=(10,))] == [7, 8, 9]
+    assert [r[0] for r in vault_db.list_passwords_at(48, 5)] == [49, 50]
+
+def test_sorted_keyset_pages_walk_the_full_order(vault_db):
+    vault_db.store_passwords_many(
+        {"title": f"{'ab'[i % 2]}{i % 5}" if i % 3 else f"B{i % 5}",
+         "username": None if i % 4 == 0 else f"u{i % 3}", "password": "p"}
+        for i in range(60)
+    )
+    for order in ([("title", False)], [("title", True)], [("username", False), ("title", True)],
+                  [("username", True), ("id", True)], [("title", False), ("username", True)]):
+        expected = vault_db.list_passwords_at(0, 100, order=order)
+        assert len(expected) == 60
+        walked, row = [], None
+        while True:
+            page = vault_db.list_passwords_page(7, after=row, order=order)
+            if not page:
+                break
+            walked += page
+            row = page[-1]
+        assert walked == expected, order
+        assert vault_db.list_passwords_page(5, before=expected[30], order=order) == expected[25:30], order
+
+    # search results honour the sort too
+    hits = vault_db.search_passwords("a", order=[("title", True)])
+    assert [r[1].lower() for r in hits] == sorted((r[1].lower() for r in hits), reverse=True)
+
+def test_refine_agrees_with_sql_search(vault_db):
+    from pm_core.search import refine
+    vault_db.store_passwords_many({"title": t, "username": u, "password": "p"} for t, u in [
+        ("GitHub", "octocat"), ("Gitea ops", "admin"), ("Bank", "github-backup"),
+        ("Hub", "git"), ("Café Gîte", "ops-team"), ("Git hub mirror", "x"),
+    ])
+    broad = vault_db.search_passwords("g")
+    for q in ("gi", "git", "git h", "git hub", "gite", "ops", "op git"):
+        assert refine(q, broad) == vault_db.search_passwords(q), q
+
+def test_search_cache_without_fts5_matches_like_search(vault_db, monkeypatch):
+    from pm_core.search import SearchResultCache
+    monkeypatch.setattr(database, "has_fts", lambda conn: False)
+    vault_db.store_passwords_many({"title": t, "username": u, "password": "p"} for t, u in [
+        ("GitHub", "octocat"), ("Bank", "github-backup"), ("Hub", "git"), ("Grub", "x"),
+    ])
+    cache = SearchResultCache(vault_db.search_passwords, vault_db.search_is_substring)
+    for q in ("h", "hu", "hub", "hub-"):  # "hu" is inside "GitHub", not a prefix of it
+        assert cache.results(q) == vault_db.search_passwords(q), q
+    assert cache.fetches == 1 and len(cache.results("hu")) == 3
+
+def test_details_cache_skips_db_and_is_invalidated_by_writes(vault_db):
+    [entry] = vault_db.store_passwords_many([{"title": "t", "username": "u", "password": "old"}])
+    assert vault_db.get_password_details(entry)["password"] == "old"
+    hits = vault_db._ENTRY_CACHE.hits
+    assert vault_db.get_password_details(entry)["password"] == "old"  # no SELECT, no decrypt
+    assert vault_db._ENTRY_CACHE.hits == hits + 1
+
+    vault_db.update_password(entry, "t", "u", "new")
+    assert vault_db.get_password_details(entry)["password"] == "new"
+    vault_db.delete_entries_many([entry])
+    assert vault_db.get_password_details(entry) is None
+
+    [entry] = vault_db.store_passwords_many([{"title": "t", "username": "u", "password": "p"}])
+    vault_db.get_password_details(entry)
+    vault_db.clear_entry_cache()
+    assert len(vault_db._ENTRY_CACHE) == 0
+
+def test_entries_are_stored_as_records_and_legacy_tokens_are_swept(vault_db):
+    conn = vault_db.get_db_connection()
+    crypto = encryption.get_crypto()
+    vault_db.store_password("new", "u", "fresh")
+    conn.executemany("INSERT INTO passwords (id, title, password, created_at) VALUES (?, ?, ?, '')",
+                     [(i, f"old{i}", crypto.encrypt_text(f"p{i}")) for i in range(2, 1203)])
+
+    def stored(entry_id):
+        return conn.execute("SELECT password FROM passwords WHERE id=?", (entry_id,)).fetchone()[0]
+    assert stored(1)[:1] == b"\x01"
+    assert vault_db.get_password_details(2)["password"] == "p2"  # legacy token read as is
+    vault_db.update_password(3, "old3", None, "p3")
+    assert stored(3)[:1] == b"\x01"  # upgraded on write
+
+    assert vault_db.upgrade_legacy_tokens() == 1200
+    assert vault_db.upgrade_legacy_tokens() == 0
+    assert vault_db.get_password_details(1202)["password"] == "p1202"
+    assert all(stored(i)[:1] == b"\x01" for i in (2, 600, 1202))
+
+def test_pages_by_created(vault_db):
+    vault_db.store_passwords_many({"title": f"t{i}", "username": "u", "password": "p"} for i in range(40))
+    conn = vault_db.get_db_connection()
+    with conn:  # spread the dates, with ties and a few unparsable (NULL) ones
+        conn.execute("UPDATE passwords SET created_epoch = CASE WHEN id % 9 = 0 THEN NULL ELSE 1700000000 + (id * 7) % 5 END")
+    for order in ([("created", False)], [("created", True)], [("created", True), ("title", False)]):
+        expected = vault_db.list_passwords_at(0, 100, order=order)
+        walked, row = [], None
+        while True:
+            page = vault_db.list_passwords_page(6, after=row, order=order)
+            if not page:
+                break
+            walked += page
+            row = page[-1]
+        assert walked == expected and len(walked) == 40, order
+        assert vault_db.list_passwords_page(4, before=expected[20], order=order) == expected[16:20], order
@@ -0,0 +1,30 @@
+import threading
+from pm_core.db import get_manager, close_all, transaction
+
+def test_thread_local_connections_and_pragmas(tmp_path):
+    mgr = get_manager(str(tmp_path / "pool.db"))
+    try:
+        conn = mgr.connection()
+        assert mgr.connection() is conn
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal"
+
+        other = []
+        t = threading.Thread(target=lambda: other.append(mgr.connection()))
+        t.start(); t.join()
+        assert other[0] is not conn
+
+        with mgr.pooled() as c1:
+            pass
+        with mgr.pooled() as c2:
+            assert c2 is c1
+
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        try:
+            with transaction(conn):
+                conn.execute("INSERT INTO t VALUES (1)")
+                raise ValueError
+        except ValueError:
+            pass
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    finally:
+        close_all()
@@ -0,0 +1,14 @@
+from pm_core.entry_cache import EntryCache
+
+def test_lru_ttl_and_copies():
+    now = [0.0]
+    cache = EntryCache(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+    cache.put(1, {"password": "a"})
+    cache.put(2, {"password": "b"})
+    cache.get(1)["password"] = "mutated"  # callers get copies
+    cache.put(3, {"password": "c"})       # evicts 2, the least recently used
+    assert cache.get(2) is None and cache.get(1) == {"password": "a"}
+
+    now[0] = 10.0
+    assert cache.get(1) is None and cache.get(3) is None  # expired
+    assert len(cache) == 0
@@ -17,8 +17,172 @@ def test_export_import_roundtrip(tmp_path):
     export_encrypted(str(db), "passwords", str(out), "P@ssw0rd-123")
     assert out.exists()
 
+    count = import_encrypted(str(db), str(out), "P@ssw0rd-123", merge=False)
+    assert count == 1
+
+    # another vault has another data key: the stored passwords would not decrypt there
+    import pytest
     db2 = tmp_path / "vault2.db"
     ensure_schema(str(db2))
     bootstrap_first_run(str(db2), "P@ssw0rd-123", {"primary":"argon2id","argon2_memory_kib":32768,"argon2_time_cost":2,"argon2_parallelism":2,"salt_bytes":16})
-    count = import_encrypted(str(db2), str(out), "P@ssw0rd-123", merge=False)
-    assert count == 1
+    with pytest.raises(ValueError, match="another vault"):
+        import_encrypted(str(db2), str(out), "P@ssw0rd-123", merge=False)
+
+def _vault_with_rows(path, n):
+    ensure_schema(str(path))
+    bootstrap_first_run(str(path), "pw", {"primary": "argon2id", "argon2_memory_kib": 8192, "argon2_time_cost": 1, "argon2_parallelism": 1, "salt_bytes": 16})
+    conn = sqlite3.connect(str(path))
+    with conn:
+        conn.execute("CREATE TABLE passwords (id INTEGER PRIMARY KEY, title TEXT, username TEXT, password BLOB, score REAL)")
+        conn.executemany("INSERT INTO passwords VALUES (?,?,?,?,?)",
+                         [(i, f"t{i}", None if i % 3 else "ü", b"gAAAA" + bytes([i % 256]) * 40, i / 4) for i in range(1, n + 1)])
+    conn.close()
+
+def _trimmed_copy(src, path, keep):
+    # same vault (same data key), fewer rows
+    import shutil
+    shutil.copy(src, path)
+    conn = sqlite3.connect(str(path))
+    with conn:
+        conn.execute("DELETE FROM passwords WHERE id > ?", (keep,))
+    conn.close()
+
+def _rows(path):
+    conn = sqlite3.connect(str(path))
+    try:
+        return conn.execute("SELECT * FROM passwords ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+def test_v2_export_streams_typed_chunks_and_rejects_tampering(tmp_path):
+    import pytest
+    from pm_core import export_v2
+
+    src = tmp_path / "src.db"
+    _vault_with_rows(src, 2500)
+    v2, v1 = tmp_path / "v2.pmx", tmp_path / "v1.pmjson.enc"
+    export_encrypted(str(src), "passwords", str(v2), "", passphrase="export-pass")
+    export_encrypted(str(src), "passwords", str(v1), "", passphrase="export-pass", version=1)
+    assert export_v2.is_v2(str(v2)) and v2.stat().st_size * 2 < v1.stat().st_size
+
+    dst = tmp_path / "dst.db"
+    ensure_schema(str(dst))
+    assert import_encrypted(str(dst), str(v2), "", passphrase="export-pass") == 2500
+    assert _rows(dst) == _rows(src)
+
+    data = v2.read_bytes()
+    for bad in (data[:-200], data[:-17] + bytes([data[-17] ^ 1]) + data[-16:]):  # truncated / flipped bit
+        v2.write_bytes(bad)
+        with pytest.raises(Exception):
+            import_encrypted(str(dst), str(v2), "", passphrase="export-pass", merge=False)
+        assert len(_rows(dst)) == 2500  # nothing half-imported
+
+def test_import_batches_report_progress_and_cancel_cleanly(tmp_path):
+    import threading
+    import pytest
+    from pm_core.import_pipeline import ImportCancelled
+
+    src = tmp_path / "src.db"
+    _vault_with_rows(src, 2500)
+    out = tmp_path / "v2.pmx"
+    export_encrypted(str(src), "passwords", str(out), "", passphrase="export-pass")
+    dst = tmp_path / "dst.db"
+    _trimmed_copy(src, dst, 3)
+
+    seen = []
+    assert import_encrypted(str(dst), str(out), "", passphrase="export-pass", merge=False,
+                            progress=lambda done, total, rate: seen.append((done, total))) == 2500
+    assert seen == [(1000, 2500), (2000, 2500), (2500, 2500)]
+
+    _trimmed_copy(src, tmp_path / "other.db", 3)
+    cancel = threading.Event()
+    with pytest.raises(ImportCancelled):
+        import_encrypted(str(tmp_path / "other.db"), str(out), "", passphrase="export-pass", merge=False,
+                         cancel=cancel, progress=lambda *a: cancel.set())
+    assert len(_rows(tmp_path / "other.db")) == 3  # untouched
+
+def test_v1_import_maps_columns_by_name_with_typed_blobs(tmp_path):
+    src = tmp_path / "src.db"
+    _vault_with_rows(src, 5)
+    conn = sqlite3.connect(str(src))
+    with conn:
+        conn.execute("UPDATE passwords SET title='ends-with=' WHERE id=1")  # used to be taken for base64
+    conn.close()
+    out = tmp_path / "v1.pmjson.enc"
+    export_encrypted(str(src), "passwords", str(out), "", passphrase="export-pass", version=1)
+
+    dst = tmp_path / "dst.db"
+    ensure_schema(str(dst))
+    conn = sqlite3.connect(str(dst))
+    with conn:  # different column order and no `score`
+        conn.execute("CREATE TABLE passwords (password BLOB, title TEXT, id INTEGER PRIMARY KEY, username TEXT)")
+    conn.close()
+    assert import_encrypted(str(dst), str(out), "", passphrase="export-pass") == 5
+    conn = sqlite3.connect(str(dst))
+    try:
+        got = conn.execute("SELECT id, title, username, password FROM passwords ORDER BY id").fetchall()
+    finally:
+        conn.close()
+    assert got == [r[:4] for r in _rows(src)]
+
+def test_v2_compression_codecs_round_trip(tmp_path):
+    from pm_core import codecs, export_v2
+
+    class Reverse(codecs.NoneCodec):  # a plugged-in codec, recorded by name
+        name = "reverse"
+        def compressor(self, level):
+            return type("C", (), {"compress": lambda s, d: d[::-1]})()
+        def decompressor(self):
+            return type("D", (), {"decompress": lambda s, d: d[::-1]})()
+    codecs.register_codec(Reverse())
+
+    src = tmp_path / "src.db"
+    _vault_with_rows(src, 2500)
+    sizes = {}
+    for name in ("none", "zlib", "reverse"):
+        out = tmp_path / f"{name}.pmx"
+        export_encrypted(str(src), "passwords", str(out), "", passphrase="export-pass", compression=name)
+        with open(out, "rb") as f:
+            f.read(4)
+            assert export_v2.read_header(f)[1]["compression"]["codec"] == name
+        dst = tmp_path / f"{name}.db"
+        ensure_schema(str(dst))
+        assert import_encrypted(str(dst), str(out), "", passphrase="export-pass") == 2500
+        assert _rows(dst) == _rows(src)
+        sizes[name] = out.stat().st_size
+    assert sizes["zlib"] * 3 < sizes["none"]
+
+    conn = sqlite3.connect(str(src))
+    try:
+        per_chunk, streamed = tmp_path / "chunk.pmx", tmp_path / "stream.pmx"
+        for path, stream in ((per_chunk, False), (streamed, True)):
+            with open(path, "wb") as f:
+                export_v2.write_export(conn, "passwords", f, "pw", {"primary": "scrypt", "scrypt_N": 1024},
+                                       chunk_rows=100, stream=stream)
+        with open(streamed, "rb") as f:
+            f.read(4)
+            raw, header = export_v2.read_header(f)
+            assert header["compression"]["stream"]
+            assert [r for rows in export_v2.iter_chunks(f, raw, header, "pw") for r in rows] == _rows(src)
+        assert streamed.stat().st_size < per_chunk.stat().st_size
+    finally:
+        conn.close()
+
+def test_staging_uses_a_file_backed_temp_store(tmp_path):
+    from pm_core.db import open_connection
+    from pm_core.import_pipeline import load_rows
+
+    conn = open_connection(str(tmp_path / "t.db"))
+    try:
+        conn.execute("CREATE TABLE passwords (id INTEGER PRIMARY KEY, title TEXT)")
+        assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2  # MEMORY from DEFAULTS.database
+        seen = []
+
+        def batches():
+            for start in range(0, 3000, 1000):
+                seen.append(conn.execute("PRAGMA temp_store").fetchone()[0])
+                yield [(i, f"t{i}") for i in range(start, start + 1000)]
+        assert load_rows(conn, "passwords", ["id", "title"], batches()) == 3000
+        assert seen == [1, 1, 1] and conn.execute("PRAGMA temp_store").fetchone()[0] == 2
+    finally:
+        conn.close()
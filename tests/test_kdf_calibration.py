@@ -0,0 +1,47 @@
+import sqlite3
+
+from pm_core.kdf_calibration import calibrate, is_weaker, needs_upgrade, save_baseline
+from pm_core.rotation import rotate_master_password
+from pm_core.settings_store import bootstrap_first_run, ensure_schema, unlock_vault
+
+def test_calibrate_fills_the_target_with_memory_then_passes(monkeypatch):
+    monkeypatch.setattr("os.cpu_count", lambda: 4)
+    now = [0.0]
+    seen = []
+    def fake_derive(pw, salt, p):
+        seen.append(p["argon2_parallelism"])
+        now[0] += p["argon2_memory_kib"] / 100_000_000 * p["argon2_time_cost"]  # 16 MiB pass ~ 0.16 ms
+    params = calibrate(target_ms=500, min_memory_kib=16384, max_memory_kib=1 << 20,
+                       derive=fake_derive, clock=lambda: now[0])
+    assert set(seen) == {4}
+    # 16 MiB -> 1 GiB while one pass fits, then ~10.5 ms passes fill the 500 ms budget
+    assert params["argon2_memory_kib"] == 1 << 20 and params["argon2_time_cost"] == 47
+    assert params["argon2_parallelism"] == 4 and params["calibrated_ms"] <= 500
+
+    capped = calibrate(target_ms=500, min_memory_kib=16384, max_memory_kib=16384, max_lanes=2,
+                       derive=fake_derive, clock=lambda: now[0])
+    assert capped["argon2_memory_kib"] == 16384 and capped["argon2_parallelism"] == 2
+
+def test_weaker_vault_is_rederived_with_the_baseline(tmp_path):
+    db = str(tmp_path / "vault.db")
+    weak = {"primary": "argon2id", "argon2_memory_kib": 8192, "argon2_time_cost": 1, "argon2_parallelism": 1, "salt_bytes": 16}
+    strong = dict(weak, argon2_memory_kib=16384, argon2_time_cost=2)
+    assert is_weaker(weak, strong) and not is_weaker(strong, weak)
+
+    ensure_schema(db)
+    crypto = bootstrap_first_run(db, "pw", weak)
+    conn = sqlite3.connect(db)
+    with conn:
+        conn.execute("CREATE TABLE passwords (id INTEGER PRIMARY KEY, password BLOB)")
+        conn.execute("INSERT INTO passwords (password) VALUES (?)", (crypto.encrypt_text("s3cret"),))
+    conn.close()
+
+    assert needs_upgrade(db) is None  # no baseline measured yet
+    save_baseline(db, strong)
+    assert needs_upgrade(db) == strong
+    assert rotate_master_password(db, "pw", "pw", new_kdf_params=strong) == 0  # re-wrap only
+    assert needs_upgrade(db) is None
+    vc = unlock_vault(db, "pw")
+    conn = sqlite3.connect(db)
+    assert vc.decrypt_text(conn.execute("SELECT password FROM passwords").fetchone()[0]) == "s3cret"
+    conn.close()
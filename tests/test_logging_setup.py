@@ -0,0 +1,22 @@
+import logging
+from logging.handlers import QueueHandler
+
+from pm_core.logging_setup import _redact, setup_logger, shutdown_logging
+
+def test_redaction_is_case_insensitive():
+    assert _redact("Password and PASSPHRASE, api key") == "P***d and P***E, api k***y"
+
+def test_setup_is_idempotent_and_writes_from_the_listener(tmp_path):
+    try:
+        log = setup_logger(log_dir=str(tmp_path), stream=False)
+        assert setup_logger("DEBUG", log_dir=str(tmp_path), stream=False) is log
+        assert sum(isinstance(h, QueueHandler) for h in log.handlers) == 1
+        assert log.level == logging.DEBUG
+        args = ["secret"]
+        log.info("unlocked with %s", args)
+        args.append("later")  # rendered at call time, not when the listener writes
+    finally:
+        shutdown_logging()
+    text = (tmp_path / "app.log").read_text()
+    assert "unlocked with ['s***t']" in text and "later" not in text
+    assert not any(isinstance(h, QueueHandler) for h in logging.getLogger("pm").handlers)
@@ -0,0 +1,83 @@
+import threading
+import urllib.request
+
+import pytest
+
+from pm_core import metrics
+from pm_core.settings_store import ensure_schema, bootstrap_first_run, unlock_vault
+
+def test_counter_and_histogram_sum_across_threads():
+    reg = metrics.Registry()
+    hits = reg.counter("t_hits_total", "hits")
+    lat = reg.histogram("t_seconds", "latency", ("op",), buckets=(0.1, 1.0))
+    child = lat.labels("get")
+
+    def work():
+        for _ in range(1000):
+            hits.inc()
+            child.observe(0.5)
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    child.observe(5)
+
+    assert hits.value() == 4000
+    counts, total, count = child.snapshot()
+    assert counts == [0, 4000, 4001] and count == 4001 and total == pytest.approx(2005)
+    text = reg.render()
+    assert "# TYPE t_seconds histogram" in text
+    assert 't_seconds_bucket{op="get",le="1.0"} 4000' in text
+    assert 't_seconds_bucket{op="get",le="+Inf"} 4001' in text
+    assert "t_hits_total 4000" in text
+    with pytest.raises(ValueError):
+        reg.gauge("t_hits_total", "clash")
+
+def test_http_endpoint_is_loopback_only():
+    with pytest.raises(ValueError):
+        metrics.serve_http(0, host="0.0.0.0")
+    reg = metrics.Registry()
+    reg.counter("t_up", "up").inc()
+    server = metrics.serve_http(0, registry=reg)
+    try:
+        host, port = server.server_address[:2]
+        body = urllib.request.urlopen(f"http://{host}:{port}/metrics", timeout=5).read().decode()
+        assert "t_up 1" in body
+    finally:
+        metrics.stop_exporters([server])
+
+def test_file_exporter_writes_on_stop(tmp_path):
+    reg = metrics.Registry()
+    reg.gauge("t_rows", "rows").set(7)
+    out = tmp_path / "metrics.prom"
+    metrics.FileExporter(str(out), interval=60, registry=reg).start().stop()
+    assert "t_rows 7" in out.read_text()
+
+def test_failed_unlock_is_counted(tmp_path):
+    db = tmp_path / "test.db"
+    ensure_schema(str(db))
+    bootstrap_first_run(str(db), "S3cure-Password!!", {"primary": "argon2id", "argon2_memory_kib": 8192,
+                                                       "argon2_time_cost": 1, "argon2_parallelism": 1, "salt_bytes": 16})
+    failed = metrics.counter("pm_unlock_total", "", ("result",)).labels("failed")
+    before = failed.value()
+    with pytest.raises(PermissionError):
+        unlock_vault(str(db), "wrong password")
+    assert failed.value() == before + 1
+
+def test_cells_of_finished_threads_are_folded():
+    reg = metrics.Registry()
+    hits = reg.counter("t_short_total", "hits")
+    lat = reg.histogram("t_short_seconds", "latency", buckets=(1.0,))
+
+    def work():
+        hits.inc()
+        lat.observe(0.5)
+    for _ in range(200):
+        t = threading.Thread(target=work)
+        t.start()
+        t.join()
+    hits.inc()  # registers this thread's cell, folding the finished ones
+
+    assert hits.value() == 201 and lat.snapshot()[2] == 200
+    assert len(hits.labels()._s._cells) <= 2
@@ -0,0 +1,97 @@
+import json
+import sqlite3
+
+import pytest
+
+from pm_core.kdf import derive_fernet_key
+from pm_core.rotation import rotate_data_key, rotate_master_password
+from pm_core.settings_store import bootstrap_first_run, ensure_schema, unlock_vault
+from pm_core.vault_crypto import VaultCrypto
+
+PARAMS = {"primary": "argon2id", "argon2_memory_kib": 8192, "argon2_time_cost": 1, "argon2_parallelism": 1, "salt_bytes": 16}
+
+def _vault(db, crypto, n=50):
+    conn = sqlite3.connect(db)
+    with conn:
+        conn.execute("CREATE TABLE passwords (id INTEGER PRIMARY KEY, password BLOB)")
+        conn.executemany("INSERT INTO passwords (password) VALUES (?)",
+                         [(crypto.encrypt_text(f"p{i}"),) for i in range(n)])
+    conn.close()
+
+def _tokens(db):
+    conn = sqlite3.connect(db)
+    try:
+        return [r[0] for r in conn.execute("SELECT password FROM passwords ORDER BY id")]
+    finally:
+        conn.close()
+
+def _plain(vc, tokens):
+    return vc.decrypt_records(tokens, range(1, len(tokens) + 1))  # ids start at 1
+
+def test_password_change_rewraps_only_and_data_key_rotation_reencrypts(tmp_path):
+    db = str(tmp_path / "vault.db")
+    ensure_schema(db)
+    _vault(db, bootstrap_first_run(db, "old", PARAMS))
+    before = _tokens(db)
+
+    assert rotate_master_password(db, "old", "new") == 0
+    assert _tokens(db) == before  # no row touched
+    with pytest.raises(PermissionError):
+        unlock_vault(db, "old")
+    vc = unlock_vault(db, "new")
+    assert vc.decrypt_text(before[7]) == "p7"
+
+    assert rotate_data_key(db, "new") == 50
+    after = _tokens(db)
+    assert after != before
+    vc2 = unlock_vault(db, "new")
+    assert _plain(vc2, after) == [f"p{i}" for i in range(50)]  # now binary records
+    with pytest.raises(Exception):
+        vc2.decrypt_record(before[0], 1)
+
+def test_legacy_vault_adopts_its_derived_key_as_data_key(tmp_path):
+    db = str(tmp_path / "legacy.db")
+    ensure_schema(db)
+    salt = b"\x01" * 16
+    legacy = VaultCrypto(derive_fernet_key("pw", salt, PARAMS))  # pre-envelope: KDF output is the data key
+    conn = sqlite3.connect(db)
+    with conn:
+        for k, v in (("salt", salt), ("kdf_params", json.dumps(PARAMS).encode()), ("canary", legacy.encrypt_text("canary-ok"))):
+            conn.execute("INSERT INTO settings (key, value) VALUES (?, ?)", (k, v))
+    conn.close()
+    _vault(db, legacy, n=3)
+
+    rotate_master_password(db, "pw", "pw2")
+    assert [unlock_vault(db, "pw2").decrypt_text(t) for t in _tokens(db)] == ["p0", "p1", "p2"]
+
+def test_interrupted_data_key_rotation_resumes_from_its_checkpoint(tmp_path):
+    import threading
+    from pm_core.reencrypt import ReencryptCancelled
+
+    db = str(tmp_path / "vault.db")
+    ensure_schema(db)
+    _vault(db, bootstrap_first_run(db, "pw", PARAMS), n=250)
+    before = _tokens(db)
+
+    stop, seen = threading.Event(), []
+    def progress(done, total, rate):
+        seen.append((done, total))
+        if done >= 100:
+            stop.set()
+    with pytest.raises(ReencryptCancelled):
+        rotate_data_key(db, "pw", chunk_size=50, progress=progress, cancel=stop)
+    assert seen == [(50, 250), (100, 250)]
+
+    # half-rotated vault still unlocks and reads every row
+    mid = _tokens(db)
+    assert mid[:100] != before[:100] and mid[100:] == before[100:]
+    vc = unlock_vault(db, "pw")
+    assert _plain(vc, mid) == [f"p{i}" for i in range(250)]
+
+    seen.clear()
+    assert rotate_data_key(db, "pw", chunk_size=50, progress=lambda d, t, r: seen.append(d)) == 250
+    assert seen == [150, 200, 250]
+    after = _tokens(db)
+    assert after[:100] == mid[:100]  # done rows were not touched again
+    vc = unlock_vault(db, "pw")
+    assert _plain(vc, after) == [f"p{i}" for i in range(250)]
@@ -0,0 +1,58 @@
+import sqlite3
+import database
+from pm_core.db import open_connection
+from pm_core.schema import MIGRATIONS, upgrade, current_version
+from pm_core.settings_store import ensure_schema
+
+def _plan(conn, sql, params=()):
+    return " | ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+
+def test_v2_migration_backfills_and_queries_use_indexes(tmp_path):
+    db = str(tmp_path / "v1.db")
+    ensure_schema(db)
+    conn = sqlite3.connect(db)
+    with conn:
+        conn.execute("CREATE TABLE passwords (id INTEGER PRIMARY KEY, title TEXT NOT NULL, username TEXT, password TEXT NOT NULL, recovery_codes TEXT, created_at TEXT NOT NULL)")
+        conn.executemany(
+            "INSERT INTO passwords (title, username, password, created_at) VALUES (?,?,?,?)",
+            [(f"T{i}", f"u{i}", b"x", "2025-10-12T10:00:00.123456") for i in range(2500)],
+        )
+    conn.close()
+
+    conn = open_connection(db)
+    try:
+        latest = max(MIGRATIONS)
+        assert upgrade(conn) == latest and current_version(conn) == latest
+        assert conn.execute("SELECT COUNT(*) FROM passwords WHERE created_epoch IS NULL").fetchone()[0] == 0
+        assert upgrade(conn) == latest  # idempotent
+
+        sort_title = _plan(conn, "SELECT id, title, username FROM passwords ORDER BY title COLLATE NOCASE ASC, id ASC")
+        sort_user = _plan(conn, "SELECT id, title, username FROM passwords ORDER BY username COLLATE NOCASE DESC, id DESC")
+        sort_created = _plan(conn, "SELECT id, title, username FROM passwords ORDER BY created_epoch ASC, id ASC")
+        lookup = _plan(conn, "SELECT id, title, username FROM passwords WHERE title = ? COLLATE NOCASE ORDER BY id", ("t1",))
+
+        assert "idx_passwords_title_nocase" in sort_title and "TEMP B-TREE" not in sort_title
+        assert "idx_passwords_username_nocase" in sort_user and "TEMP B-TREE" not in sort_user
+        assert "idx_passwords_created_epoch" in sort_created and "TEMP B-TREE" not in sort_created
+        assert lookup.startswith("SEARCH") and "idx_passwords_title_nocase" in lookup
+
+        spec = database._full_order([("title", True)])
+        where, params = database._keyset_sql(spec, (1200, "T1200", "u1200"))
+        keyset = _plan(conn, f"SELECT id FROM passwords WHERE {where} ORDER BY {database._order_sql(spec)} LIMIT 50", params)
+        assert keyset.startswith("SEARCH") and "idx_passwords_title_nocase" in keyset and "TEMP B-TREE" not in keyset
+    finally:
+        conn.close()
+
+def test_fts_migration_is_retried_when_fts5_was_missing(tmp_path, monkeypatch):
+    from pm_core import schema
+    db = str(tmp_path / "v.db")
+    ensure_schema(db)
+    conn = open_connection(db)
+    try:
+        conn.execute(schema.PASSWORDS_TABLE_SQL)
+        with monkeypatch.context() as m:  # a build without the fts5 module
+            m.setattr(schema, "_FTS_SQL", ("CREATE VIRTUAL TABLE IF NOT EXISTS passwords_fts USING fts5_unavailable(title)",))
+            assert upgrade(conn) == 2 and not schema.has_fts(conn)
+        assert upgrade(conn) == 3 and schema.has_fts(conn)
+    finally:
+        conn.close()
@@ -0,0 +1,55 @@
+from pm_core.search import SearchResultCache, narrows, refine
+
+ROWS = [
+    (1, "GitHub", "octocat@example.com"),
+    (2, "Café Gitea", "admin"),
+    (3, "Bank", "github-backup"),
+    (4, "50% off", "shop"),
+]
+
+def test_typing_a_query_fetches_once_and_refines_in_memory():
+    fetched = []
+    def fetch(q):
+        fetched.append(q)
+        return refine(q, ROWS)
+    cache = SearchResultCache(fetch)
+    for i in range(1, len("github bac") + 1):
+        rows = cache.results("github bac"[:i])
+    assert fetched == ["g"] and cache.fetches == 1
+    assert [r[0] for r in rows] == [3]
+
+    assert [r[0] for r in cache.results("gi")] == [1, 2, 3]  # widened -> fetch again
+    assert cache.fetches == 2
+    assert [r[0] for r in cache.results("gi cafe")] == [2]  # diacritics folded
+
+def test_narrows_and_substring_fallback():
+    assert narrows("git", "git h") and narrows("git ", "git h")
+    assert not narrows("git", "gi") and not narrows(None, "g")
+    assert not narrows("%", "%off")  # substring mode -> term mode
+    assert [r[0] for r in refine("%", ROWS)] == [4]
+
+def test_sort_order_is_part_of_the_cache_key():
+    calls = []
+    def fetch(q, order=None):
+        calls.append(order)
+        rows = refine(q, ROWS)
+        return sorted(rows, key=lambda r: r[1].lower()) if order else rows
+    cache = SearchResultCache(fetch)
+    by_title = [("title", False)]
+    assert [r[0] for r in cache.results("g")] == [1, 2, 3]
+    assert [r[0] for r in cache.results("g", order=by_title)] == [3, 2, 1]
+    assert calls == [None, (("title", False),)]
+    # narrowing keeps the sorted order instead of re-ranking by tier
+    assert [r[0] for r in cache.results("gi", order=by_title)] == [3, 2, 1]
+    assert cache.fetches == 2
+
+def test_substring_mode_refines_like_the_like_fallback():
+    def fetch(q):
+        return refine(q, ROWS, substring=True)
+    cache = SearchResultCache(fetch, substring=lambda: True)
+    assert [r[0] for r in cache.results("h")] == [1, 3, 4]
+    assert [r[0] for r in cache.results("hu")] == [1, 3]  # "hu" sits mid-word in "GitHub"
+    assert cache.fetches == 1
+    assert [r[0] for r in cache.results("%")] == [4]
+    assert [r[0] for r in cache.results("% o")] == [4]  # no term/substring flip without FTS5
+    assert cache.fetches == 2
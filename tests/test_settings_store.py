@@ -1,4 +1,6 @@
-from pm_core.settings_store import ensure_schema, bootstrap_first_run, unlock_vault
+import pytest
+
+from pm_core.settings_store import ensure_schema, bootstrap_first_run, is_initialized, unlock_vault
 
 def test_bootstrap_and_unlock(tmp_path):
     db = tmp_path / "test.db"
@@ -6,3 +8,41 @@ def test_bootstrap_and_unlock(tmp_path):
     crypto = bootstrap_first_run(str(db), "S3cure-Password!!", {"primary":"argon2id","argon2_memory_kib":32768,"argon2_time_cost":2,"argon2_parallelism":2,"salt_bytes":16})
     vc = unlock_vault(str(db), "S3cure-Password!!")
     assert vc.decrypt_text(crypto.encrypt_text("ok")) == "ok"
+
+def test_wrong_password_reprompts_instead_of_first_run(tmp_path, monkeypatch):
+    import encryption
+    db = str(tmp_path / "test.db")
+    assert not is_initialized(db)
+    bootstrap_first_run(db, "S3cure-Password!!", {"primary":"argon2id","argon2_memory_kib":8192,"argon2_time_cost":1,"argon2_parallelism":1,"salt_bytes":16})
+    assert is_initialized(db)
+
+    prompts, errors = iter(["wrong", "S3cure-Password!!"]), []
+    monkeypatch.setattr(encryption, "DB_PATH", db)
+    monkeypatch.setattr(encryption, "_unlock_pw", lambda root: next(prompts))
+    monkeypatch.setattr(encryption, "_first_run_pw", lambda root: pytest.fail("offered first-run setup"))
+    monkeypatch.setattr(encryption.messagebox, "showerror", lambda *a, **kw: errors.append(a))
+    monkeypatch.setattr(encryption, "_offer_stronger_kdf", lambda *a: None)
+    try:
+        crypto = encryption.initialize_vault(None)
+        assert crypto.decrypt_text(crypto.encrypt_text("ok")) == "ok" and len(errors) == 1
+    finally:
+        encryption.set_crypto(None)
+
+def test_unlock_never_calibrates(tmp_path, monkeypatch):
+    import encryption
+
+    class Runner:  # runs inline; a background job would be a calibration
+        def run(self, fn, *a, **kw):
+            return fn(*a, **kw)
+
+        def submit(self, *a, **kw):
+            pytest.fail("started a background job on unlock")
+    db = str(tmp_path / "test.db")
+    bootstrap_first_run(db, "S3cure-Password!!", {"primary":"argon2id","argon2_memory_kib":8192,"argon2_time_cost":1,"argon2_parallelism":1,"salt_bytes":16})
+    monkeypatch.setattr(encryption, "DB_PATH", db)
+    monkeypatch.setattr(encryption, "_unlock_pw", lambda root: "S3cure-Password!!")
+    monkeypatch.setattr(encryption, "calibrate", lambda *a, **kw: pytest.fail("calibrated on unlock"))
+    try:
+        assert encryption.initialize_vault(None, runner=Runner()) is not None  # no kdf_baseline stored
+    finally:
+        encryption.set_crypto(None)
@@ -0,0 +1,48 @@
+import logging
+import pstats
+import time
+
+from pm_core import tracing
+
+@tracing.traced("test.outer")
+def _outer():
+    with tracing.span("test.inner", rows=3):
+        time.sleep(0.02)
+    return "done"
+
+def test_spans_cost_nothing_when_off_and_nest_when_on(caplog):
+    tracing.reset()
+    assert not tracing.enabled()
+    assert tracing.span("x") is tracing.span("y")  # shared no-op
+    assert _outer() == "done" and tracing.totals() == []
+
+    handlers = list(logging.getLogger("pm").handlers)
+    tracing.enable()
+    assert logging.getLogger("pm").handlers == handlers  # output goes through the app's handlers only
+    try:
+        with caplog.at_level(logging.INFO, logger="pm"):
+            _outer()
+    finally:
+        tracing.enable(False)
+    totals = {name: (count, total, own) for name, count, total, own in tracing.totals()}
+    assert totals["test.inner"][0] == totals["test.outer"][0] == 1
+    assert totals["test.inner"][1] >= 20 and totals["test.outer"][2] < 10  # outer's own time excludes inner
+    assert {r.name for r in caplog.records} == {"pm.trace"}
+    lines = [r.getMessage() for r in caplog.records]
+    assert any("span   test.inner" in l and "rows=3" in l for l in lines)  # indented under outer
+
+    tracing.enable()
+    try:
+        caplog.clear()
+        with caplog.at_level(logging.INFO, logger="pm"):
+            tracing.log_totals()
+            tracing.log_totals()  # the atexit call after run_app's: nothing twice
+    finally:
+        tracing.enable(False)
+    assert sorted(r.getMessage().split(":")[0] for r in caplog.records) == ["span total test.inner", "span total test.outer"]
+    assert tracing.totals() == []
+
+def test_run_profiled_dumps_stats(tmp_path):
+    out = tmp_path / "app.prof"
+    assert tracing.run_profiled(sum, str(out), [1, 2, 3]) == 6
+    assert pstats.Stats(str(out)).total_calls > 0
@@ -0,0 +1,81 @@
+import random
+
+from pm_core.ui.tree_sync import reconcile
+
+class FakeTree:
+    """The slice of ttk.Treeview that reconcile() uses, counting widget calls."""
+
+    def __init__(self):
+        self.order, self.items, self.calls = [], {}, []
+
+    def get_children(self, item=""):
+        return tuple(self.order)
+
+    def insert(self, parent, index, iid, values, tags):
+        self.calls.append("insert")
+        self.order.insert(index, iid)
+        self.items[iid] = (values, tags)
+
+    def delete(self, *iids):
+        self.calls.append("delete")
+        for iid in iids:
+            self.order.remove(iid)
+            del self.items[iid]
+
+    def detach(self, *iids):
+        self.calls.append("detach")
+        for iid in iids:
+            self.order.remove(iid)
+
+    def move(self, iid, parent, index):
+        self.calls.append("move")
+        if iid in self.order:
+            self.order.remove(iid)
+        self.order.insert(index, iid)
+
+    def item(self, iid, values, tags):
+        self.calls.append("item")
+        self.items[iid] = (values, tags)
+
+def test_single_row_changes_touch_single_items():
+    tree, shadow = FakeTree(), {}
+    rows = [(i, f"t{i}", "u") for i in range(1, 31)]
+    reconcile(tree, rows, shadow)
+    assert tree.order == [str(i) for i in range(1, 31)]
+
+    tree.calls.clear()
+    edited = rows[:]
+    edited[9] = (10, "renamed", "u")
+    reconcile(tree, edited, shadow)
+    assert tree.calls == ["item"] and tree.items["10"][0] == (10, "renamed", "u")
+
+    tree.calls.clear()
+    scrolled = edited[1:] + [(31, "t31", "u")]
+    reconcile(tree, scrolled, shadow, first_index=1)
+    assert tree.calls == ["delete", "insert"]  # absolute stripes unchanged
+    assert tree.order == [str(i) for i in range(2, 32)]
+
+    tree.calls.clear()
+    moved = [scrolled[-1]] + scrolled[:-1]
+    reconcile(tree, moved, shadow, first_index=1)
+    assert tree.calls.count("move") == 1
+    assert tree.order == [str(r[0]) for r in moved]
+    assert tree.items["31"][1] == ("odd",) and tree.items["2"][1] == ("even",)
+
+def test_reorders_with_minimal_moves():
+    tree, shadow = FakeTree(), {}
+    rows = [(i, f"t{i}", "u") for i in range(1, 2001)]
+    reconcile(tree, rows, shadow)
+
+    tree.calls.clear()
+    first_to_last = rows[1:] + rows[:1]
+    reconcile(tree, first_to_last, shadow)
+    assert tree.calls.count("move") == 1 and tree.order == [str(r[0]) for r in first_to_last]
+
+    rnd = random.Random(7)
+    for _ in range(5):
+        mixed = rnd.sample(rows, 1500) + [(i, f"t{i}", "u") for i in range(3000, 3100)]
+        rnd.shuffle(mixed)
+        reconcile(tree, mixed, shadow)
+        assert tree.order == [str(r[0]) for r in mixed]
+        assert {iid: v[1] for iid, v in tree.items.items()} == {iid: (t,) for iid, (_, t) in shadow.items()}
@@ -0,0 +1,32 @@
+from cryptography.fernet import Fernet
+
+from pm_core.vault_crypto import VaultCrypto
+
+def test_batch_crypto_keeps_order_serial_and_pooled():
+    vc = VaultCrypto(Fernet.generate_key())
+    plain = [f"pw-{i}" for i in range(5000)] + ["ünïcode", ""]
+    for workers in (1, 3):
+        tokens = vc.encrypt_many(iter(plain), workers=workers)
+        assert [vc.decrypt_text(t) for t in tokens[:3]] == plain[:3]
+        assert vc.decrypt_many(tokens, workers=workers) == plain
+    assert vc.decrypt_many(vc.encrypt_many([b"raw"]), as_bytes=True) == [b"raw"]
+
+def test_binary_records_bind_the_entry_id_and_read_legacy_tokens():
+    import pytest
+    from cryptography.fernet import InvalidToken
+
+    old, new = Fernet.generate_key(), Fernet.generate_key()
+    vc = VaultCrypto(old)
+    rec, token = vc.encrypt_record("correct horse", 7), vc.encrypt_text("correct horse")
+    assert rec[:1] == b"\x01" and len(rec) == 1 + 12 + len("correct horse") + 16 < len(token)
+    assert vc.decrypt_record(rec, 7) == "correct horse"
+    assert vc.decrypt_record(token, 7) == vc.decrypt_record(token.decode(), 7) == "correct horse"
+    with pytest.raises(InvalidToken):
+        vc.decrypt_record(rec, 8)  # moved to another row
+
+    both = VaultCrypto(new, old)  # mid-rotation: reads either key, writes the new one
+    assert both.decrypt_records([rec, token], [7, 1]) == ["correct horse"] * 2
+    with pytest.raises(InvalidToken):
+        vc.decrypt_record(both.encrypt_record("x", 1), 1)
+    ids = list(range(5000))
+    assert both.decrypt_records(both.encrypt_records([str(i) for i in ids], ids, workers=3), ids) == [str(i) for i in ids]
@@ -0,0 +1,38 @@
+from pm_core.ui.virtual_tree import ListSource, RowWindow
+
+class CountingSource(ListSource):
+    def __init__(self, rows):
+        super().__init__(rows)
+        self.calls = []
+
+    def fetch_after(self, row, limit):
+        self.calls.append("after")
+        return super().fetch_after(row, limit)
+
+    def fetch_before(self, row, limit):
+        self.calls.append("before")
+        return super().fetch_before(row, limit)
+
+    def fetch_at(self, offset, limit):
+        self.calls.append("at")
+        return super().fetch_at(offset, limit)
+
+def test_window_scrolls_with_keyset_fetches_and_stays_bounded():
+    src = CountingSource([(i, f"t{i}", f"u{i}") for i in range(1, 100_001)])
+    win = RowWindow(src, margin=50)
+    assert win.total == 100_000
+
+    assert [r[0] for r in win.get(0, 20)] == list(range(1, 21))
+    for top in range(1, 500):  # scroll down row by row
+        assert win.get(top, 20)[0][0] == top + 1
+        assert len(win.rows) <= 20 + 2 * 50
+    assert set(src.calls) == {"at", "after"} and src.calls.count("at") == 1
+
+    for top in range(498, 300, -1):  # and back up
+        assert win.get(top, 20)[0][0] == top + 1
+    assert "before" in src.calls
+
+    src.calls.clear()
+    assert win.get(90_000, 20)[0][0] == 90_001  # scrollbar jump
+    assert src.calls == ["at"]
+    assert win.get(99_990, 20)[-1][0] == 100_000